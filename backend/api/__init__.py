@@ -5,27 +5,43 @@ API Blueprint for Web3 HMS
 from flask import Blueprint
 from flask_restful import Api
 
+from .serializer import output_json
+
 # Create API blueprint
 api_bp = Blueprint('api', __name__)
 api = Api(api_bp)
+api.representation('application/json')(output_json)
 
 # Import resources
-from .resources.patient import PatientResource, PatientListResource
+from .resources.patient import PatientResource, PatientListResource, PatientImportResource
 from .resources.doctor import DoctorResource, DoctorListResource
-from .resources.appointment import AppointmentResource, AppointmentListResource
-from .resources.medical_record import MedicalRecordResource, MedicalRecordListResource
+from .resources.schedule import DoctorScheduleResource, DoctorScheduleListResource
+from .resources.appointment import AppointmentResource, AppointmentListResource, AppointmentSlotsResource, AppointmentHoldListResource, AppointmentHoldResource
+from .resources.medical_record import MedicalRecordResource, MedicalRecordListResource, MedicalRecordAttachmentResource
 from .resources.blockchain import BlockchainResource
+from .resources.export import ExportResource
+from .resources.stats import DashboardStatsResource, StatisticsResource
 from .resources.auth import LoginResource, UserProfileResource
 
 # Register resources
 api.add_resource(PatientListResource, '/patients')
+api.add_resource(PatientImportResource, '/patients/import')
 api.add_resource(PatientResource, '/patients/<string:patient_id>')
 api.add_resource(DoctorListResource, '/doctors')
 api.add_resource(DoctorResource, '/doctors/<string:doctor_id>')
+api.add_resource(DoctorScheduleListResource, '/doctors/<string:doctor_id>/schedules')
+api.add_resource(DoctorScheduleResource, '/doctors/<string:doctor_id>/schedules/<string:schedule_id>')
 api.add_resource(AppointmentListResource, '/appointments')
+api.add_resource(AppointmentSlotsResource, '/appointments/slots')
+api.add_resource(AppointmentHoldListResource, '/appointments/holds')
+api.add_resource(AppointmentHoldResource, '/appointments/holds/<string:hold_id>')
 api.add_resource(AppointmentResource, '/appointments/<string:appointment_id>')
 api.add_resource(MedicalRecordListResource, '/medical-records')
 api.add_resource(MedicalRecordResource, '/medical-records/<string:record_id>')
+api.add_resource(MedicalRecordAttachmentResource, '/medical-records/<string:record_id>/attachment')
 api.add_resource(BlockchainResource, '/blockchain/<string:action>')
+api.add_resource(ExportResource, '/export/<string:dataset>')
+api.add_resource(DashboardStatsResource, '/dashboard/stats')
+api.add_resource(StatisticsResource, '/statistics')
 api.add_resource(LoginResource, '/auth/login')
 api.add_resource(UserProfileResource, '/auth/me')
@@ -0,0 +1,151 @@
+"""
+Keyset cursor pagination for list endpoints
+
+Pages are read with a row comparison on a stable sort key such as
+``(created_at, id)``, backed by a composite index, so every page costs the
+same however deep it is. Cursors are opaque tokens carrying the key of the
+boundary row and the paging direction. A total is only computed when
+``include_total=true`` is passed, through ``services.counts``, and may be
+a planner estimate unless ``exact_total=true``.
+
+Requests with an explicit ``page``, and relevance-ranked search results,
+whose order has no stable key, keep OFFSET pagination.
+"""
+
+import base64
+import binascii
+import json
+import math
+import uuid
+from datetime import date, datetime
+
+from flask_restful import inputs
+from sqlalchemy import Date, DateTime, tuple_
+from sqlalchemy.dialects.postgresql import UUID
+
+from services.counts import count_total
+
+MAX_PER_PAGE = 100
+
+
+class InvalidCursor(ValueError):
+    """Cursor that does not decode or does not belong to the listing"""
+
+
+def add_pagination_arguments(parser):
+    """Add the paging arguments shared by list endpoints to ``parser``"""
+    parser.add_argument('page', type=int)
+    parser.add_argument('per_page', type=int, default=20)
+    parser.add_argument('cursor', type=str)
+    parser.add_argument('order', type=str, default='desc', choices=('asc', 'desc'))
+    parser.add_argument('include_total', type=inputs.boolean, default=False)
+    parser.add_argument('exact_total', type=inputs.boolean, default=False)
+
+
+def _encode_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    return value
+
+
+def _decode_value(column, value):
+    if value is None:
+        return None
+    if isinstance(column.type, DateTime):
+        return datetime.fromisoformat(value)
+    if isinstance(column.type, Date):
+        return date.fromisoformat(value)
+    if isinstance(column.type, UUID):
+        return uuid.UUID(value)
+    return value
+
+
+def encode_cursor(keys, row, direction, order):
+    payload = {
+        'k': [_encode_value(getattr(row, key.key)) for key in keys],
+        'd': direction,
+        'o': order
+    }
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def decode_cursor(keys, cursor):
+    """Decode ``cursor`` into its key values, direction and order"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        values = payload['k']
+        if len(values) != len(keys) or payload['d'] not in ('next', 'prev') or payload['o'] not in ('asc', 'desc'):
+            raise InvalidCursor('Invalid cursor')
+        return [_decode_value(key, value) for key, value in zip(keys, values)], payload['d'], payload['o']
+    except (binascii.Error, UnicodeDecodeError, ValueError, KeyError, TypeError) as e:
+        raise InvalidCursor('Invalid cursor') from e
+
+
+def keyset_page(query, keys, per_page, cursor=None, order='desc'):
+    """Read one page of ``query`` ordered by ``keys``
+
+    Returns the rows in listing order with the next and previous cursors,
+    either of which is None at the ends of the listing.
+    """
+    direction = 'next'
+    if cursor:
+        values, direction, order = decode_cursor(keys, cursor)
+
+    forward = direction == 'next'
+    # Walking back through a descending listing scans ascending, and so on
+    scan_descending = (order == 'desc') == forward
+    query = query.order_by(None).order_by(*(key.desc() if scan_descending else key.asc() for key in keys))
+    if cursor:
+        boundary = tuple_(*keys)
+        query = query.filter(boundary < tuple_(*values) if scan_descending else boundary > tuple_(*values))
+
+    rows = query.limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if not forward:
+        rows.reverse()
+
+    more_after = has_more if forward else cursor is not None
+    more_before = cursor is not None if forward else has_more
+    return (
+        rows,
+        encode_cursor(keys, rows[-1], 'next', order) if rows and more_after else None,
+        encode_cursor(keys, rows[0], 'prev', order) if rows and more_before else None
+    )
+
+
+def paginate(query, keys, args, collection, serialize, ranked=False, filters=None):
+    """Build the response body of a list endpoint
+
+    ``keys`` are the sort key columns, ending with the primary key to keep
+    the order total. ``serialize`` turns a list of rows into a list of
+    dictionaries, see ``api.serializer.Schema.rows``.
+    ``filters`` holds the equality filters of ``query`` when they are its
+    only conditions, see ``services.counts.count_total``.
+    """
+    per_page = min(max(args['per_page'] or 20, 1), MAX_PER_PAGE)
+    model = keys[-1].class_
+
+    if args['page'] is not None or ranked:
+        page = query.paginate(page=args['page'] or 1, per_page=per_page, error_out=False, count=False)
+        total, is_estimate = count_total(query, model, filters, exact=args['exact_total'])
+        return {
+            collection: serialize(page.items),
+            'total': total,
+            'total_is_estimate': is_estimate,
+            'pages': math.ceil(total / per_page),
+            'current_page': page.page
+        }
+
+    rows, next_cursor, prev_cursor = keyset_page(query, keys, per_page, args['cursor'], args['order'])
+    body = {
+        collection: serialize(rows),
+        'next_cursor': next_cursor,
+        'prev_cursor': prev_cursor,
+        'per_page': per_page
+    }
+    if args['include_total'] or args['exact_total']:
+        body['total'], body['total_is_estimate'] = count_total(query, model, filters, exact=args['exact_total'])
+    return body
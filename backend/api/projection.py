@@ -0,0 +1,70 @@
+"""
+Column projections for list endpoints
+
+``view=summary`` and ``fields=a,b,c`` narrow a list query with
+``load_only`` so only the requested columns are selected from Postgres,
+and rows are serialized from those columns alone (``api.serializer``).
+Any other column is loaded with ``raiseload``, so a field missing from
+the projection fails loudly instead of issuing one query per row.
+"""
+
+from sqlalchemy.orm import load_only
+
+VIEWS = ('full', 'summary')
+
+_field_columns = {}
+
+
+def field_columns(model):
+    """Map each public field of ``model`` to the column attributes it reads
+
+    Fields default to the mapped columns under their attribute names, with
+    a leading underscore dropped (e.g. ``MedicalRecord._content`` serves
+    ``content``). Deferred columns are internal and not exposed. Models
+    override entries through ``FIELD_COLUMNS``.
+    """
+    columns = _field_columns.get(model)
+    if columns is None:
+        columns = {
+            prop.key.lstrip('_'): (getattr(model, prop.key),)
+            for prop in model.__mapper__.column_attrs
+            if not prop.deferred
+        }
+        for field, keys in getattr(model, 'FIELD_COLUMNS', {}).items():
+            columns[field] = tuple(getattr(model, key) for key in keys)
+        _field_columns[model] = columns
+    return columns
+
+
+def parse_projection(model, view=None, fields=None):
+    """Resolve ``view`` and ``fields`` request arguments to field names
+
+    Returns None for the full row. Raises ValueError on an unknown view or
+    field.
+    """
+    if fields:
+        names = [name.strip() for name in fields.split(',') if name.strip()]
+        unknown = [name for name in names if name not in field_columns(model)]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        # Rows are always identified by their primary key
+        return ['id'] + [name for name in dict.fromkeys(names) if name != 'id']
+    if view is None or view == 'full':
+        return None
+    if view == 'summary':
+        return list(model.SUMMARY_FIELDS)
+    raise ValueError(f"Invalid view, expected one of: {', '.join(VIEWS)}")
+
+
+def apply_projection(query, model, names, keys=()):
+    """Restrict ``query`` to the columns behind ``names``
+
+    ``keys`` are columns read from the rows besides the serialized fields,
+    such as the sort key cursors are built from. They are always loaded.
+    """
+    if names is None:
+        return query
+    columns = field_columns(model)
+    attributes = [attribute for name in names for attribute in columns[name]]
+    attributes += [key for key in keys if not any(key is attribute for attribute in attributes)]
+    return query.options(load_only(*attributes, raiseload=True))
@@ -8,8 +8,68 @@ from models.appointment import Appointment
 from models.patient import Patient
 from models.doctor import Doctor
 from extensions import db
+from api.pagination import InvalidCursor, add_pagination_arguments, paginate
+from api.serializer import schema_for
+from services import scheduling, slot_holds
+from sqlalchemy.exc import IntegrityError
+from redis.exceptions import RedisError
 import uuid
-from datetime import datetime
+from datetime import date, datetime
+
+
+def add_filter_arguments(parser):
+    """Add the filters of the appointment list to ``parser``"""
+    parser.add_argument('patient_id', type=str)
+    parser.add_argument('doctor_id', type=str)
+    parser.add_argument('status', type=str)
+    parser.add_argument('date_from', type=str)
+    parser.add_argument('date_to', type=str)
+
+
+def filter_appointments(args):
+    """Appointments matching the filters in ``args``
+
+    Returns the query with its equality filters for count estimation, None
+    once other conditions apply. Raises ValueError on a malformed filter.
+    """
+    query = Appointment.query
+    filters = {}
+    
+    if args['patient_id']:
+        try:
+            query = query.filter_by(patient_id=uuid.UUID(args['patient_id']))
+        except ValueError:
+            raise ValueError('Invalid patient ID') from None
+        filters = None
+    
+    if args['doctor_id']:
+        try:
+            query = query.filter_by(doctor_id=uuid.UUID(args['doctor_id']))
+        except ValueError:
+            raise ValueError('Invalid doctor ID') from None
+        filters = None
+    
+    if args['status']:
+        query = query.filter_by(status=args['status'])
+        if filters is not None:
+            filters['status'] = args['status']
+    
+    if args['date_from']:
+        try:
+            query = query.filter(Appointment.schedule_time >= datetime.fromisoformat(args['date_from']))
+        except ValueError:
+            raise ValueError('Invalid date_from format') from None
+        filters = None
+    
+    if args['date_to']:
+        try:
+            query = query.filter(Appointment.schedule_time <= datetime.fromisoformat(args['date_to']))
+        except ValueError:
+            raise ValueError('Invalid date_to format') from None
+        filters = None
+    
+    return query, filters
+
 
 class AppointmentListResource(Resource):
     """Appointment list resource"""
@@ -17,60 +77,26 @@ class AppointmentListResource(Resource):
     def get(self):
         """Get all appointments"""
         parser = reqparse.RequestParser()
-        parser.add_argument('page', type=int, default=1)
-        parser.add_argument('per_page', type=int, default=20)
-        parser.add_argument('patient_id', type=str)
-        parser.add_argument('doctor_id', type=str)
-        parser.add_argument('status', type=str)
-        parser.add_argument('date_from', type=str)
-        parser.add_argument('date_to', type=str)
+        add_pagination_arguments(parser)
+        add_filter_arguments(parser)
         args = parser.parse_args()
         
-        query = Appointment.query
-        
-        if args['patient_id']:
-            try:
-                patient_uuid = uuid.UUID(args['patient_id'])
-                query = query.filter_by(patient_id=patient_uuid)
-            except ValueError:
-                return {'error': 'Invalid patient ID'}, 400
-        
-        if args['doctor_id']:
-            try:
-                doctor_uuid = uuid.UUID(args['doctor_id'])
-                query = query.filter_by(doctor_id=doctor_uuid)
-            except ValueError:
-                return {'error': 'Invalid doctor ID'}, 400
-        
-        if args['status']:
-            query = query.filter_by(status=args['status'])
-        
-        if args['date_from']:
-            try:
-                date_from = datetime.fromisoformat(args['date_from'])
-                query = query.filter(Appointment.schedule_time >= date_from)
-            except ValueError:
-                return {'error': 'Invalid date_from format'}, 400
-        
-        if args['date_to']:
-            try:
-                date_to = datetime.fromisoformat(args['date_to'])
-                query = query.filter(Appointment.schedule_time <= date_to)
-            except ValueError:
-                return {'error': 'Invalid date_to format'}, 400
-        
-        appointments = query.paginate(
-            page=args['page'],
-            per_page=args['per_page'],
-            error_out=False
-        )
+        try:
+            query, filters = filter_appointments(args)
+        except ValueError as e:
+            return {'error': str(e)}, 400
         
-        return {
-            'appointments': [appointment.to_dict() for appointment in appointments.items],
-            'total': appointments.total,
-            'pages': appointments.pages,
-            'current_page': appointments.page
-        }
+        try:
+            return paginate(
+                query,
+                (Appointment.schedule_time, Appointment.id),
+                args,
+                'appointments',
+                schema_for(Appointment).rows,
+                filters=filters
+            )
+        except InvalidCursor as e:
+            return {'error': str(e)}, 400
     
     @jwt_required()
     def post(self):
@@ -107,12 +133,21 @@ class AppointmentListResource(Resource):
         except ValueError:
             return {'error': 'Invalid schedule_time format'}, 400
         
+        try:
+            schedule_time, end_time = scheduling.booking_slot(doctor, schedule_time)
+        except ValueError as e:
+            return {'error': str(e)}, 400
+        
+        if slot_holds.is_held(doctor_uuid, schedule_time):
+            return {'error': 'The slot is already held or booked'}, 409
+        
         appointment = Appointment(
             patient_id=patient_uuid,
             doctor_id=doctor_uuid,
             dept_id=args['dept_id'],
             dept_name=args['dept_name'],
             schedule_time=schedule_time,
+            end_time=end_time,
             appointment_type=args['appointment_type'],
             reason=args['reason'],
             notes=args['notes'],
@@ -120,10 +155,137 @@ class AppointmentListResource(Resource):
         )
         
         db.session.add(appointment)
-        db.session.commit()
+        try:
+            db.session.commit()
+        except IntegrityError as e:
+            db.session.rollback()
+            if scheduling.is_slot_conflict(e):
+                return {'error': 'The doctor is already booked at this time'}, 409
+            raise
         
+        slot_holds.booked(appointment)
         return appointment.to_dict(), 201
 
+class AppointmentSlotsResource(Resource):
+    """Free appointment slots"""
+    
+    def get(self):
+        """Get the free slots of a department or doctor over the next days"""
+        parser = reqparse.RequestParser()
+        parser.add_argument('dept_id', type=str)
+        parser.add_argument('doctor_id', type=str)
+        parser.add_argument('date_from', type=str)
+        parser.add_argument('days', type=int)
+        args = parser.parse_args()
+        
+        doctor_uuid = None
+        if args['doctor_id']:
+            try:
+                doctor_uuid = uuid.UUID(args['doctor_id'])
+            except ValueError:
+                return {'error': 'Invalid doctor ID'}, 400
+        
+        first_day = None
+        if args['date_from']:
+            try:
+                first_day = date.fromisoformat(args['date_from'])
+            except ValueError:
+                return {'error': 'Invalid date_from format'}, 400
+        
+        try:
+            slots = scheduling.free_slots(args['dept_id'] or None, doctor_uuid, first_day, args['days'])
+        except ValueError as e:
+            return {'error': str(e)}, 400
+        
+        return {'slots': slots, 'total': len(slots)}
+
+class AppointmentHoldListResource(Resource):
+    """Short-lived slot holds"""
+    
+    @jwt_required()
+    def post(self):
+        """Hold a slot for a patient until it is confirmed or expires"""
+        parser = reqparse.RequestParser()
+        parser.add_argument('patient_id', required=True, help='Patient ID is required')
+        parser.add_argument('doctor_id', required=True, help='Doctor ID is required')
+        parser.add_argument('schedule_time', required=True, help='Schedule time is required')
+        args = parser.parse_args()
+        
+        try:
+            patient_uuid = uuid.UUID(args['patient_id'])
+        except ValueError:
+            return {'error': 'Invalid patient ID'}, 400
+        
+        try:
+            doctor_uuid = uuid.UUID(args['doctor_id'])
+        except ValueError:
+            return {'error': 'Invalid doctor ID'}, 400
+        
+        try:
+            schedule_time = datetime.fromisoformat(args['schedule_time'])
+        except ValueError:
+            return {'error': 'Invalid schedule_time format'}, 400
+        
+        # Turn away the crowd racing for a taken slot before touching the database
+        if slot_holds.is_held(doctor_uuid, schedule_time):
+            return {'error': 'The slot is already held or booked'}, 409
+        
+        patient = Patient.query.get_or_404(patient_uuid)
+        doctor = Doctor.query.get_or_404(doctor_uuid)
+        
+        try:
+            return slot_holds.place_hold(patient, doctor, schedule_time), 201
+        except ValueError as e:
+            return {'error': str(e)}, 400
+        except slot_holds.SlotUnavailable as e:
+            return {'error': str(e)}, 409
+        except RedisError:
+            return {'error': 'Slot holds are temporarily unavailable'}, 503
+
+class AppointmentHoldResource(Resource):
+    """Individual slot hold"""
+    
+    @jwt_required()
+    def get(self, hold_id):
+        """Get a hold with the seconds left before it expires"""
+        try:
+            hold = slot_holds.get_hold(hold_id)
+        except RedisError:
+            return {'error': 'Slot holds are temporarily unavailable'}, 503
+        if hold is None:
+            return {'error': 'Hold not found or expired'}, 404
+        return hold
+    
+    @jwt_required()
+    def post(self, hold_id):
+        """Confirm a hold into an appointment"""
+        parser = reqparse.RequestParser()
+        parser.add_argument('appointment_type', default='OUTPATIENT')
+        parser.add_argument('reason')
+        parser.add_argument('notes')
+        parser.add_argument('fee', type=float, default=0)
+        args = parser.parse_args()
+        
+        try:
+            appointment = slot_holds.confirm_hold(hold_id, **args)
+        except slot_holds.SlotUnavailable as e:
+            return {'error': str(e)}, 409
+        except RedisError:
+            return {'error': 'Slot holds are temporarily unavailable'}, 503
+        
+        return appointment.to_dict(), 201
+    
+    @jwt_required()
+    def delete(self, hold_id):
+        """Release a hold"""
+        try:
+            released = slot_holds.release_hold(hold_id)
+        except RedisError:
+            return {'error': 'Slot holds are temporarily unavailable'}, 503
+        if not released:
+            return {'error': 'Hold not found or expired'}, 404
+        return {'message': 'Hold released successfully'}
+
 class AppointmentResource(Resource):
     """Individual appointment resource"""
     
@@ -146,6 +308,7 @@ class AppointmentResource(Resource):
             return {'error': 'Invalid appointment ID'}, 400
         
         appointment = Appointment.query.get_or_404(appointment_uuid)
+        booked_time = appointment.schedule_time if appointment.status != 'CANCELLED' else None
         
         parser = reqparse.RequestParser()
         parser.add_argument('schedule_time')
@@ -163,16 +326,32 @@ class AppointmentResource(Resource):
         if args['schedule_time']:
             try:
                 schedule_time = datetime.fromisoformat(args['schedule_time'])
-                appointment.schedule_time = schedule_time
             except ValueError:
                 return {'error': 'Invalid schedule_time format'}, 400
+            try:
+                appointment.schedule_time, appointment.end_time = scheduling.booking_slot(appointment.doctor, schedule_time)
+            except ValueError as e:
+                db.session.rollback()
+                return {'error': str(e)}, 400
         
         # Update fields
         for key, value in args.items():
             if value is not None and key != 'schedule_time':
                 setattr(appointment, key, value)
         
-        db.session.commit()
+        try:
+            db.session.commit()
+        except IntegrityError as e:
+            db.session.rollback()
+            if scheduling.is_slot_conflict(e):
+                return {'error': 'The doctor is already booked at this time'}, 409
+            raise
+        
+        # Move the booked marker along with the slot
+        if booked_time is not None and (appointment.status == 'CANCELLED' or appointment.schedule_time != booked_time):
+            slot_holds.forget(appointment, booked_time)
+        if appointment.status != 'CANCELLED' and appointment.end_time is not None:
+            slot_holds.booked(appointment)
         return appointment.to_dict()
     
     @jwt_required()
@@ -186,5 +365,6 @@ class AppointmentResource(Resource):
         appointment = Appointment.query.get_or_404(appointment_uuid)
         appointment.status = 'CANCELLED'
         db.session.commit()
+        slot_holds.forget(appointment)
         
         return {'message': 'Appointment cancelled successfully'}
@@ -2,52 +2,34 @@
 Blockchain API resources for Web3 HMS
 """
 
-from flask_restful import Resource, reqparse
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask import Response, current_app, stream_with_context
+from flask_restful import Resource, inputs, reqparse
+from flask_jwt_extended import jwt_required
+from celery.result import AsyncResult
 from web3 import Web3
+from datetime import datetime, timedelta
 import json
 import os
+import uuid
+from models.access_grant import AccessGrant
+from models.chain_event import ChainEvent
 from models.contract import Contract
 from models.data_hash import DataHash
+from models.doctor import Doctor
 from models.medical_record import MedicalRecord
-from extensions import db
+from extensions import db, celery
+from services import event_indexer, hash_anchor, integrity, integrity_audit, trace_index, tx_pipeline
+from services.access_index import access_index
+from services.chain_cache import chain_cache
+from services.content_store import content_store
+from services.web3_client import contract_registry, get_web3
 
 class BlockchainResource(Resource):
     """Blockchain interaction resource"""
     
     def __init__(self):
-        self.w3 = Web3(Web3.HTTPProvider(os.getenv('WEB3_PROVIDER_URL', 'http://localhost:8545')))
-        self.contracts = self._load_contracts()
-    
-    def _load_contracts(self):
-        """Load contract ABIs and addresses"""
-        contracts = {}
-        
-        # Load MedicalRecordHash contract
-        medical_record_contract = Contract.query.filter_by(name='MedicalRecordHash', is_active=True).first()
-        if medical_record_contract:
-            contracts['medical_record'] = self.w3.eth.contract(
-                address=medical_record_contract.address,
-                abi=json.loads(medical_record_contract.abi)
-            )
-        
-        # Load AccessControl contract
-        access_control_contract = Contract.query.filter_by(name='AccessControl', is_active=True).first()
-        if access_control_contract:
-            contracts['access_control'] = self.w3.eth.contract(
-                address=access_control_contract.address,
-                abi=json.loads(access_control_contract.abi)
-            )
-        
-        # Load DrugTrace contract
-        drug_trace_contract = Contract.query.filter_by(name='DrugTrace', is_active=True).first()
-        if drug_trace_contract:
-            contracts['drug_trace'] = self.w3.eth.contract(
-                address=drug_trace_contract.address,
-                abi=json.loads(drug_trace_contract.abi)
-            )
-        
-        return contracts
+        self.w3 = get_web3()
+        self.contracts = contract_registry.get_contracts()
     
     def get(self, action):
         """Handle blockchain read operations"""
@@ -57,6 +39,20 @@ class BlockchainResource(Resource):
             return self._get_contracts()
         elif action == 'verify':
             return self._verify_data()
+        elif action == 'job':
+            return self._get_job()
+        elif action == 'transactions':
+            return self._get_transactions()
+        elif action == 'history':
+            return self._get_history()
+        elif action == 'cache_stats':
+            return self._get_cache_stats()
+        elif action == 'check_access':
+            return self._check_access()
+        elif action == 'trace_items':
+            return self._get_trace_items()
+        elif action == 'audit_report':
+            return self._get_audit_report()
         else:
             return {'error': 'Invalid action'}, 400
     
@@ -71,6 +67,14 @@ class BlockchainResource(Resource):
             return self._revoke_access()
         elif action == 'create_item':
             return self._create_trace_item()
+        elif action == 'flush_batch':
+            return self._flush_hash_batch()
+        elif action == 'verify_bulk':
+            return self._verify_bulk()
+        elif action == 'check_access_batch':
+            return self._check_access_batch()
+        elif action == 'run_audit':
+            return self._run_audit()
         else:
             return {'error': 'Invalid action'}, 400
     
@@ -87,6 +91,44 @@ class BlockchainResource(Resource):
         except Exception as e:
             return {'error': str(e)}, 500
     
+    def _get_cache_stats(self):
+        """Get finalized chain read cache counters of this worker"""
+        return {
+            'pid': os.getpid(),
+            'chain_cache': chain_cache.get_stats(),
+            'access_index': access_index.get_stats(),
+            'content_store': content_store.get_stats()
+        }
+    
+    def _get_audit_report(self):
+        """Get the integrity audit progress, last report and mismatches"""
+        parser = reqparse.RequestParser()
+        parser.add_argument('limit', type=int, default=100)
+        args = parser.parse_args()
+        limit = min(max(args['limit'], 1), 1000)
+        
+        try:
+            progress = integrity_audit.get_progress()
+            return {
+                'progress': progress,
+                'last_pass': integrity_audit.get_report(),
+                'mismatches': integrity_audit.get_mismatches(last=progress is None, limit=limit)
+            }
+        except Exception as e:
+            return {'error': str(e)}, 500
+    
+    def _run_audit(self):
+        """Queue an integrity audit run, optionally starting a new pass"""
+        parser = reqparse.RequestParser()
+        parser.add_argument('restart', type=inputs.boolean, default=False)
+        args = parser.parse_args()
+        
+        result = celery.send_task('blockchain.audit_records', kwargs={'restart': args['restart']})
+        return {
+            'message': 'Integrity audit queued',
+            'job_id': result.id
+        }, 202
+    
     def _get_contracts(self):
         """Get deployed contracts information"""
         contracts = Contract.query.filter_by(is_active=True).all()
@@ -94,6 +136,87 @@ class BlockchainResource(Resource):
             'contracts': [contract.to_dict() for contract in contracts]
         }
     
+    def _get_transactions(self):
+        """Get recent contract transactions from the event index"""
+        parser = reqparse.RequestParser()
+        parser.add_argument('limit', type=int, default=10)
+        parser.add_argument('event_name', type=str)
+        args = parser.parse_args()
+        
+        query = ChainEvent.query
+        if args['event_name']:
+            query = query.filter_by(event_name=args['event_name'])
+        
+        events = query.order_by(
+            ChainEvent.block_number.desc(),
+            ChainEvent.log_index.desc()
+        ).limit(min(max(args['limit'], 1), 100)).all()
+        
+        # Gas figures recorded by the confirmation tracker
+        gas_used = dict(
+            db.session.query(DataHash.tx_hash, db.func.max(DataHash.gas_used)).filter(
+                DataHash.tx_hash.in_({event.tx_hash for event in events})
+            ).group_by(DataHash.tx_hash)
+        ) if events else {}
+        
+        transactions = []
+        for event in events:
+            transaction = event.to_dict()
+            transaction['data_type'] = transaction['args'].get('recordType') or \
+                transaction['args'].get('dataType') or event.event_name
+            transaction['gas_used'] = gas_used.get(event.tx_hash)
+            transaction['created_at'] = transaction['block_time'] or transaction['created_at']
+            transactions.append(transaction)
+        
+        return {
+            'transactions': transactions
+        }
+    
+    def _get_trace_items(self):
+        """Look up traceable items by manufacturer or batch from the local index"""
+        parser = reqparse.RequestParser()
+        parser.add_argument('manufacturer', type=str)
+        parser.add_argument('batch_number', type=str)
+        parser.add_argument('status', type=str)
+        parser.add_argument('limit', type=int, default=500)
+        args = parser.parse_args()
+        
+        if not args['manufacturer'] and not args['batch_number']:
+            return {'error': 'One of manufacturer or batch_number is required'}, 400
+        
+        items = trace_index.find_items(
+            manufacturer=args['manufacturer'],
+            batch_number=args['batch_number'],
+            status=args['status'],
+            limit=min(max(args['limit'], 1), 5000)
+        )
+        return {
+            'items': items,
+            'count': len(items)
+        }
+    
+    def _get_history(self):
+        """Get the on-chain event history of a record, grant or item"""
+        parser = reqparse.RequestParser()
+        parser.add_argument('record_id', type=str)
+        parser.add_argument('grant_id', type=str)
+        parser.add_argument('item_id', type=str)
+        args = parser.parse_args()
+        
+        subject = next((name for name in event_indexer.SUBJECT_CONTRACTS if args[name]), None)
+        if not subject:
+            return {'error': 'One of record_id, grant_id or item_id is required'}, 400
+        
+        events = ChainEvent.query.filter_by(
+            subject_key=event_indexer.subject_key(args[subject]),
+            contract_name=event_indexer.SUBJECT_CONTRACTS[subject]
+        ).order_by(ChainEvent.block_number, ChainEvent.log_index).all()
+        
+        return {
+            subject: args[subject],
+            'events': [event.to_dict() for event in events]
+        }
+    
     def _verify_data(self):
         """Verify data integrity using blockchain hash"""
         parser = reqparse.RequestParser()
@@ -110,12 +233,29 @@ class BlockchainResource(Resource):
             # Calculate current hash
             current_hash = record.calculate_hash()
             
+            # Verify Merkle inclusion if the hash was anchored in a batch
+            data_hash = DataHash.query.filter_by(original_id=record.id).order_by(
+                DataHash.created_at.desc()
+            ).first()
+            if data_hash and data_hash.batch_id:
+                return self._verify_batched_hash(data_hash, current_hash, args['hash_value'])
+            
+            # Use receipt data finalized by the confirmation tracker
+            if data_hash and data_hash.tx_status == tx_pipeline.TX_MINED:
+                return {
+                    'valid': current_hash == args['hash_value'],
+                    'current_hash': current_hash,
+                    'provided_hash': args['hash_value'],
+                    'blockchain_verified': True,
+                    'block_number': data_hash.block_number
+                }
+            
             # Verify with blockchain if transaction hash exists
             if record.blockchain_tx_hash and 'medical_record' in self.contracts:
                 try:
                     # Get transaction receipt
-                    tx_receipt = self.w3.eth.get_transaction_receipt(record.blockchain_tx_hash)
-                    if tx_receipt.status == 1:  # Transaction successful
+                    tx_receipt = chain_cache.get_receipt(record.blockchain_tx_hash)
+                    if tx_receipt and tx_receipt.status == 1:  # Transaction successful
                         # Verify hash matches
                         is_valid = current_hash == args['hash_value']
                         return {
@@ -138,8 +278,118 @@ class BlockchainResource(Resource):
         except Exception as e:
             return {'error': str(e)}, 500
     
+    def _verify_bulk(self):
+        """Stream integrity results for many records as NDJSON
+
+        Records are selected by an id list or by patient, doctor,
+        department, record type and creation date filters. One line is
+        written per record, followed by a summary line with throughput.
+        With on_chain=true each anchor is also read back from the contract
+        through bulk getRecord calls.
+        """
+        parser = reqparse.RequestParser()
+        parser.add_argument('record_ids', type=str, action='append')
+        parser.add_argument('patient_id', type=str)
+        parser.add_argument('doctor_id', type=str)
+        parser.add_argument('dept_id', type=str)
+        parser.add_argument('record_type', type=str)
+        parser.add_argument('date_from', type=str)
+        parser.add_argument('date_to', type=str)
+        parser.add_argument('on_chain', type=inputs.boolean, default=False)
+        args = parser.parse_args()
+        on_chain = args.pop('on_chain')
+        
+        if not any(args.values()):
+            return {'error': 'A record_ids list or at least one filter is required'}, 400
+        
+        query = MedicalRecord.query.filter_by(is_active=True)
+        
+        try:
+            if args['record_ids']:
+                query = query.filter(MedicalRecord.id.in_([uuid.UUID(record_id) for record_id in args['record_ids']]))
+            if args['patient_id']:
+                query = query.filter_by(patient_id=uuid.UUID(args['patient_id']))
+            if args['doctor_id']:
+                query = query.filter_by(doctor_id=uuid.UUID(args['doctor_id']))
+        except ValueError:
+            return {'error': 'Invalid record, patient or doctor ID'}, 400
+        
+        if args['dept_id']:
+            query = query.join(Doctor, Doctor.id == MedicalRecord.doctor_id).filter(Doctor.dept_id == args['dept_id'])
+        
+        if args['record_type']:
+            query = query.filter(MedicalRecord.record_type == args['record_type'])
+        
+        try:
+            if args['date_from']:
+                query = query.filter(MedicalRecord.created_at >= datetime.fromisoformat(args['date_from']))
+            if args['date_to']:
+                query = query.filter(MedicalRecord.created_at <= datetime.fromisoformat(args['date_to']))
+        except ValueError:
+            return {'error': 'Invalid date format'}, 400
+        
+        chunk_size = current_app.config.get('INTEGRITY_CHUNK_SIZE', 500)
+        
+        def generate():
+            stats = integrity.VerificationStats()
+            for result in integrity.verify_chunks(integrity.iter_record_chunks(query, chunk_size), on_chain=on_chain):
+                stats.add(result)
+                yield json.dumps(dict(result, type='result')) + '\n'
+            yield json.dumps(dict(stats.to_dict(), type='summary')) + '\n'
+        
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    
+    def _verify_batched_hash(self, data_hash, current_hash, provided_hash):
+        """Verify a record hash against the Merkle root it was anchored under"""
+        batch = data_hash.batch
+        result = {
+            'valid': current_hash == provided_hash,
+            'current_hash': current_hash,
+            'provided_hash': provided_hash,
+            'merkle_verified': hash_anchor.verify_inclusion(data_hash, current_hash),
+            'batch_id': str(batch.id),
+            'merkle_root': batch.merkle_root,
+            'leaf_index': data_hash.leaf_index,
+            'merkle_proof': json.loads(data_hash.merkle_proof),
+            'blockchain_verified': False
+        }
+        
+        if batch.tx_status == tx_pipeline.TX_MINED:
+            result['blockchain_verified'] = True
+            result['block_number'] = batch.block_number
+        elif batch.tx_hash and 'medical_record' in self.contracts:
+            try:
+                tx_receipt = chain_cache.get_receipt(batch.tx_hash)
+                if tx_receipt and tx_receipt.status == 1:  # Transaction successful
+                    result['blockchain_verified'] = True
+                    result['block_number'] = tx_receipt.blockNumber
+            except Exception as e:
+                return {'error': f'Blockchain verification failed: {str(e)}'}, 500
+        
+        return result
+    
+    def _get_job(self):
+        """Get the state of a queued transaction job"""
+        parser = reqparse.RequestParser()
+        parser.add_argument('job_id', required=True)
+        args = parser.parse_args()
+        
+        result = AsyncResult(args['job_id'], app=celery)
+        response = {
+            'job_id': args['job_id'],
+            'state': result.state
+        }
+        if result.successful():
+            if isinstance(result.result, dict):
+                response.update(result.result)
+            else:
+                response['result'] = result.result
+        elif result.failed():
+            response['error'] = str(result.result)
+        return response
+    
     def _store_data_hash(self):
-        """Store data hash on blockchain"""
+        """Queue data hash storage on blockchain"""
         parser = reqparse.RequestParser()
         parser.add_argument('record_id', required=True)
         parser.add_argument('record_type', required=True)
@@ -153,60 +403,72 @@ class BlockchainResource(Resource):
             if not record:
                 return {'error': 'Record not found'}, 404
             
-            # Calculate hash
-            hash_value = record.calculate_hash()
-            
-            # Store on blockchain
-            if 'medical_record' in self.contracts:
-                contract = self.contracts['medical_record']
-                
-                # Prepare transaction
-                tx = contract.functions.createRecord(
-                    args['record_id'],
-                    args['patient_id'],
-                    args['doctor_id'],
-                    args['record_type'],
-                    hash_value
-                ).build_transaction({
-                    'from': get_jwt_identity(),
-                    'gas': 200000,
-                    'gasPrice': self.w3.eth.gas_price
-                })
-                
-                # Sign and send transaction
-                # Note: In production, you would use a proper wallet or key management system
-                # For demo purposes, we'll simulate the transaction
-                tx_hash = "0x" + "0" * 64  # Simulated transaction hash
-                
-                # Update record with blockchain information
-                record.blockchain_tx_hash = tx_hash
-                record.blockchain_hash = hash_value
-                
-                # Store hash record
-                data_hash = DataHash(
-                    data_type=args['record_type'],
-                    original_id=record.id,
-                    hash_value=hash_value,
-                    tx_hash=tx_hash,
-                    contract_address=contract.address
-                )
-                
-                db.session.add(data_hash)
-                db.session.commit()
-                
+            # Queue the hash for the next Merkle batch in batch mode
+            if hash_anchor.is_batch_mode():
+                data_hash = hash_anchor.enqueue_hash(record, args['record_type'])
+                batch = hash_anchor.flush_batch()
                 return {
-                    'message': 'Data hash stored successfully',
-                    'tx_hash': tx_hash,
-                    'hash_value': hash_value
-                }
-            else:
+                    'message': 'Data hash queued for batch anchoring',
+                    'hash_value': data_hash.hash_value,
+                    'batch_id': str(batch.id) if batch else None,
+                    'job_id': batch.job_id if batch else None,
+                    'tx_status': tx_pipeline.TX_PENDING
+                }, 202
+            
+            if 'medical_record' not in self.contracts:
                 return {'error': 'MedicalRecord contract not available'}, 500
+            
+            # Calculate hash
+            hash_value = record.update_hash()
+            
+            # Store hash record; the worker fills in the transaction hash
+            data_hash = DataHash(
+                data_type=args['record_type'],
+                original_id=record.id,
+                hash_value=hash_value,
+                contract_address=self.contracts['medical_record'].address,
+                tx_status=tx_pipeline.TX_PENDING,
+                job_id=tx_pipeline.new_job_id()
+            )
+            
+            db.session.add(data_hash)
+            db.session.commit()
+            
+            tx_pipeline.queue_transaction(
+                data_hash.job_id,
+                'medical_record',
+                'createRecord',
+                [args['record_id'], args['patient_id'], args['doctor_id'], args['record_type'], hash_value],
+                200000,
+                target={'type': 'data_hash', 'id': str(data_hash.id)}
+            )
+            
+            return {
+                'message': 'Data hash submission queued',
+                'job_id': data_hash.job_id,
+                'tx_status': data_hash.tx_status,
+                'hash_value': hash_value
+            }, 202
                 
         except Exception as e:
             return {'error': str(e)}, 500
     
+    def _flush_hash_batch(self):
+        """Anchor pending record hashes without waiting for the batch window"""
+        try:
+            batch = hash_anchor.flush_batch(force=True)
+            if not batch:
+                return {'message': 'No pending hashes to anchor'}
+            
+            return {
+                'message': 'Hash batch queued for anchoring',
+                'batch': batch.to_dict()
+            }, 202
+        except Exception as e:
+            return {'error': str(e)}, 500
+    
     def _grant_access(self):
-        """Grant access to medical data"""
+        """Queue an access grant for medical data"""
         parser = reqparse.RequestParser()
         parser.add_argument('grant_id', required=True)
         parser.add_argument('grantee_address', required=True)
@@ -216,69 +478,139 @@ class BlockchainResource(Resource):
         args = parser.parse_args()
         
         try:
-            if 'access_control' in self.contracts:
-                contract = self.contracts['access_control']
-                
-                # Prepare transaction
-                tx = contract.functions.grantAccess(
-                    args['grant_id'],
-                    args['grantee_address'],
-                    args['data_id'],
-                    args['data_type'],
-                    args['duration']
-                ).build_transaction({
-                    'from': get_jwt_identity(),
-                    'gas': 200000,
-                    'gasPrice': self.w3.eth.gas_price
-                })
-                
-                # Simulate transaction
-                tx_hash = "0x" + "0" * 64
-                
-                return {
-                    'message': 'Access granted successfully',
-                    'tx_hash': tx_hash,
-                    'grant_id': args['grant_id']
-                }
-            else:
+            grant_uuid = uuid.UUID(args['grant_id'])
+            data_uuid = uuid.UUID(args['data_id'])
+        except ValueError:
+            return {'error': 'Invalid grant or data ID'}, 400
+        
+        try:
+            if 'access_control' not in self.contracts:
                 return {'error': 'AccessControl contract not available'}, 500
+            
+            grantee_address = Web3.to_checksum_address(args['grantee_address'])
+            grant = AccessGrant(
+                id=grant_uuid,
+                grantor_addr=tx_pipeline.get_signer().address,
+                grantee_addr=grantee_address,
+                data_id=data_uuid,
+                data_type=args['data_type'],
+                expire_time=datetime.utcnow() + timedelta(seconds=args['duration']),
+                tx_status=tx_pipeline.TX_PENDING,
+                job_id=tx_pipeline.new_job_id()
+            )
+            
+            db.session.add(grant)
+            db.session.commit()
+            
+            tx_pipeline.queue_transaction(
+                grant.job_id,
+                'access_control',
+                'grantAccess',
+                [args['grant_id'], grantee_address, args['data_id'], args['data_type'], args['duration']],
+                200000,
+                target={'type': 'access_grant', 'id': str(grant.id)}
+            )
+            
+            return {
+                'message': 'Access grant queued',
+                'job_id': grant.job_id,
+                'tx_status': grant.tx_status,
+                'grant_id': args['grant_id']
+            }, 202
                 
         except Exception as e:
+            db.session.rollback()
             return {'error': str(e)}, 500
     
+    def _check_access(self):
+        """Check whether an address holds a live grant for a record"""
+        parser = reqparse.RequestParser()
+        parser.add_argument('grantee_address', required=True)
+        parser.add_argument('data_id', required=True)
+        args = parser.parse_args()
+        
+        try:
+            expire_time = access_index.get_expiry(args['grantee_address'], args['data_id'])
+            pending_expire_time = access_index.get_pending_expiry(args['grantee_address'], args['data_id'])
+        except Exception as e:
+            return {'error': str(e)}, 500
+        
+        # Grants whose transaction is not mined yet are reported, not honoured
+        return {
+            'grantee_address': args['grantee_address'],
+            'data_id': args['data_id'],
+            'has_access': expire_time is not None,
+            'expire_time': expire_time.isoformat() if expire_time else None,
+            'pending': pending_expire_time is not None
+        }
+    
+    def _check_access_batch(self):
+        """Check one address against many records, e.g. for list pages"""
+        parser = reqparse.RequestParser()
+        parser.add_argument('grantee_address', required=True)
+        parser.add_argument('data_ids', type=str, action='append', required=True)
+        args = parser.parse_args()
+        
+        if len(args['data_ids']) > 1000:
+            return {'error': 'At most 1000 data IDs per request'}, 400
+        
+        try:
+            results = access_index.check_many(args['grantee_address'], args['data_ids'])
+        except Exception as e:
+            return {'error': str(e)}, 500
+        
+        return {
+            'grantee_address': args['grantee_address'],
+            'results': results
+        }
+    
     def _revoke_access(self):
-        """Revoke access to medical data"""
+        """Queue an access revocation for medical data"""
         parser = reqparse.RequestParser()
         parser.add_argument('grant_id', required=True)
         args = parser.parse_args()
         
         try:
-            if 'access_control' in self.contracts:
-                contract = self.contracts['access_control']
-                
-                # Prepare transaction
-                tx = contract.functions.revokeAccess(args['grant_id']).build_transaction({
-                    'from': get_jwt_identity(),
-                    'gas': 100000,
-                    'gasPrice': self.w3.eth.gas_price
-                })
-                
-                # Simulate transaction
-                tx_hash = "0x" + "0" * 64
-                
-                return {
-                    'message': 'Access revoked successfully',
-                    'tx_hash': tx_hash,
-                    'grant_id': args['grant_id']
-                }
-            else:
+            grant_uuid = uuid.UUID(args['grant_id'])
+        except ValueError:
+            return {'error': 'Invalid grant ID'}, 400
+        
+        try:
+            if 'access_control' not in self.contracts:
                 return {'error': 'AccessControl contract not available'}, 500
+            
+            grant = AccessGrant.query.get(grant_uuid)
+            if not grant:
+                return {'error': 'Access grant not found'}, 404
+            
+            grant.is_active = False
+            grant.tx_status = tx_pipeline.TX_PENDING
+            grant.tx_error = None
+            grant.job_id = tx_pipeline.new_job_id()
+            db.session.commit()
+            
+            tx_pipeline.queue_transaction(
+                grant.job_id,
+                'access_control',
+                'revokeAccess',
+                [args['grant_id']],
+                100000,
+                target={'type': 'access_revoke', 'id': str(grant.id)}
+            )
+            
+            return {
+                'message': 'Access revocation queued',
+                'job_id': grant.job_id,
+                'tx_status': grant.tx_status,
+                'grant_id': args['grant_id']
+            }, 202
                 
         except Exception as e:
+            db.session.rollback()
             return {'error': str(e)}, 500
     
     def _create_trace_item(self):
-        """Create traceable item"""
+        """Queue creation of a traceable item"""
         parser = reqparse.RequestParser()
         parser.add_argument('item_id', required=True)
         parser.add_argument('name', required=True)
@@ -291,11 +623,17 @@ class BlockchainResource(Resource):
         args = parser.parse_args()
         
         try:
-            if 'drug_trace' in self.contracts:
-                contract = self.contracts['drug_trace']
-                
-                # Prepare transaction
-                tx = contract.functions.createItem(
+            if 'drug_trace' not in self.contracts:
+                return {'error': 'DrugTrace contract not available'}, 500
+            
+            trace_index.register_item(args['item_id'], args['name'], args['manufacturer'], args['batch_number'])
+            db.session.commit()
+            
+            job_id = tx_pipeline.queue_transaction(
+                tx_pipeline.new_job_id(),
+                'drug_trace',
+                'createItem',
+                [
                     args['item_id'],
                     args['name'],
                     args['specification'],
@@ -304,22 +642,17 @@ class BlockchainResource(Resource):
                     args['production_date'],
                     args['expiry_date'],
                     args['category']
-                ).build_transaction({
-                    'from': get_jwt_identity(),
-                    'gas': 300000,
-                    'gasPrice': self.w3.eth.gas_price
-                })
-                
-                # Simulate transaction
-                tx_hash = "0x" + "0" * 64
-                
-                return {
-                    'message': 'Traceable item created successfully',
-                    'tx_hash': tx_hash,
-                    'item_id': args['item_id']
-                }
-            else:
-                return {'error': 'DrugTrace contract not available'}, 500
+                ],
+                300000
+            )
+            
+            return {
+                'message': 'Traceable item creation queued',
+                'job_id': job_id,
+                'tx_status': tx_pipeline.TX_PENDING,
+                'item_id': args['item_id']
+            }, 202
                 
         except Exception as e:
+            db.session.rollback()
             return {'error': str(e)}, 500
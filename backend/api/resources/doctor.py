@@ -6,6 +6,9 @@ from flask_restful import Resource, reqparse
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from models.doctor import Doctor
 from extensions import db
+from api.pagination import InvalidCursor, add_pagination_arguments, paginate
+from api.serializer import schema_for
+from services import search
 import uuid
 
 class DoctorListResource(Resource):
@@ -14,36 +17,36 @@ class DoctorListResource(Resource):
     def get(self):
         """Get all doctors"""
         parser = reqparse.RequestParser()
-        parser.add_argument('page', type=int, default=1)
-        parser.add_argument('per_page', type=int, default=20)
+        add_pagination_arguments(parser)
         parser.add_argument('search', type=str)
         parser.add_argument('dept_id', type=str)
         args = parser.parse_args()
         
         query = Doctor.query.filter_by(is_active=True)
+        # Equality filters for count estimation, None once others apply
+        filters = {'is_active': True}
         
         if args['search']:
-            query = query.filter(
-                Doctor.name.ilike(f"%{args['search']}%") |
-                Doctor.license_no.ilike(f"%{args['search']}%") |
-                Doctor.specialization.ilike(f"%{args['search']}%")
-            )
+            query = search.apply_search(query, Doctor, args['search'])
+            filters = None
         
         if args['dept_id']:
             query = query.filter_by(dept_id=args['dept_id'])
+            if filters is not None:
+                filters['dept_id'] = args['dept_id']
         
-        doctors = query.paginate(
-            page=args['page'],
-            per_page=args['per_page'],
-            error_out=False
-        )
-        
-        return {
-            'doctors': [doctor.to_dict() for doctor in doctors.items],
-            'total': doctors.total,
-            'pages': doctors.pages,
-            'current_page': doctors.page
-        }
+        try:
+            return paginate(
+                query,
+                (Doctor.created_at, Doctor.id),
+                args,
+                'doctors',
+                schema_for(Doctor).rows,
+                ranked=bool(args['search']),
+                filters=filters
+            )
+        except InvalidCursor as e:
+            return {'error': str(e)}, 400
     
     @jwt_required()
     def post(self):
@@ -128,6 +131,10 @@ class DoctorResource(Resource):
             if value is not None:
                 setattr(doctor, key, value)
         
+        if args['dept_id'] is not None:
+            # Schedules carry the department for slot lookups
+            doctor.schedules.update({'dept_id': args['dept_id']}, synchronize_session=False)
+        
         db.session.commit()
         return doctor.to_dict()
     
@@ -0,0 +1,60 @@
+"""
+Bulk export API resources for Web3 HMS
+"""
+
+from flask import Response, stream_with_context
+from flask_restful import Resource, reqparse
+from flask_jwt_extended import jwt_required
+from models.appointment import Appointment
+from models.medical_record import MedicalRecord
+from models.patient import Patient
+from api.export import FORMATS, export_filename, stream_export
+from api.projection import apply_projection, parse_projection
+from api.serializer import schema_for
+from api.resources import appointment, medical_record, patient
+
+# Model, export order and filters of each dataset, shared with the list endpoints
+DATASETS = {
+    'patients': (Patient, (Patient.created_at, Patient.id), patient.add_filter_arguments, patient.filter_patients),
+    'appointments': (
+        Appointment, (Appointment.schedule_time, Appointment.id),
+        appointment.add_filter_arguments, appointment.filter_appointments
+    ),
+    'medical-records': (
+        MedicalRecord, (MedicalRecord.created_at, MedicalRecord.id),
+        medical_record.add_filter_arguments, medical_record.filter_records
+    ),
+}
+
+
+class ExportResource(Resource):
+    """Streaming export of a whole filtered listing"""
+
+    @jwt_required()
+    def get(self, dataset):
+        """Export every row of ``dataset`` matching the list filters"""
+        if dataset not in DATASETS:
+            return {'error': f"Unknown dataset, expected one of: {', '.join(DATASETS)}"}, 404
+        model, keys, add_filter_arguments, filter_query = DATASETS[dataset]
+
+        parser = reqparse.RequestParser()
+        add_filter_arguments(parser)
+        parser.add_argument('format', type=str, default='ndjson', choices=tuple(FORMATS))
+        parser.add_argument('view', type=str)
+        parser.add_argument('fields', type=str)
+        args = parser.parse_args()
+
+        try:
+            projection = parse_projection(model, args['view'], args['fields'])
+            query, _ = filter_query(args)
+        except ValueError as e:
+            return {'error': str(e)}, 400
+
+        query = apply_projection(query, model, projection)
+        chunks = stream_export(query, model, keys, schema_for(model, projection), args['format'])
+
+        response = Response(stream_with_context(chunks), mimetype=FORMATS[args['format']][0])
+        response.headers['Content-Disposition'] = f"attachment; filename={export_filename(dataset, args['format'])}"
+        # Let nginx pass chunks through as they are produced
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
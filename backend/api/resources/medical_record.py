@@ -2,66 +2,101 @@
 Medical Record API resources for Web3 HMS
 """
 
+from flask import Response, request
 from flask_restful import Resource, reqparse
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from models.medical_record import MedicalRecord
 from models.patient import Patient
 from models.doctor import Doctor
 from extensions import db
+from services import search
+from api.pagination import InvalidCursor, add_pagination_arguments, paginate
+from api.projection import apply_projection, parse_projection
+from api.serializer import schema_for
+from services.content_store import ContentUnavailable, content_store, offload_record
 import uuid
 
+
+def add_filter_arguments(parser):
+    """Add the filters of the medical record list to ``parser``"""
+    parser.add_argument('patient_id', type=str)
+    parser.add_argument('doctor_id', type=str)
+    parser.add_argument('record_type', type=str)
+    parser.add_argument('search', type=str)
+
+
+def filter_records(args):
+    """Medical records matching the filters in ``args``
+
+    Returns the query with its equality filters for count estimation, None
+    once other conditions apply. Raises ValueError on a malformed filter.
+    """
+    query = MedicalRecord.query.filter_by(is_active=True)
+    filters = {'is_active': True}
+    
+    if args['patient_id']:
+        try:
+            query = query.filter_by(patient_id=uuid.UUID(args['patient_id']))
+        except ValueError:
+            raise ValueError('Invalid patient ID') from None
+        filters = None
+    
+    if args['doctor_id']:
+        try:
+            query = query.filter_by(doctor_id=uuid.UUID(args['doctor_id']))
+        except ValueError:
+            raise ValueError('Invalid doctor ID') from None
+        filters = None
+    
+    if args['record_type']:
+        query = query.filter_by(record_type=args['record_type'])
+        if filters is not None:
+            filters['record_type'] = args['record_type']
+    
+    if args['search']:
+        query = search.apply_search(query, MedicalRecord, args['search'])
+        filters = None
+    
+    return query, filters
+
+
 class MedicalRecordListResource(Resource):
     """Medical Record list resource"""
     
     def get(self):
         """Get all medical records"""
         parser = reqparse.RequestParser()
-        parser.add_argument('page', type=int, default=1)
-        parser.add_argument('per_page', type=int, default=20)
-        parser.add_argument('patient_id', type=str)
-        parser.add_argument('doctor_id', type=str)
-        parser.add_argument('record_type', type=str)
-        parser.add_argument('search', type=str)
+        add_pagination_arguments(parser)
+        add_filter_arguments(parser)
+        parser.add_argument('view', type=str)
+        parser.add_argument('fields', type=str)
         args = parser.parse_args()
         
-        query = MedicalRecord.query.filter_by(is_active=True)
-        
-        if args['patient_id']:
-            try:
-                patient_uuid = uuid.UUID(args['patient_id'])
-                query = query.filter_by(patient_id=patient_uuid)
-            except ValueError:
-                return {'error': 'Invalid patient ID'}, 400
-        
-        if args['doctor_id']:
-            try:
-                doctor_uuid = uuid.UUID(args['doctor_id'])
-                query = query.filter_by(doctor_id=doctor_uuid)
-            except ValueError:
-                return {'error': 'Invalid doctor ID'}, 400
-        
-        if args['record_type']:
-            query = query.filter_by(record_type=args['record_type'])
-        
-        if args['search']:
-            query = query.filter(
-                MedicalRecord.title.ilike(f"%{args['search']}%") |
-                MedicalRecord.content.ilike(f"%{args['search']}%") |
-                MedicalRecord.diagnosis.ilike(f"%{args['search']}%")
-            )
+        try:
+            projection = parse_projection(MedicalRecord, args['view'], args['fields'])
+        except ValueError as e:
+            return {'error': str(e)}, 400
         
-        records = query.paginate(
-            page=args['page'],
-            per_page=args['per_page'],
-            error_out=False
-        )
+        try:
+            query, filters = filter_records(args)
+        except ValueError as e:
+            return {'error': str(e)}, 400
         
-        return {
-            'records': [record.to_dict() for record in records.items],
-            'total': records.total,
-            'pages': records.pages,
-            'current_page': records.page
-        }
+        keys = (MedicalRecord.created_at, MedicalRecord.id)
+        query = apply_projection(query, MedicalRecord, projection, keys)
+        
+        try:
+            return paginate(
+                query,
+                keys,
+                args,
+                'records',
+                schema_for(MedicalRecord, projection).rows,
+                ranked=bool(args['search']),
+                filters=filters
+            )
+        except InvalidCursor as e:
+            return {'error': str(e)}, 400
     
     @jwt_required()
     def post(self):
@@ -110,8 +145,9 @@ class MedicalRecordListResource(Resource):
             is_confidential=args['is_confidential']
         )
         
-        # Calculate blockchain hash
-        record.blockchain_hash = record.calculate_hash()
+        # Calculate blockchain hash, then move a large body to IPFS
+        record.update_hash()
+        offload_record(record)
         
         db.session.add(record)
         db.session.commit()
@@ -162,7 +198,8 @@ class MedicalRecordResource(Resource):
         
         # Recalculate blockchain hash if content changed
         if any(args[key] is not None for key in ['title', 'content', 'diagnosis', 'treatment', 'prescription']):
-            record.blockchain_hash = record.calculate_hash()
+            record.update_hash()
+            offload_record(record)
         
         db.session.commit()
         return record.to_dict()
@@ -180,3 +217,53 @@ class MedicalRecordResource(Resource):
         db.session.commit()
         
         return {'message': 'Medical record deactivated successfully'}
+
+class MedicalRecordAttachmentResource(Resource):
+    """Medical record attachment stored in IPFS"""
+    
+    def get(self, record_id):
+        """Download the attachment of a medical record"""
+        try:
+            record_uuid = uuid.UUID(record_id)
+        except ValueError:
+            return {'error': 'Invalid record ID'}, 400
+        
+        record = MedicalRecord.query.get_or_404(record_uuid)
+        if not record.ipfs_cid:
+            return {'error': 'Record has no attachment'}, 404
+        
+        try:
+            data = content_store.get(record.ipfs_cid)
+        except ContentUnavailable as e:
+            return {'error': str(e)}, 502
+        
+        return Response(data, mimetype='application/octet-stream', headers={
+            'Content-Disposition': f'attachment; filename={record.ipfs_cid}',
+            'Cache-Control': 'private, max-age=31536000, immutable'
+        })
+    
+    @jwt_required()
+    def post(self, record_id):
+        """Upload an attachment to IPFS and link it to a medical record"""
+        try:
+            record_uuid = uuid.UUID(record_id)
+        except ValueError:
+            return {'error': 'Invalid record ID'}, 400
+        
+        record = MedicalRecord.query.get_or_404(record_uuid)
+        upload = request.files.get('file')
+        if upload is None:
+            return {'error': 'File is required'}, 400
+        
+        data = upload.read()
+        try:
+            record.ipfs_cid = content_store.put(data)
+        except Exception as e:
+            return {'error': f'Failed to store attachment: {e}'}, 502
+        
+        db.session.commit()
+        return {
+            'record_id': str(record.id),
+            'ipfs_cid': record.ipfs_cid,
+            'size': len(data)
+        }, 201
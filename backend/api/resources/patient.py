@@ -2,44 +2,69 @@
 Patient API resources for Web3 HMS
 """
 
-from flask_restful import Resource, reqparse
+from flask import request
+from flask_restful import Resource, inputs, reqparse
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from models.patient import Patient
 from extensions import db
+from services import patient_import, search
+from api.pagination import InvalidCursor, add_pagination_arguments, paginate
+from api.projection import apply_projection, parse_projection
+from api.serializer import schema_for
+import csv
 import uuid
 
+
+def add_filter_arguments(parser):
+    """Add the filters of the patient list to ``parser``"""
+    parser.add_argument('search', type=str)
+
+
+def filter_patients(args):
+    """Patients matching the filters in ``args``
+
+    Returns the query with its equality filters for count estimation, None
+    once other conditions apply.
+    """
+    query = Patient.query.filter_by(is_active=True)
+    if args['search']:
+        return search.apply_search(query, Patient, args['search']), None
+    return query, {'is_active': True}
+
+
 class PatientListResource(Resource):
     """Patient list resource"""
     
     def get(self):
         """Get all patients"""
         parser = reqparse.RequestParser()
-        parser.add_argument('page', type=int, default=1)
-        parser.add_argument('per_page', type=int, default=20)
-        parser.add_argument('search', type=str)
+        add_pagination_arguments(parser)
+        add_filter_arguments(parser)
+        parser.add_argument('view', type=str)
+        parser.add_argument('fields', type=str)
         args = parser.parse_args()
         
-        query = Patient.query.filter_by(is_active=True)
-        
-        if args['search']:
-            query = query.filter(
-                Patient.name.ilike(f"%{args['search']}%") |
-                Patient.id_card.ilike(f"%{args['search']}%") |
-                Patient.medical_card_id.ilike(f"%{args['search']}%")
-            )
+        try:
+            projection = parse_projection(Patient, args['view'], args['fields'])
+        except ValueError as e:
+            return {'error': str(e)}, 400
         
-        patients = query.paginate(
-            page=args['page'],
-            per_page=args['per_page'],
-            error_out=False
-        )
+        query, filters = filter_patients(args)
+        keys = (Patient.created_at, Patient.id)
+        query = apply_projection(query, Patient, projection, keys)
         
-        return {
-            'patients': [patient.to_dict() for patient in patients.items],
-            'total': patients.total,
-            'pages': patients.pages,
-            'current_page': patients.page
-        }
+        try:
+            return paginate(
+                query,
+                keys,
+                args,
+                'patients',
+                schema_for(Patient, projection).rows,
+                ranked=bool(args['search']),
+                filters=filters
+            )
+        except InvalidCursor as e:
+            return {'error': str(e)}, 400
     
     @jwt_required()
     def post(self):
@@ -90,6 +115,42 @@ class PatientListResource(Resource):
         
         return patient.to_dict(), 201
 
+class PatientImportResource(Resource):
+    """Bulk patient import resource
+    
+    Rosters larger than MAX_CONTENT_LENGTH are imported with
+    ``python -m services.patient_import`` instead.
+    """
+    
+    @jwt_required()
+    def post(self):
+        """Import patients from an uploaded CSV or NDJSON roster"""
+        parser = reqparse.RequestParser()
+        parser.add_argument('format', type=str, choices=patient_import.FORMATS, location='args')
+        parser.add_argument('on_conflict', type=str, default='skip', choices=patient_import.CONFLICT_MODES, location='args')
+        parser.add_argument('dry_run', type=inputs.boolean, default=False, location='args')
+        args = parser.parse_args()
+        
+        # A multipart upload in the "file" field, or the roster as the request body
+        upload = request.files.get('file')
+        if upload is not None:
+            stream, name, mimetype = upload.stream, upload.filename or '', upload.mimetype
+        else:
+            stream, name, mimetype = request.stream, '', request.mimetype
+        import_format = args['format']
+        if import_format is None:
+            ndjson = name.endswith(('.ndjson', '.jsonl')) or mimetype in ('application/x-ndjson', 'application/jsonl')
+            import_format = 'ndjson' if ndjson else 'csv'
+        
+        try:
+            report = patient_import.import_patients(stream, import_format, args['on_conflict'], args['dry_run'])
+        except UnicodeDecodeError:
+            return {'error': 'Roster is not UTF-8 encoded'}, 400
+        except csv.Error as e:
+            return {'error': f'Malformed CSV: {e}'}, 400
+        return report
+
+
 class PatientResource(Resource):
     """Individual patient resource"""
     
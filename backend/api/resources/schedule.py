@@ -0,0 +1,145 @@
+"""
+Doctor schedule API resources for Web3 HMS
+"""
+
+from flask_restful import Resource, reqparse
+from flask_jwt_extended import jwt_required
+from models.doctor import Doctor
+from models.doctor_schedule import DoctorSchedule
+from extensions import db
+from api.serializer import schema_for
+from services import scheduling
+import uuid
+from datetime import date, time
+
+
+def _parse_fields(args):
+    """Typed template values from the strings in ``args``, skipping missing ones"""
+    values = {}
+    for name in ('start_time', 'end_time'):
+        if args[name] is not None:
+            try:
+                values[name] = time.fromisoformat(args[name])
+            except ValueError:
+                raise ValueError(f'Invalid {name} format, expected HH:MM') from None
+    for name in ('valid_from', 'valid_until'):
+        if args[name] is not None:
+            try:
+                values[name] = date.fromisoformat(args[name]) if args[name] else None
+            except ValueError:
+                raise ValueError(f'Invalid {name} format, expected YYYY-MM-DD') from None
+    for name in ('weekday', 'slot_minutes', 'is_active'):
+        if args.get(name) is not None:
+            values[name] = args[name]
+    return values
+
+
+def _add_template_arguments(parser, required):
+    parser.add_argument('weekday', type=int, required=required, help='Weekday (0 = Monday) is required')
+    parser.add_argument('start_time', type=str, required=required, help='Start time is required')
+    parser.add_argument('end_time', type=str, required=required, help='End time is required')
+    parser.add_argument('slot_minutes', type=int)
+    parser.add_argument('valid_from', type=str)
+    parser.add_argument('valid_until', type=str)
+
+
+class DoctorScheduleListResource(Resource):
+    """Weekly schedule templates of a doctor"""
+
+    def get(self, doctor_id):
+        """Get the schedule templates of a doctor"""
+        try:
+            doctor_uuid = uuid.UUID(doctor_id)
+        except ValueError:
+            return {'error': 'Invalid doctor ID'}, 400
+
+        doctor = Doctor.query.get_or_404(doctor_uuid)
+        schedules = doctor.schedules.order_by(DoctorSchedule.weekday, DoctorSchedule.start_time).all()
+        return {'schedules': schema_for(DoctorSchedule).rows(schedules)}
+
+    @jwt_required()
+    def post(self, doctor_id):
+        """Add a schedule template"""
+        try:
+            doctor_uuid = uuid.UUID(doctor_id)
+        except ValueError:
+            return {'error': 'Invalid doctor ID'}, 400
+
+        doctor = Doctor.query.get_or_404(doctor_uuid)
+
+        parser = reqparse.RequestParser()
+        _add_template_arguments(parser, required=True)
+        args = parser.parse_args()
+
+        schedule = DoctorSchedule(doctor_id=doctor.id, dept_id=doctor.dept_id, slot_minutes=15, is_active=True)
+        try:
+            for key, value in _parse_fields(args).items():
+                setattr(schedule, key, value)
+            scheduling.validate_schedule(schedule)
+        except ValueError as e:
+            return {'error': str(e)}, 400
+
+        db.session.add(schedule)
+        db.session.commit()
+
+        return schedule.to_dict(), 201
+
+
+class DoctorScheduleResource(Resource):
+    """Individual schedule template"""
+
+    @staticmethod
+    def _get_schedule(doctor_id, schedule_id):
+        doctor_uuid = uuid.UUID(doctor_id)
+        schedule_uuid = uuid.UUID(schedule_id)
+        return DoctorSchedule.query.filter_by(id=schedule_uuid, doctor_id=doctor_uuid).first_or_404()
+
+    def get(self, doctor_id, schedule_id):
+        """Get schedule template by ID"""
+        try:
+            schedule = self._get_schedule(doctor_id, schedule_id)
+        except ValueError:
+            return {'error': 'Invalid doctor or schedule ID'}, 400
+        return schedule.to_dict()
+
+    @jwt_required()
+    def put(self, doctor_id, schedule_id):
+        """Update schedule template
+
+        Booked appointments are kept as they are; the new hours apply to
+        the slots offered and booked from now on.
+        """
+        try:
+            schedule = self._get_schedule(doctor_id, schedule_id)
+        except ValueError:
+            return {'error': 'Invalid doctor or schedule ID'}, 400
+
+        parser = reqparse.RequestParser()
+        _add_template_arguments(parser, required=False)
+        parser.add_argument('is_active', type=bool)
+        args = parser.parse_args()
+
+        try:
+            for key, value in _parse_fields(args).items():
+                setattr(schedule, key, value)
+            with db.session.no_autoflush:
+                scheduling.validate_schedule(schedule)
+        except ValueError as e:
+            db.session.rollback()
+            return {'error': str(e)}, 400
+
+        db.session.commit()
+        return schedule.to_dict()
+
+    @jwt_required()
+    def delete(self, doctor_id, schedule_id):
+        """Deactivate schedule template"""
+        try:
+            schedule = self._get_schedule(doctor_id, schedule_id)
+        except ValueError:
+            return {'error': 'Invalid doctor or schedule ID'}, 400
+
+        schedule.is_active = False
+        db.session.commit()
+
+        return {'message': 'Schedule deactivated successfully'}
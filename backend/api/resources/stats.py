@@ -0,0 +1,54 @@
+"""
+Dashboard and statistics API resources for Web3 HMS
+"""
+
+from flask import current_app
+from flask_restful import Resource, reqparse
+from flask_jwt_extended import jwt_required
+from services import stats
+from datetime import date, timedelta
+
+
+class DashboardStatsResource(Resource):
+    """Headline counters of the dashboard"""
+
+    @jwt_required()
+    def get(self):
+        """Get the dashboard counters from the precomputed aggregates"""
+        counters = stats.dashboard()
+        return {
+            'todayAppointments': counters['today_appointments'],
+            'inpatients': counters['inpatients'],
+            'medicalRecords': counters['medical_records'],
+            'blockchainTx': counters['blockchain_tx'],
+            'refreshedAt': counters['refreshed_at']
+        }
+
+
+class StatisticsResource(Resource):
+    """Statistics over a date range"""
+
+    @jwt_required()
+    def get(self):
+        """Get the statistics of a date range, the last 30 days by default"""
+        parser = reqparse.RequestParser()
+        parser.add_argument('startDate', type=str, location='args')
+        parser.add_argument('endDate', type=str, location='args')
+        parser.add_argument('top', type=int, default=10, location='args')
+        args = parser.parse_args()
+
+        try:
+            last_day = date.fromisoformat(args['endDate']) if args['endDate'] else date.today()
+            first_day = date.fromisoformat(args['startDate']) if args['startDate'] else last_day - timedelta(days=29)
+        except ValueError:
+            return {'error': 'Invalid date format, expected YYYY-MM-DD'}, 400
+
+        max_days = current_app.config.get('STATS_MAX_RANGE_DAYS', 366)
+        if first_day > last_day:
+            return {'error': 'startDate must not be after endDate'}, 400
+        if (last_day - first_day).days + 1 > max_days:
+            return {'error': f'Date range must not exceed {max_days} days'}, 400
+        if not 1 <= args['top'] <= 100:
+            return {'error': 'top must be between 1 and 100'}, 400
+
+        return stats.summary(first_day, last_day, top_doctors=args['top'])
@@ -0,0 +1,146 @@
+"""
+Schema-driven serialization of model rows to JSON
+
+A ``Schema`` is compiled once per model and field selection: the field
+names, one getter reading them all from the loaded instance state and
+converters for the few column types the JSON encoder does not take as
+is. Rows are turned into dictionaries of native values and encoded in
+one call by orjson, which writes UUIDs, dates and datetimes itself,
+instead of formatting every value in Python through ``to_dict`` and the
+stdlib encoder.
+
+Output matches ``to_dict``: UUIDs as strings, dates and datetimes in ISO
+format, numeric columns as numbers, with 0 for NULL, and the text columns
+a model lists in ``JSON_FIELDS`` decoded.
+"""
+
+import json
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+from operator import attrgetter, itemgetter
+
+import orjson
+from flask import current_app, make_response
+from sqlalchemy import Numeric
+
+from api.projection import field_columns
+
+_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+_schemas = {}
+
+
+def _default(value):
+    """Encode the values orjson, or the stdlib fallback, does not know"""
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+def _number(value):
+    return float(value) if value else 0
+
+
+def _json_text(empty):
+    def decode(value):
+        return orjson.loads(value) if value else empty
+    return decode
+
+
+class Schema:
+    """Serializer of one model restricted to ``names``"""
+
+    def __init__(self, model, names=None):
+        columns = field_columns(model)
+        # Internal columns stay out of the default field set, as in to_dict
+        self.names = tuple(names or (name for name in columns if name not in getattr(model, 'PRIVATE_FIELDS', ())))
+        # Models may serve a field from another attribute (``FIELD_SOURCES``)
+        field_sources = getattr(model, 'FIELD_SOURCES', {})
+        sources = tuple(field_sources.get(name, name) for name in self.names)
+        self._attributes = self._getter(attrgetter, sources)
+        # Loaded column values sit in the instance __dict__, where reading
+        # them skips the instrumented attribute descriptors
+        self._computed = tuple(
+            (name, source) for name, source in zip(self.names, sources)
+            if source != name or len(columns[name]) != 1 or columns[name][0].key != name
+        )
+        self._loaded = self._getter(itemgetter, self.names)
+        json_fields = getattr(model, 'JSON_FIELDS', {})
+        converters = []
+        for name in self.names:
+            if name in json_fields:
+                converters.append((name, _json_text(json_fields[name])))
+            elif len(columns[name]) == 1 and isinstance(columns[name][0].type, Numeric):
+                converters.append((name, _number))
+        self._converters = tuple(converters)
+
+    @staticmethod
+    def _getter(factory, names):
+        getter = factory(*names)
+        return getter if len(names) > 1 else lambda source: (getter(source),)
+
+    def _values(self, obj):
+        source = obj.__dict__
+        if self._computed:
+            source = dict(source)
+            source.update((name, getattr(obj, attribute)) for name, attribute in self._computed)
+        try:
+            return self._loaded(source)
+        except KeyError:
+            # Expired or not yet loaded, let the attributes load it
+            return self._attributes(obj)
+
+    def row(self, obj):
+        """Dictionary of native values of one row"""
+        return self.rows((obj,))[0]
+
+    def rows(self, objs):
+        """Dictionaries of native values of ``objs``, ready for ``dumps``"""
+        names = self.names
+        values = self._values
+        rows = [dict(zip(names, values(obj))) for obj in objs]
+        for name, convert in self._converters:
+            for row in rows:
+                row[name] = convert(row[name])
+        return rows
+
+    def dumps(self, objs):
+        """JSON array of ``objs`` as bytes"""
+        return dumps(self.rows(objs))
+
+    def dumps_lines(self, objs):
+        """Newline-delimited JSON of ``objs`` as bytes, one row per line"""
+        return b''.join(dumps(row) + b'\n' for row in self.rows(objs))
+
+
+def schema_for(model, names=None):
+    """Cached ``Schema`` of ``model``, limited to ``names`` when given"""
+    key = (model, tuple(names) if names else None)
+    schema = _schemas.get(key)
+    if schema is None:
+        schema = _schemas[key] = Schema(model, names)
+    return schema
+
+
+def dumps(data, indent=False):
+    """Encode ``data`` to JSON bytes
+
+    Integers beyond 64 bits, such as wei amounts, are not supported by
+    orjson and fall back to the stdlib encoder.
+    """
+    try:
+        return orjson.dumps(data, default=_default, option=_OPTIONS | (orjson.OPT_INDENT_2 if indent else 0))
+    except orjson.JSONEncodeError:
+        return json.dumps(data, default=_default, ensure_ascii=False, indent=2 if indent else None).encode('utf-8')
+
+
+def output_json(data, code, headers=None):
+    """Flask-RESTful representation encoding responses with ``dumps``"""
+    response = make_response(dumps(data, indent=current_app.debug) + b'\n', code)
+    response.headers.extend(headers or {})
+    return response
@@ -13,9 +13,10 @@ import os
 from dotenv import load_dotenv
 
 from config import Config
-from extensions import db, redis_client, init_extensions
+from extensions import db, redis_client, celery, init_extensions
 from api import api_bp
 from models import *  # Import all models to register them
+import tasks  # Import all tasks to register them with the worker
 
 # Load environment variables
 load_dotenv()
@@ -31,14 +31,76 @@ class Config:
     
     # Blockchain configuration
     WEB3_PROVIDER_URL = os.environ.get('WEB3_PROVIDER_URL') or 'http://localhost:8545'
+    WEB3_PROVIDER_MODE = os.environ.get('WEB3_PROVIDER_MODE') or 'http'  # http or sim (in-process simulated chain)
     CONTRACT_ADDRESSES = {
         'MEDICAL_RECORD_HASH': os.environ.get('MEDICAL_RECORD_HASH_ADDRESS'),
         'ACCESS_CONTROL': os.environ.get('ACCESS_CONTROL_ADDRESS'),
         'DRUG_TRACE': os.environ.get('DRUG_TRACE_ADDRESS')
     }
+    BLOCKCHAIN_PRIVATE_KEY = os.environ.get('BLOCKCHAIN_PRIVATE_KEY') or os.environ.get('PRIVATE_KEY')  # Transaction signer
+    WEB3_REQUEST_TIMEOUT = int(os.environ.get('WEB3_REQUEST_TIMEOUT') or 30)
+    WEB3_POOL_SIZE = int(os.environ.get('WEB3_POOL_SIZE') or 10)  # Keep-alive connections per worker
+    CONTRACT_REGISTRY_CHECK_INTERVAL = int(os.environ.get('CONTRACT_REGISTRY_CHECK_INTERVAL') or 5)  # Seconds
+    CONTRACT_REGISTRY_MAX_AGE = int(os.environ.get('CONTRACT_REGISTRY_MAX_AGE') or 300)  # Seconds
+    
+    # Bulk chain read configuration
+    MULTICALL_ADDRESS = os.environ.get('MULTICALL_ADDRESS')  # Multicall3 deployment; empty sends plain eth_call batches
+    CHAIN_RPC_BATCH_SIZE = int(os.environ.get('CHAIN_RPC_BATCH_SIZE') or 100)  # Requests per JSON-RPC batch
+    CHAIN_MULTICALL_SIZE = int(os.environ.get('CHAIN_MULTICALL_SIZE') or 200)  # Calls per aggregate3
+    CHAIN_READ_CONCURRENCY = int(os.environ.get('CHAIN_READ_CONCURRENCY') or 4)  # Batches in flight
+    
+    # Simulated chain configuration (WEB3_PROVIDER_MODE=sim)
+    SIM_CHAIN_ID = int(os.environ.get('SIM_CHAIN_ID') or 1337)
+    SIM_CHAIN_LATENCY_MS = float(os.environ.get('SIM_CHAIN_LATENCY_MS') or 0)  # Mean injected latency per request
+    SIM_CHAIN_JITTER_MS = float(os.environ.get('SIM_CHAIN_JITTER_MS') or 0)  # Standard deviation of the latency
+    SIM_CHAIN_FAILURE_RATE = float(os.environ.get('SIM_CHAIN_FAILURE_RATE') or 0)  # Share of failed requests
+    SIM_CHAIN_REVERT_RATE = float(os.environ.get('SIM_CHAIN_REVERT_RATE') or 0)  # Share of reverted transactions
+    SIM_CHAIN_SEED = int(os.environ['SIM_CHAIN_SEED']) if os.environ.get('SIM_CHAIN_SEED') else None
+    
+    # Hash anchoring configuration
+    HASH_ANCHOR_MODE = os.environ.get('HASH_ANCHOR_MODE', 'single').lower()  # single, batch
+    HASH_BATCH_SIZE = int(os.environ.get('HASH_BATCH_SIZE') or 256)  # Leaves per Merkle batch
+    HASH_BATCH_WINDOW = int(os.environ.get('HASH_BATCH_WINDOW') or 60)  # Seconds before a partial batch is anchored
     
     # IPFS configuration
     IPFS_URL = os.environ.get('IPFS_URL') or 'http://localhost:5001'
+    IPFS_MODE = os.environ.get('IPFS_MODE', 'http').lower()  # http, local (directory stand-in)
+    IPFS_LOCAL_DIR = os.environ.get('IPFS_LOCAL_DIR') or 'ipfs-local'
+    IPFS_TIMEOUT = int(os.environ.get('IPFS_TIMEOUT') or 30)  # Seconds
+    
+    # Record content storage configuration
+    CONTENT_STORAGE = os.environ.get('CONTENT_STORAGE', 'inline').lower()  # inline, ipfs
+    CONTENT_OFFLOAD_THRESHOLD = int(os.environ.get('CONTENT_OFFLOAD_THRESHOLD') or 8192)  # Bytes; smaller bodies stay inline
+    CONTENT_CACHE_DIR = os.environ.get('CONTENT_CACHE_DIR') or 'content-cache'
+    CONTENT_CACHE_MAX_BYTES = int(os.environ.get('CONTENT_CACHE_MAX_BYTES') or 1024 * 1024 * 1024)  # Disk cache budget
+    
+    # Search configuration
+    SEARCH_MAX_FIELD_CHARS = int(os.environ.get('SEARCH_MAX_FIELD_CHARS') or 20000)  # Characters of a field indexed for search
+    SEARCH_REINDEX_INTERVAL = int(os.environ.get('SEARCH_REINDEX_INTERVAL') or 3600)  # Seconds between fills of missing vectors
+    
+    # List count configuration
+    COUNT_COUNTER_TTL = int(os.environ.get('COUNT_COUNTER_TTL') or 3600)  # Seconds before live counters are reseeded
+    COUNT_CACHE_TTL = int(os.environ.get('COUNT_CACHE_TTL') or 30)  # Seconds exact counts stay cached
+    COUNT_ESTIMATE_THRESHOLD = int(os.environ.get('COUNT_ESTIMATE_THRESHOLD') or 100000)  # Planner estimates above this are returned as is
+    
+    # Export configuration
+    EXPORT_CHUNK_SIZE = int(os.environ.get('EXPORT_CHUNK_SIZE') or 2000)  # Rows fetched and encoded per streamed chunk
+    
+    # Patient import configuration
+    IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE') or 5000)  # Rows validated and written per statement
+    IMPORT_ERROR_LIMIT = int(os.environ.get('IMPORT_ERROR_LIMIT') or 1000)  # Rejected rows listed in an import report
+    
+    # Appointment scheduling configuration
+    APPOINTMENT_SLOT_MINUTES = int(os.environ.get('APPOINTMENT_SLOT_MINUTES') or 15)  # Slot booked for doctors without a schedule
+    SLOT_SEARCH_DAYS = int(os.environ.get('SLOT_SEARCH_DAYS') or 7)  # Days covered by a free slot lookup
+    SLOT_SEARCH_MAX_DAYS = int(os.environ.get('SLOT_SEARCH_MAX_DAYS') or 31)  # Longest free slot lookup
+    SLOT_HOLD_TTL = int(os.environ.get('SLOT_HOLD_TTL') or 120)  # Seconds a slot hold lasts unless confirmed
+    
+    # Statistics configuration
+    STATS_REFRESH_INTERVAL = int(os.environ.get('STATS_REFRESH_INTERVAL') or 30)  # Seconds between aggregate refreshes
+    STATS_REFRESH_OVERLAP = int(os.environ.get('STATS_REFRESH_OVERLAP') or 300)  # Seconds of changes re-read for transactions still open
+    STATS_LOCK_TIMEOUT = int(os.environ.get('STATS_LOCK_TIMEOUT') or 600)  # Seconds a refresh may hold the lock
+    STATS_MAX_RANGE_DAYS = int(os.environ.get('STATS_MAX_RANGE_DAYS') or 366)  # Longest statistics date range
     
     # File upload configuration
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
@@ -54,6 +116,49 @@ class Config:
     # Celery configuration
     CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL') or 'redis://localhost:6379/1'
     CELERY_RESULT_BACKEND = os.environ.get('CELERY_RESULT_BACKEND') or 'redis://localhost:6379/1'
+    CELERY_TASK_ALWAYS_EAGER = os.environ.get('CELERY_TASK_ALWAYS_EAGER', 'false').lower() in ['true', 'on', '1']
+    TX_MAX_RETRIES = int(os.environ.get('TX_MAX_RETRIES') or 3)  # Resubmissions after nonce errors
+    TX_CONFIRMATIONS = int(os.environ.get('TX_CONFIRMATIONS') or 3)  # Blocks before a receipt is final
+    TX_TRACKER_INTERVAL = int(os.environ.get('TX_TRACKER_INTERVAL') or 15)  # Seconds between receipt polls
+    TX_TRACKER_BATCH_SIZE = int(os.environ.get('TX_TRACKER_BATCH_SIZE') or 200)  # Tx hashes per poll
+    
+    # Gas price oracle configuration
+    GAS_PRICE_STRATEGY = os.environ.get('GAS_PRICE_STRATEGY', 'standard').lower()  # fast, standard, slow
+    GAS_BASE_FEE_MULTIPLIER = float(os.environ.get('GAS_BASE_FEE_MULTIPLIER') or 2)  # Base fee headroom of the fee cap
+    GAS_ORACLE_BLOCKS = int(os.environ.get('GAS_ORACLE_BLOCKS') or 20)  # Blocks of fee history sampled
+    GAS_ORACLE_INTERVAL = int(os.environ.get('GAS_ORACLE_INTERVAL') or 10)  # Seconds between refreshes
+    GAS_ORACLE_TTL = int(os.environ.get('GAS_ORACLE_TTL') or 30)  # Seconds a shared price stays valid
+    GAS_ORACLE_LOCAL_TTL = int(os.environ.get('GAS_ORACLE_LOCAL_TTL') or 2)  # Seconds a worker reuses its copy
+    
+    # Finalized chain read cache configuration
+    CHAIN_CACHE_LOCAL_SIZE = int(os.environ.get('CHAIN_CACHE_LOCAL_SIZE') or 2048)  # Entries per worker
+    CHAIN_CACHE_TTL = int(os.environ.get('CHAIN_CACHE_TTL') or 86400)  # Seconds kept in Redis
+    
+    # Access grant index configuration
+    ACCESS_INDEX_CHECK_INTERVAL = float(os.environ.get('ACCESS_INDEX_CHECK_INTERVAL') or 1)  # Seconds
+    ACCESS_INDEX_MAX_AGE = int(os.environ.get('ACCESS_INDEX_MAX_AGE') or 300)  # Seconds
+    ACCESS_INDEX_LOOKBACK = int(os.environ.get('ACCESS_INDEX_LOOKBACK') or 60)  # Seconds
+    
+    # Integrity verification configuration
+    INTEGRITY_WORKERS = int(os.environ.get('INTEGRITY_WORKERS') or 0) or None  # Hashing processes, defaults to CPU count
+    INTEGRITY_CHUNK_SIZE = int(os.environ.get('INTEGRITY_CHUNK_SIZE') or 500)  # Records per hashing job
+    RECORD_HASH_SCHEME = int(os.environ.get('RECORD_HASH_SCHEME') or 2)  # Scheme for new record hashes: 1 legacy, 2 canonical
+    
+    # Integrity audit configuration
+    AUDIT_INTERVAL = int(os.environ.get('AUDIT_INTERVAL') or 300)  # Seconds between audit runs
+    AUDIT_MAX_RUNTIME = int(os.environ.get('AUDIT_MAX_RUNTIME') or 240)  # Seconds scanned per run before checkpointing
+    AUDIT_PASS_INTERVAL = int(os.environ.get('AUDIT_PASS_INTERVAL') or 86400)  # Seconds between full passes
+    AUDIT_MAX_RATE = int(os.environ.get('AUDIT_MAX_RATE') or 0)  # Records per second, 0 = unlimited
+    AUDIT_MAX_ACTIVE_QUERIES = int(os.environ.get('AUDIT_MAX_ACTIVE_QUERIES') or 20)  # Back off above this many active queries, 0 = never
+    AUDIT_BACKOFF = float(os.environ.get('AUDIT_BACKOFF') or 1)  # Initial back-off in seconds, doubled up to 30
+    AUDIT_MISMATCH_LIMIT = int(os.environ.get('AUDIT_MISMATCH_LIMIT') or 10000)  # Mismatches kept per pass
+    
+    # Event indexer configuration
+    INDEXER_START_BLOCK = int(os.environ.get('INDEXER_START_BLOCK') or 0)  # First block to index
+    INDEXER_BATCH_BLOCKS = int(os.environ.get('INDEXER_BATCH_BLOCKS') or 2000)  # Blocks per eth_getLogs call
+    INDEXER_MAX_BATCHES = int(os.environ.get('INDEXER_MAX_BATCHES') or 10)  # getLogs calls per run
+    INDEXER_REORG_DEPTH = int(os.environ.get('INDEXER_REORG_DEPTH') or 12)  # Blocks rewound after a reorg
+    INDEXER_INTERVAL = int(os.environ.get('INDEXER_INTERVAL') or 5)  # Seconds between runs
 
 class DevelopmentConfig(Config):
     """Development configuration"""
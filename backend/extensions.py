@@ -4,11 +4,20 @@ Flask extensions initialization
 
 from flask_sqlalchemy import SQLAlchemy
 from flask_jwt_extended import JWTManager
+from celery import Celery, Task
 import redis
 
+class FlaskTask(Task):
+    """Celery task that runs inside the Flask application context"""
+    
+    def __call__(self, *args, **kwargs):
+        with self.app.flask_app.app_context():
+            return self.run(*args, **kwargs)
+
 # Initialize extensions
 db = SQLAlchemy()
 jwt = JWTManager()
+celery = Celery('hms', task_cls=FlaskTask)
 redis_client = None
 
 def init_extensions(app):
@@ -21,3 +30,49 @@ def init_extensions(app):
     # Configure Redis with proper connection parameters
     redis_url = app.config.get('REDIS_URL', 'redis://localhost:6379/0')
     redis_client = redis.from_url(redis_url, decode_responses=True)
+    
+    # Configure Celery for background blockchain jobs
+    celery.flask_app = app
+    celery.conf.update(
+        broker_url=app.config.get('CELERY_BROKER_URL'),
+        result_backend=app.config.get('CELERY_RESULT_BACKEND'),
+        task_always_eager=app.config.get('CELERY_TASK_ALWAYS_EAGER', False),
+        task_acks_late=True,
+        worker_prefetch_multiplier=1,
+        # The audit hashes in its own process pool, which prefork children
+        # cannot start, so it runs on a dedicated threads-pool worker
+        task_routes={
+            'blockchain.audit_records': {'queue': 'audit'}
+        },
+        beat_schedule={
+            'track-confirmations': {
+                'task': 'blockchain.track_confirmations',
+                'schedule': app.config.get('TX_TRACKER_INTERVAL', 15)
+            },
+            'flush-hash-batch': {
+                'task': 'blockchain.flush_hash_batch',
+                'schedule': app.config.get('HASH_BATCH_WINDOW', 60)
+            },
+            'index-events': {
+                'task': 'blockchain.index_events',
+                'schedule': app.config.get('INDEXER_INTERVAL', 5)
+            },
+            'refresh-gas-price': {
+                'task': 'blockchain.refresh_gas_price',
+                'schedule': app.config.get('GAS_ORACLE_INTERVAL', 10)
+            },
+            'audit-records': {
+                'task': 'blockchain.audit_records',
+                'schedule': app.config.get('AUDIT_INTERVAL', 300)
+            },
+            'refresh-stats': {
+                'task': 'stats.refresh',
+                'schedule': app.config.get('STATS_REFRESH_INTERVAL', 30)
+            },
+            'reindex-search': {
+                'task': 'search.reindex',
+                'schedule': app.config.get('SEARCH_REINDEX_INTERVAL', 3600),
+                'kwargs': {'missing_only': True}
+            }
+        }
+    )
@@ -12,6 +12,13 @@ from .drug import Drug
 from .contract import Contract
 from .data_hash import DataHash
 from .access_grant import AccessGrant
+from .merkle_batch import MerkleBatch
+from .chain_event import ChainEvent
+from .indexer_checkpoint import IndexerCheckpoint
+from .trace_item import TraceItem
+from .doctor_schedule import DoctorSchedule
+from .daily_stat import DailyStat
+from .stat_total import StatTotal
 
 __all__ = [
     'User',
@@ -23,5 +30,12 @@ __all__ = [
     'Drug',
     'Contract',
     'DataHash',
-    'AccessGrant'
+    'AccessGrant',
+    'MerkleBatch',
+    'ChainEvent',
+    'IndexerCheckpoint',
+    'TraceItem',
+    'DoctorSchedule',
+    'DailyStat',
+    'StatTotal'
 ]
@@ -10,6 +10,10 @@ import uuid
 class AccessGrant(db.Model):
     """Access Grant model for data access permissions"""
     __tablename__ = 'access_grants'
+    __table_args__ = (
+        db.Index('idx_access_grants_created_at', 'created_at'),
+        db.Index('idx_access_grants_updated_at', 'updated_at'),
+    )
     
     id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     grantor_addr = db.Column(db.String(42), nullable=False)  # Patient blockchain address
@@ -20,6 +24,10 @@ class AccessGrant(db.Model):
     expire_time = db.Column(db.DateTime, nullable=False)
     is_active = db.Column(db.Boolean, default=True)
     blockchain_tx_hash = db.Column(db.String(66))  # Blockchain transaction hash
+    revoke_tx_hash = db.Column(db.String(66))  # Revocation transaction hash
+    tx_status = db.Column(db.String(20), default='PENDING')  # PENDING, SENT, MINED, FAILED
+    job_id = db.Column(db.String(36))  # Submission job ID
+    tx_error = db.Column(db.Text)  # Last submission error
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -38,6 +46,10 @@ class AccessGrant(db.Model):
             'expire_time': self.expire_time.isoformat(),
             'is_active': self.is_active,
             'blockchain_tx_hash': self.blockchain_tx_hash,
+            'revoke_tx_hash': self.revoke_tx_hash,
+            'tx_status': self.tx_status,
+            'job_id': self.job_id,
+            'tx_error': self.tx_error,
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat()
         }
@@ -4,7 +4,8 @@ Appointment model for Web3 HMS
 
 from datetime import datetime
 from extensions import db
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import func, text
+from sqlalchemy.dialects.postgresql import ExcludeConstraint, UUID
 import uuid
 
 class Appointment(db.Model):
@@ -17,6 +18,7 @@ class Appointment(db.Model):
     dept_id = db.Column(db.String(50), nullable=False)
     dept_name = db.Column(db.String(100), nullable=False)
     schedule_time = db.Column(db.DateTime, nullable=False)
+    end_time = db.Column(db.DateTime)  # End of the booked slot, set by services.scheduling
     appointment_type = db.Column(db.String(50), default='OUTPATIENT')  # OUTPATIENT, FOLLOW_UP, EMERGENCY
     status = db.Column(db.String(20), default='SCHEDULED')  # SCHEDULED, CONFIRMED, CANCELLED, COMPLETED
     reason = db.Column(db.Text)
@@ -28,6 +30,20 @@ class Appointment(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __table_args__ = (
+        db.Index('idx_appointments_schedule_time_id', 'schedule_time', 'id'),
+        db.Index('idx_appointments_updated_at', 'updated_at'),
+        # Interval index of booked slots; the database rejects a second live
+        # booking overlapping the same doctor's time, however the rows race in
+        ExcludeConstraint(
+            (doctor_id, '='),
+            (func.tsrange(schedule_time, end_time), '&&'),
+            name='excl_appointments_doctor_slot',
+            using='gist',
+            where=text("status <> 'CANCELLED' AND end_time IS NOT NULL")
+        ),
+    )
+    
     def __repr__(self):
         return f'<Appointment {self.id}>'
     
@@ -40,6 +56,7 @@ class Appointment(db.Model):
             'dept_id': self.dept_id,
             'dept_name': self.dept_name,
             'schedule_time': self.schedule_time.isoformat(),
+            'end_time': self.end_time.isoformat() if self.end_time else None,
             'appointment_type': self.appointment_type,
             'status': self.status,
             'reason': self.reason,
@@ -0,0 +1,54 @@
+"""
+Chain Event model for Web3 HMS
+"""
+
+from datetime import datetime
+from extensions import db
+from sqlalchemy.dialects.postgresql import UUID
+import uuid
+import json
+
+class ChainEvent(db.Model):
+    """Chain Event model for indexed contract logs"""
+    __tablename__ = 'chain_events'
+    __table_args__ = (
+        db.UniqueConstraint('tx_hash', 'log_index', name='uq_chain_events_tx_log'),
+        db.Index('idx_chain_events_subject_key', 'subject_key', 'block_number'),
+        db.Index('idx_chain_events_block', 'block_number', 'log_index'),
+    )
+    
+    # Text columns holding JSON, decoded when serialized, with their NULL value
+    JSON_FIELDS = {'args': {}}
+    
+    id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    contract_name = db.Column(db.String(100), nullable=False)
+    contract_address = db.Column(db.String(42), nullable=False)
+    event_name = db.Column(db.String(50), nullable=False)  # RecordCreated, AccessGranted, ItemTransferred, ...
+    subject_key = db.Column(db.String(66))  # First indexed argument (keccak of string IDs)
+    args = db.Column(db.Text)  # Decoded event arguments JSON
+    tx_hash = db.Column(db.String(66), nullable=False)
+    log_index = db.Column(db.Integer, nullable=False)
+    block_number = db.Column(db.BigInteger, nullable=False)
+    block_hash = db.Column(db.String(66), nullable=False)
+    block_time = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<ChainEvent {self.event_name}:{self.tx_hash}>'
+    
+    def to_dict(self):
+        """Convert to dictionary"""
+        return {
+            'id': str(self.id),
+            'contract_name': self.contract_name,
+            'contract_address': self.contract_address,
+            'event_name': self.event_name,
+            'subject_key': self.subject_key,
+            'args': json.loads(self.args) if self.args else {},
+            'tx_hash': self.tx_hash,
+            'log_index': self.log_index,
+            'block_number': self.block_number,
+            'block_hash': self.block_hash,
+            'block_time': self.block_time.isoformat() if self.block_time else None,
+            'created_at': self.created_at.isoformat()
+        }
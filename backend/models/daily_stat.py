@@ -0,0 +1,29 @@
+"""
+Daily Stat model for Web3 HMS
+"""
+
+from extensions import db
+from sqlalchemy.dialects.postgresql import UUID
+
+class DailyStat(db.Model):
+    """Rows and amounts of a dataset per day, department, doctor and category
+
+    Maintained by services.stats, which rewrites every row of a day
+    whenever the source rows of that day change.
+    """
+    __tablename__ = 'daily_stats'
+    __table_args__ = (
+        db.Index('idx_daily_stats_dataset_day', 'dataset', 'day'),
+    )
+
+    id = db.Column(db.BigInteger, primary_key=True)
+    dataset = db.Column(db.String(30), nullable=False)  # appointments, medical_records, inpatients, patients, chain_tx
+    day = db.Column(db.Date, nullable=False)
+    dept_id = db.Column(db.String(50))
+    doctor_id = db.Column(UUID(as_uuid=True))
+    category = db.Column(db.String(50), nullable=False)  # Status, record type or gender, depending on the dataset
+    count = db.Column(db.Integer, nullable=False, default=0)
+    amount = db.Column(db.Numeric(14, 2), nullable=False, default=0)  # Fees, where the dataset has any
+
+    def __repr__(self):
+        return f'<DailyStat {self.dataset} {self.day} {self.category}:{self.count}>'
@@ -6,10 +6,18 @@ from datetime import datetime
 from extensions import db
 from sqlalchemy.dialects.postgresql import UUID
 import uuid
+import json
 
 class DataHash(db.Model):
     """Data Hash model for blockchain data verification"""
     __tablename__ = 'data_hashes'
+    __table_args__ = (
+        db.Index('idx_data_hashes_created_at', 'created_at'),
+        db.Index('idx_data_hashes_updated_at', 'updated_at'),
+    )
+    
+    # Text columns holding JSON, decoded when serialized, with their NULL value
+    JSON_FIELDS = {'merkle_proof': None}
     
     id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     data_type = db.Column(db.String(50), nullable=False)  # EMR, PRESCRIPTION, SURGERY, REPORT
@@ -20,6 +28,13 @@ class DataHash(db.Model):
     contract_address = db.Column(db.String(42))  # Contract address
     gas_used = db.Column(db.BigInteger)  # Gas used for transaction
     gas_price = db.Column(db.BigInteger)  # Gas price
+    anchor_mode = db.Column(db.String(10), default='SINGLE')  # SINGLE, BATCH
+    batch_id = db.Column(UUID(as_uuid=True), db.ForeignKey('merkle_batches.id'))  # Merkle batch
+    leaf_index = db.Column(db.Integer)  # Leaf position in the Merkle tree
+    merkle_proof = db.Column(db.Text)  # Merkle proof JSON
+    tx_status = db.Column(db.String(20), default='PENDING')  # PENDING, SENT, MINED, FAILED
+    job_id = db.Column(db.String(36))  # Submission job ID
+    tx_error = db.Column(db.Text)  # Last submission error
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -38,6 +53,13 @@ class DataHash(db.Model):
             'contract_address': self.contract_address,
             'gas_used': self.gas_used,
             'gas_price': self.gas_price,
+            'anchor_mode': self.anchor_mode,
+            'batch_id': str(self.batch_id) if self.batch_id else None,
+            'leaf_index': self.leaf_index,
+            'merkle_proof': json.loads(self.merkle_proof) if self.merkle_proof else None,
+            'tx_status': self.tx_status,
+            'job_id': self.job_id,
+            'tx_error': self.tx_error,
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat()
         }
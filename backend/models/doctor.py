@@ -4,12 +4,17 @@ Doctor model for Web3 HMS
 
 from datetime import datetime
 from extensions import db
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import TSVECTOR, UUID
 import uuid
 
 class Doctor(db.Model):
     """Doctor model"""
     __tablename__ = 'doctors'
+    __table_args__ = (
+        db.Index('idx_doctors_created_at_id', 'created_at', 'id'),
+        db.Index('idx_doctors_search_vector', 'search_vector', postgresql_using='gin'),
+        db.Index('idx_doctors_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+    )
     
     id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     name = db.Column(db.String(100), nullable=False)
@@ -24,6 +29,7 @@ class Doctor(db.Model):
     experience = db.Column(db.Text)  # 工作经历
     blockchain_addr = db.Column(db.String(42))  # Ethereum address
     is_active = db.Column(db.Boolean, default=True)
+    search_vector = db.deferred(db.Column(TSVECTOR))  # Maintained by services.search
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -31,6 +37,7 @@ class Doctor(db.Model):
     appointments = db.relationship('Appointment', backref='doctor', lazy='dynamic')
     medical_records = db.relationship('MedicalRecord', backref='doctor', lazy='dynamic')
     inpatients = db.relationship('Inpatient', backref='doctor', lazy='dynamic')
+    schedules = db.relationship('DoctorSchedule', backref='doctor', lazy='dynamic')
     
     def __repr__(self):
         return f'<Doctor {self.name}>'
@@ -0,0 +1,52 @@
+"""
+Doctor Schedule model for Web3 HMS
+"""
+
+from datetime import datetime
+from extensions import db
+from sqlalchemy.dialects.postgresql import UUID
+import uuid
+
+class DoctorSchedule(db.Model):
+    """Weekly working template of a doctor, split into bookable slots"""
+    __tablename__ = 'doctor_schedules'
+    __table_args__ = (
+        db.Index('idx_doctor_schedules_dept_weekday', 'dept_id', 'weekday'),
+        db.Index('idx_doctor_schedules_doctor_id', 'doctor_id'),
+        db.CheckConstraint('weekday BETWEEN 0 AND 6', name='ck_doctor_schedules_weekday'),
+        db.CheckConstraint('start_time < end_time', name='ck_doctor_schedules_hours'),
+        db.CheckConstraint('slot_minutes > 0', name='ck_doctor_schedules_slot_minutes'),
+    )
+
+    id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    doctor_id = db.Column(UUID(as_uuid=True), db.ForeignKey('doctors.id'), nullable=False)
+    dept_id = db.Column(db.String(50), nullable=False)  # Copied from the doctor for department lookups
+    weekday = db.Column(db.SmallInteger, nullable=False)  # 0 = Monday .. 6 = Sunday
+    start_time = db.Column(db.Time, nullable=False)
+    end_time = db.Column(db.Time, nullable=False)
+    slot_minutes = db.Column(db.Integer, nullable=False, default=15)
+    valid_from = db.Column(db.Date)  # Open-ended when NULL
+    valid_until = db.Column(db.Date)
+    is_active = db.Column(db.Boolean, nullable=False, default=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<DoctorSchedule {self.doctor_id} {self.weekday} {self.start_time}-{self.end_time}>'
+
+    def to_dict(self):
+        """Convert to dictionary"""
+        return {
+            'id': str(self.id),
+            'doctor_id': str(self.doctor_id),
+            'dept_id': self.dept_id,
+            'weekday': self.weekday,
+            'start_time': self.start_time.isoformat(),
+            'end_time': self.end_time.isoformat(),
+            'slot_minutes': self.slot_minutes,
+            'valid_from': self.valid_from.isoformat() if self.valid_from else None,
+            'valid_until': self.valid_until.isoformat() if self.valid_until else None,
+            'is_active': self.is_active,
+            'created_at': self.created_at.isoformat(),
+            'updated_at': self.updated_at.isoformat()
+        }
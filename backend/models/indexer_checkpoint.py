@@ -0,0 +1,27 @@
+"""
+Indexer Checkpoint model for Web3 HMS
+"""
+
+from datetime import datetime
+from extensions import db
+
+class IndexerCheckpoint(db.Model):
+    """Indexer Checkpoint model for resumable log ingestion"""
+    __tablename__ = 'indexer_checkpoints'
+    
+    name = db.Column(db.String(50), primary_key=True)  # Indexer name
+    block_number = db.Column(db.BigInteger, nullable=False)  # Last fully indexed block
+    block_hash = db.Column(db.String(66))  # Hash of the last indexed block
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<IndexerCheckpoint {self.name}:{self.block_number}>'
+    
+    def to_dict(self):
+        """Convert to dictionary"""
+        return {
+            'name': self.name,
+            'block_number': self.block_number,
+            'block_hash': self.block_hash,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
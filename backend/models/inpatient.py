@@ -10,6 +10,10 @@ import uuid
 class Inpatient(db.Model):
     """Inpatient model"""
     __tablename__ = 'inpatients'
+    __table_args__ = (
+        db.Index('idx_inpatients_admit_time', 'admit_time'),
+        db.Index('idx_inpatients_updated_at', 'updated_at'),
+    )
     
     id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     patient_id = db.Column(UUID(as_uuid=True), db.ForeignKey('patients.id'), nullable=False)
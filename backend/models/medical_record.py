@@ -4,35 +4,96 @@ Medical Record model for Web3 HMS
 
 from datetime import datetime
 from extensions import db
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import TSVECTOR, UUID
+from sqlalchemy.ext.hybrid import hybrid_property
 import uuid
 
 class MedicalRecord(db.Model):
     """Medical Record model"""
     __tablename__ = 'emr_records'
+    __table_args__ = (
+        db.Index('idx_emr_records_created_at_id', 'created_at', 'id'),
+        db.Index('idx_emr_records_updated_at', 'updated_at'),
+        db.Index('idx_emr_records_search_vector', 'search_vector', postgresql_using='gin'),
+        db.Index('idx_emr_records_title_trgm', 'title', postgresql_using='gin', postgresql_ops={'title': 'gin_trgm_ops'}),
+    )
+    
+    # Columns rendered in list tables (view=summary)
+    SUMMARY_FIELDS = (
+        'id', 'patient_id', 'doctor_id', 'record_type', 'title', 'diagnosis',
+        'blockchain_hash', 'block_number', 'is_confidential', 'created_at', 'updated_at'
+    )
+    # Resolving an offloaded body needs its CID as well
+    FIELD_COLUMNS = {'content': ('_content', 'content_cid')}
+    # Serialized bodies are null, not an error, when IPFS cannot serve them
+    FIELD_SOURCES = {'content': 'available_content'}
     
     id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     patient_id = db.Column(UUID(as_uuid=True), db.ForeignKey('patients.id'), nullable=False)
     doctor_id = db.Column(UUID(as_uuid=True), db.ForeignKey('doctors.id'), nullable=False)
     record_type = db.Column(db.String(50), nullable=False)  # EMR, PRESCRIPTION, SURGERY, REPORT
     title = db.Column(db.String(200), nullable=False)
-    content = db.Column(db.Text, nullable=False)
+    _content = db.Column('content', db.Text, nullable=False)  # Empty when the body is offloaded to IPFS
     diagnosis = db.Column(db.Text)
     treatment = db.Column(db.Text)
     prescription = db.Column(db.Text)
     notes = db.Column(db.Text)
     ipfs_cid = db.Column(db.String(100))  # IPFS Content Identifier
+    content_cid = db.Column(db.String(100))  # IPFS CID of an offloaded body
+    content_size = db.Column(db.Integer)  # Byte size of an offloaded body
     blockchain_tx_hash = db.Column(db.String(66))  # Blockchain transaction hash
     blockchain_hash = db.Column(db.String(64))  # Data hash stored on blockchain
+    hash_scheme = db.Column(db.SmallInteger, nullable=False, server_default='1')  # Scheme blockchain_hash was computed with
     block_number = db.Column(db.BigInteger)  # Block number where transaction was mined
     is_confidential = db.Column(db.Boolean, default=False)
     is_active = db.Column(db.Boolean, default=True)
+    search_vector = db.deferred(db.Column(TSVECTOR))  # Maintained by services.search
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     def __repr__(self):
         return f'<MedicalRecord {self.title}>'
     
+    @hybrid_property
+    def content(self):
+        """Record body, fetched from the content cache or IPFS if offloaded"""
+        if not self.content_cid:
+            return self._content
+        loaded = getattr(self, '_offloaded', None)
+        if loaded is None or loaded[0] != self.content_cid:
+            from services.content_store import content_store
+            loaded = (self.content_cid, content_store.get_text(self.content_cid))
+            self._offloaded = loaded
+        return loaded[1]
+    
+    @content.setter
+    def content(self, value):
+        # New bodies are stored inline until offloaded again
+        self._content = value
+        self.content_cid = None
+        self.content_size = None
+    
+    @content.expression
+    def content(cls):
+        # Queries only see inline bodies
+        return cls._content
+    
+    @property
+    def available_content(self):
+        """Record body, or None when an offloaded body cannot be fetched"""
+        from services.content_store import ContentUnavailable
+        try:
+            return self.content
+        except ContentUnavailable:
+            return None
+    
+    def set_offloaded_content(self, cid, text):
+        """Keep only the CID of a body that was added to IPFS"""
+        self._content = ''
+        self.content_cid = cid
+        self.content_size = len(text.encode('utf-8'))
+        self._offloaded = (cid, text)
+    
     def to_dict(self):
         """Convert to dictionary"""
         return {
@@ -41,14 +102,17 @@ class MedicalRecord(db.Model):
             'doctor_id': str(self.doctor_id),
             'record_type': self.record_type,
             'title': self.title,
-            'content': self.content,
+            'content': self.available_content,
             'diagnosis': self.diagnosis,
             'treatment': self.treatment,
             'prescription': self.prescription,
             'notes': self.notes,
             'ipfs_cid': self.ipfs_cid,
+            'content_cid': self.content_cid,
+            'content_size': self.content_size,
             'blockchain_tx_hash': self.blockchain_tx_hash,
             'blockchain_hash': self.blockchain_hash,
+            'hash_scheme': self.hash_scheme,
             'block_number': self.block_number,
             'is_confidential': self.is_confidential,
             'is_active': self.is_active,
@@ -56,8 +120,22 @@ class MedicalRecord(db.Model):
             'updated_at': self.updated_at.isoformat()
         }
     
-    def calculate_hash(self):
-        """Calculate SHA-256 hash of the record content"""
-        import hashlib
-        content_to_hash = f"{self.title}{self.content}{self.diagnosis}{self.treatment}{self.prescription}"
-        return hashlib.sha256(content_to_hash.encode('utf-8')).hexdigest()
+    def calculate_hash(self, scheme=None):
+        """Calculate SHA-256 hash of the record content
+
+        Uses the scheme the stored hash was computed with unless ``scheme``
+        is given, so existing hashes keep verifying.
+        """
+        from services.record_hash import RECORD_HASH_FIELDS, HASH_SCHEME_LEGACY, hash_record_fields
+        return hash_record_fields(
+            (getattr(self, field) for field in RECORD_HASH_FIELDS),
+            scheme or self.hash_scheme or HASH_SCHEME_LEGACY
+        )
+
+    def update_hash(self):
+        """Re-hash the record content with the configured scheme"""
+        from flask import current_app
+        from services.record_hash import CURRENT_HASH_SCHEME
+        self.hash_scheme = current_app.config.get('RECORD_HASH_SCHEME') or CURRENT_HASH_SCHEME
+        self.blockchain_hash = self.calculate_hash()
+        return self.blockchain_hash
@@ -0,0 +1,50 @@
+"""
+Merkle Batch model for Web3 HMS
+"""
+
+from datetime import datetime
+from extensions import db
+from sqlalchemy.dialects.postgresql import UUID
+import uuid
+
+class MerkleBatch(db.Model):
+    """Merkle Batch model for hashes anchored under a single root"""
+    __tablename__ = 'merkle_batches'
+    __table_args__ = (
+        db.Index('idx_merkle_batches_created_at', 'created_at'),
+        db.Index('idx_merkle_batches_updated_at', 'updated_at'),
+    )
+    
+    id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    merkle_root = db.Column(db.String(64), nullable=False)  # SHA-256 Merkle root
+    leaf_count = db.Column(db.Integer, nullable=False)
+    tx_hash = db.Column(db.String(66))  # Blockchain transaction hash
+    block_number = db.Column(db.BigInteger)  # Block number
+    contract_address = db.Column(db.String(42))  # Contract address
+    tx_status = db.Column(db.String(20), default='PENDING')  # PENDING, SENT, MINED, FAILED
+    job_id = db.Column(db.String(36))  # Submission job ID
+    tx_error = db.Column(db.Text)  # Last submission error
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Relationships
+    data_hashes = db.relationship('DataHash', backref='batch', lazy='dynamic')
+    
+    def __repr__(self):
+        return f'<MerkleBatch {self.merkle_root}>'
+    
+    def to_dict(self):
+        """Convert to dictionary"""
+        return {
+            'id': str(self.id),
+            'merkle_root': self.merkle_root,
+            'leaf_count': self.leaf_count,
+            'tx_hash': self.tx_hash,
+            'block_number': self.block_number,
+            'contract_address': self.contract_address,
+            'tx_status': self.tx_status,
+            'job_id': self.job_id,
+            'tx_error': self.tx_error,
+            'created_at': self.created_at.isoformat(),
+            'updated_at': self.updated_at.isoformat()
+        }
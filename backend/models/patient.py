@@ -4,12 +4,24 @@ Patient model for Web3 HMS
 
 from datetime import datetime
 from extensions import db
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import TSVECTOR, UUID
 import uuid
 
 class Patient(db.Model):
     """Patient model"""
     __tablename__ = 'patients'
+    __table_args__ = (
+        db.Index('idx_patients_created_at_id', 'created_at', 'id'),
+        db.Index('idx_patients_updated_at', 'updated_at'),
+        db.Index('idx_patients_search_vector', 'search_vector', postgresql_using='gin'),
+        db.Index('idx_patients_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+    )
+    
+    # Columns rendered in list tables (view=summary)
+    SUMMARY_FIELDS = (
+        'id', 'name', 'gender', 'birth_date', 'phone', 'medical_card_id',
+        'insurance_type', 'is_active', 'created_at'
+    )
     
     id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     name = db.Column(db.String(100), nullable=False)
@@ -28,6 +40,7 @@ class Patient(db.Model):
     allergies = db.Column(db.Text)
     medical_history = db.Column(db.Text)
     is_active = db.Column(db.Boolean, default=True)
+    search_vector = db.deferred(db.Column(TSVECTOR))  # Maintained by services.search
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -0,0 +1,22 @@
+"""
+Stat Total model for Web3 HMS
+"""
+
+from datetime import datetime
+from extensions import db
+
+class StatTotal(db.Model):
+    """All-time rows and amounts of a dataset per category
+
+    Moved by services.stats together with the daily rollups it is the sum of.
+    """
+    __tablename__ = 'stat_totals'
+
+    dataset = db.Column(db.String(30), primary_key=True)
+    category = db.Column(db.String(50), primary_key=True)
+    count = db.Column(db.BigInteger, nullable=False, default=0)
+    amount = db.Column(db.Numeric(16, 2), nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<StatTotal {self.dataset} {self.category}:{self.count}>'
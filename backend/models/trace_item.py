@@ -0,0 +1,50 @@
+"""
+Trace Item model for Web3 HMS
+"""
+
+from datetime import datetime
+from extensions import db
+
+class TraceItem(db.Model):
+    """Trace Item model folded from DrugTrace contract events"""
+    __tablename__ = 'trace_items'
+    __table_args__ = (
+        db.Index('idx_trace_items_item_id', 'item_id'),
+        db.Index('idx_trace_items_manufacturer', 'manufacturer'),
+        db.Index('idx_trace_items_batch_number', 'batch_number'),
+    )
+
+    item_key = db.Column(db.String(66), primary_key=True)  # keccak of the item ID, as emitted in event topics
+    item_id = db.Column(db.String(100))  # Plain item ID, known for items created through the API
+    name = db.Column(db.String(200))
+    manufacturer = db.Column(db.String(200))
+    batch_number = db.Column(db.String(100))
+    current_owner = db.Column(db.String(42))
+    current_location = db.Column(db.String(200))
+    status = db.Column(db.String(20), nullable=False, default='PENDING')  # PENDING, ACTIVE, DISPOSED
+    use_count = db.Column(db.Integer, nullable=False, default=0)
+    created_block = db.Column(db.BigInteger)
+    last_block = db.Column(db.BigInteger)
+    last_event_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<TraceItem {self.item_id or self.item_key}>'
+
+    def to_dict(self):
+        """Convert to dictionary"""
+        return {
+            'item_key': self.item_key,
+            'item_id': self.item_id,
+            'name': self.name,
+            'manufacturer': self.manufacturer,
+            'batch_number': self.batch_number,
+            'current_owner': self.current_owner,
+            'current_location': self.current_location,
+            'status': self.status,
+            'use_count': self.use_count,
+            'created_block': self.created_block,
+            'last_block': self.last_block,
+            'last_event_at': self.last_event_at.isoformat() if self.last_event_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
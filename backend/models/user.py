@@ -12,6 +12,9 @@ class User(db.Model):
     """User model for authentication"""
     __tablename__ = 'users'
     
+    # Columns never serialized
+    PRIVATE_FIELDS = ('password_hash',)
+    
     id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     username = db.Column(db.String(80), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
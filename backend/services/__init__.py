@@ -0,0 +1,3 @@
+"""
+Service layer for Web3 HMS
+"""
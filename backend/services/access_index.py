@@ -0,0 +1,231 @@
+"""
+Off-chain access grant index for Web3 HMS
+"""
+
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+import extensions
+from models.access_grant import AccessGrant
+from services.tx_pipeline import TX_FAILED, TX_MINED
+
+# Bumped whenever a worker commits a grant or revoke
+ACCESS_VERSION_KEY = 'hms:access:version'
+
+
+def _key(grantee_addr, data_id):
+    return grantee_addr.lower(), str(data_id).lower()
+
+
+class AccessIndex:
+    """Per-worker index of active grants keyed by (grantee_addr, data_id)
+
+    A grant counts while it is active, its transaction is mined and
+    ``expire_time`` lies in the future, mirroring ``AccessControl.hasAccess``.
+    Grants whose transaction is still pending or sent are indexed too, but
+    only reported as pending. The index is loaded once, then kept in sync by re-reading grants whose
+    ``updated_at`` moved since the last sync. Syncs run when the Redis
+    version key changes (checked at most every ACCESS_INDEX_CHECK_INTERVAL)
+    and the whole index is reloaded after ACCESS_INDEX_MAX_AGE.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._pid = None
+        self._grants = None
+        self._by_key = {}
+        self._version = None
+        self._synced_to = None
+        self._loaded_at = 0.0
+        self._checked_at = 0.0
+
+    def has_access(self, grantee_addr, data_id, now=None):
+        """Check whether ``grantee_addr`` may read ``data_id``"""
+        return self.get_expiry(grantee_addr, data_id, now) is not None
+
+    def get_expiry(self, grantee_addr, data_id, now=None):
+        """Get the latest expiry of the grantee's live grants, or None"""
+        self._ensure_synced()
+        return _latest_expiry(self._by_key.get(_key(grantee_addr, data_id)), True, now or datetime.utcnow())
+
+    def get_pending_expiry(self, grantee_addr, data_id, now=None):
+        """Get the latest expiry of grants still awaiting their transaction, or None"""
+        self._ensure_synced()
+        return _latest_expiry(self._by_key.get(_key(grantee_addr, data_id)), False, now or datetime.utcnow())
+
+    def check_many(self, grantee_addr, data_ids, now=None):
+        """Check many data IDs for one grantee in a single pass"""
+        self._ensure_synced()
+        now = now or datetime.utcnow()
+        grantee = grantee_addr.lower()
+        return {
+            data_id: _latest_expiry(self._by_key.get((grantee, str(data_id).lower())), True, now) is not None
+            for data_id in data_ids
+        }
+
+    def get_stats(self):
+        """Get the size and sync state of this worker's index"""
+        return {
+            'grants': len(self._grants or {}),
+            'keys': len(self._by_key),
+            'synced_to': self._synced_to.isoformat() if self._synced_to else None
+        }
+
+    def invalidate(self, publish=True):
+        """Force a sync on the next check, optionally telling the other workers"""
+        with self._lock:
+            self._checked_at = 0.0
+            self._version = None
+        if publish and extensions.redis_client is not None:
+            try:
+                extensions.redis_client.incr(ACCESS_VERSION_KEY)
+            except Exception:
+                # Other workers still pick the change up via ACCESS_INDEX_MAX_AGE
+                pass
+
+    def _ensure_synced(self):
+        now = time.monotonic()
+        if self._grants is not None and self._pid == os.getpid() and \
+                now - self._checked_at < current_app.config.get('ACCESS_INDEX_CHECK_INTERVAL', 1):
+            return
+
+        with self._lock:
+            if self._pid != os.getpid() or self._grants is None or \
+                    now - self._loaded_at > current_app.config.get('ACCESS_INDEX_MAX_AGE', 300):
+                self._load()
+                return
+
+            self._checked_at = now
+            version = self._remote_version()
+            if version is None or version != self._version:
+                self._sync(version)
+
+    def _remote_version(self):
+        """Read the shared grants version, or None when Redis is unavailable"""
+        if extensions.redis_client is None:
+            return None
+        try:
+            return extensions.redis_client.get(ACCESS_VERSION_KEY) or '0'
+        except Exception:
+            return None
+
+    def _load(self):
+        """Rebuild the index from every live grant"""
+        version = self._remote_version()
+        started = datetime.utcnow()
+        rows = AccessGrant.query.with_entities(
+            AccessGrant.id,
+            AccessGrant.grantee_addr,
+            AccessGrant.data_id,
+            AccessGrant.expire_time,
+            AccessGrant.tx_status
+        ).filter(
+            AccessGrant.is_active.is_(True),
+            AccessGrant.tx_status != TX_FAILED,
+            AccessGrant.expire_time > started
+        ).all()
+
+        grants = {}
+        by_key = {}
+        for grant_id, grantee_addr, data_id, expire_time, tx_status in rows:
+            key = _key(grantee_addr, data_id)
+            grants[grant_id] = (key, expire_time)
+            by_key.setdefault(key, {})[grant_id] = (expire_time, tx_status == TX_MINED)
+
+        self._pid = os.getpid()
+        self._grants = grants
+        self._by_key = by_key
+        self._version = version
+        self._synced_to = started
+        self._loaded_at = self._checked_at = time.monotonic()
+
+    def _sync(self, version):
+        """Apply grants changed since the last sync
+
+        The window reaches ACCESS_INDEX_LOOKBACK seconds further back so
+        rows stamped before a slow concurrent commit are not missed.
+        """
+        started = datetime.utcnow()
+        since = self._synced_to - timedelta(seconds=current_app.config.get('ACCESS_INDEX_LOOKBACK', 60))
+        rows = AccessGrant.query.with_entities(
+            AccessGrant.id,
+            AccessGrant.grantee_addr,
+            AccessGrant.data_id,
+            AccessGrant.expire_time,
+            AccessGrant.is_active,
+            AccessGrant.tx_status
+        ).filter(AccessGrant.updated_at >= since).all()
+
+        for grant_id, grantee_addr, data_id, expire_time, is_active, tx_status in rows:
+            self._drop(grant_id)
+            if is_active and tx_status != TX_FAILED and expire_time > started:
+                self._put(grant_id, _key(grantee_addr, data_id), expire_time, tx_status == TX_MINED)
+
+        # Expired grants never change again, so they are pruned here
+        for grant_id, (_, expire_time) in list(self._grants.items()):
+            if expire_time <= started:
+                self._drop(grant_id)
+
+        self._version = version
+        self._synced_to = started
+
+    # Per-key dicts are replaced rather than mutated so lock-free readers
+    # never iterate a dict that a sync is changing
+    def _put(self, grant_id, key, expire_time, mined):
+        self._grants[grant_id] = (key, expire_time)
+        grants = dict(self._by_key.get(key, {}))
+        grants[grant_id] = (expire_time, mined)
+        self._by_key[key] = grants
+
+    def _drop(self, grant_id):
+        entry = self._grants.pop(grant_id, None)
+        if entry is None:
+            return
+        key, _ = entry
+        grants = {other: entry for other, entry in self._by_key.get(key, {}).items() if other != grant_id}
+        if grants:
+            self._by_key[key] = grants
+        else:
+            self._by_key.pop(key, None)
+
+
+def _latest_expiry(grants, mined, now):
+    """Latest future expiry among ``grants`` whose transaction is (not) mined"""
+    expire_time = max((expiry for expiry, is_mined in (grants or {}).values() if is_mined is mined), default=None)
+    return expire_time if expire_time is not None and expire_time > now else None
+
+
+access_index = AccessIndex()
+
+
+@event.listens_for(AccessGrant, 'after_insert')
+@event.listens_for(AccessGrant, 'after_update')
+@event.listens_for(AccessGrant, 'after_delete')
+def _grants_changed(mapper, connection, target):
+    """Flag the session so the index is synced once it commits"""
+    session = object_session(target)
+    if session is not None:
+        session.info['access_grants_changed'] = True
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _grants_bulk_changed(orm_execute_state):
+    """Flag bulk UPDATE and DELETE statements on access grants"""
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.class_ is AccessGrant:
+        orm_execute_state.session.info['access_grants_changed'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _publish_grants_change(session):
+    """Sync the index after grant changes are committed"""
+    if session.info.pop('access_grants_changed', False):
+        access_index.invalidate()
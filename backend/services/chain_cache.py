@@ -0,0 +1,189 @@
+"""
+Cache of finalized chain reads for Web3 HMS
+"""
+
+import json
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from flask import current_app
+from hexbytes import HexBytes
+from web3 import Web3
+from web3._utils.method_formatters import receipt_formatter
+from web3.datastructures import AttributeDict
+from web3.exceptions import TransactionNotFound
+
+import extensions
+from services.chain_reader import chain_reader
+from services.web3_client import get_web3
+
+CACHE_KEY = 'hms:chain:{key}'
+
+# Fields that web3 returns as HexBytes and JSON turns into hex strings
+HEX_BYTES_FIELDS = {
+    'hash', 'parentHash', 'blockHash', 'transactionHash', 'logsBloom', 'data', 'topics',
+    'root', 'stateRoot', 'receiptsRoot', 'transactionsRoot', 'sha3Uncles', 'mixHash',
+    'nonce', 'extraData'
+}
+
+
+def _restore(value, field=None):
+    """Turn a JSON-decoded chain object back into the shape web3 returns"""
+    if isinstance(value, dict):
+        return AttributeDict({key: _restore(item, key) for key, item in value.items()})
+    if isinstance(value, list):
+        return [_restore(item, field) for item in value]
+    if field in HEX_BYTES_FIELDS and isinstance(value, str):
+        return HexBytes(value)
+    return value
+
+
+def _load_receipt(w3, tx_hash):
+    try:
+        return w3.eth.get_transaction_receipt(tx_hash)
+    except TransactionNotFound:
+        return None
+
+
+class ChainReadCache:
+    """Two-tier cache of receipts and block headers past finality depth
+
+    Lookups go to an in-process LRU first, then Redis, then the node.
+    Only objects at least TX_CONFIRMATIONS blocks deep are stored, since
+    those can no longer change. Hit counters are kept per process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._latest_block = None
+        self._latest_at = 0.0
+        self.stats = Counter()
+
+    def get_receipt(self, tx_hash):
+        """Get a transaction receipt, or None if it is not mined yet"""
+        return self._get(
+            f'receipt:{tx_hash.lower()}',
+            lambda w3: _load_receipt(w3, tx_hash),
+            lambda receipt: receipt['blockNumber']
+        )
+
+    def get_receipts(self, tx_hashes):
+        """Get the receipts of the mined transactions among ``tx_hashes``
+
+        Cache misses are read in JSON-RPC batches. Transactions not mined
+        yet, or whose read failed, are left out.
+        """
+        receipts = {}
+        missing = []
+        for tx_hash in tx_hashes:
+            cached = self._lookup(f'receipt:{tx_hash.lower()}')
+            if cached is not None:
+                receipts[tx_hash] = cached
+            else:
+                missing.append(tx_hash)
+        if not missing:
+            return receipts
+
+        self.stats['misses'] += len(missing)
+        w3 = get_web3()
+        results = chain_reader.rpc_batch(('eth_getTransactionReceipt', [tx_hash]) for tx_hash in missing)
+        for tx_hash, result in zip(missing, results):
+            if result is None or isinstance(result, Exception):
+                continue
+            receipt = AttributeDict.recursive(receipt_formatter(result))
+            receipts[tx_hash] = receipt
+            self._remember(w3, f'receipt:{tx_hash.lower()}', receipt, receipt['blockNumber'])
+        return receipts
+
+    def get_block(self, block_number):
+        """Get a block header without transactions"""
+        return self._get(
+            f'block:{block_number}',
+            lambda w3: w3.eth.get_block(block_number),
+            lambda block: block['number']
+        )
+
+    def get_stats(self):
+        """Get hit counters and the hit rate of this process"""
+        lookups = self.stats['local_hits'] + self.stats['redis_hits'] + self.stats['misses']
+        hits = self.stats['local_hits'] + self.stats['redis_hits']
+        return {
+            'local_hits': self.stats['local_hits'],
+            'redis_hits': self.stats['redis_hits'],
+            'misses': self.stats['misses'],
+            'not_final': self.stats['not_final'],
+            'local_entries': len(self._entries),
+            'hit_rate': round(hits / lookups, 4) if lookups else None
+        }
+
+    def _get(self, key, load, block_of):
+        cached = self._lookup(key)
+        if cached is not None:
+            return cached
+
+        self.stats['misses'] += 1
+        w3 = get_web3()
+        value = load(w3)
+        if value is None:
+            return None
+        self._remember(w3, key, value, block_of(value))
+        return value
+
+    def _lookup(self, key):
+        """Get a cached value from the local LRU or Redis, or None"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.stats['local_hits'] += 1
+                return self._entries[key]
+
+        cached = self._redis_get(key)
+        if cached is not None:
+            self.stats['redis_hits'] += 1
+            self._store_local(key, cached)
+        return cached
+
+    def _remember(self, w3, key, value, block_number):
+        """Cache a value read from the node once it is past finality depth"""
+        if not self._is_final(w3, block_number):
+            self.stats['not_final'] += 1
+            return
+        self._store_local(key, value)
+        self._redis_set(key, value)
+
+    def _is_final(self, w3, block_number):
+        """Check finality against a latest block number reused for one second"""
+        now = time.monotonic()
+        if self._latest_block is None or now - self._latest_at > 1:
+            self._latest_block = w3.eth.block_number
+            self._latest_at = now
+        return self._latest_block - block_number + 1 >= current_app.config.get('TX_CONFIRMATIONS', 3)
+
+    def _store_local(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > current_app.config.get('CHAIN_CACHE_LOCAL_SIZE', 2048):
+                self._entries.popitem(last=False)
+
+    def _redis_get(self, key):
+        try:
+            payload = extensions.redis_client.get(CACHE_KEY.format(key=key))
+        except Exception:
+            return None
+        return _restore(json.loads(payload)) if payload else None
+
+    def _redis_set(self, key, value):
+        try:
+            extensions.redis_client.set(
+                CACHE_KEY.format(key=key),
+                Web3.to_json(value),
+                ex=current_app.config.get('CHAIN_CACHE_TTL', 86400)
+            )
+        except Exception:
+            pass
+
+
+chain_cache = ChainReadCache()
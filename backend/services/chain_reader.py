@@ -0,0 +1,210 @@
+"""
+Bulk chain reads through JSON-RPC batches and Multicall3 for Web3 HMS
+"""
+
+import itertools
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from eth_utils import to_checksum_address
+from flask import current_app
+from web3 import Web3
+from web3._utils.abi import get_abi_output_types
+
+from services.web3_client import contract_registry, get_web3
+
+# aggregate3 of Multicall3, used once MULTICALL_ADDRESS is set. Most public
+# chains have it at 0xcA11bde05977b3631167028862bE2a173976CA11; local dev
+# chains need the address of their own deployment
+MULTICALL3_ABI = [{
+    'type': 'function',
+    'name': 'aggregate3',
+    'stateMutability': 'payable',
+    'inputs': [{
+        'name': 'calls',
+        'type': 'tuple[]',
+        'components': [
+            {'name': 'target', 'type': 'address'},
+            {'name': 'allowFailure', 'type': 'bool'},
+            {'name': 'callData', 'type': 'bytes'}
+        ]
+    }],
+    'outputs': [{
+        'name': 'returnData',
+        'type': 'tuple[]',
+        'components': [
+            {'name': 'success', 'type': 'bool'},
+            {'name': 'returnData', 'type': 'bytes'}
+        ]
+    }]
+}]
+
+
+class RPCError(Exception):
+    """Error object returned for one request of a JSON-RPC batch"""
+
+    def __init__(self, error):
+        super().__init__(error.get('message', 'JSON-RPC error'))
+        self.code = error.get('code')
+        self.data = error.get('data')
+
+
+def _chunks(items, size):
+    iterator = iter(items)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class ChainReader:
+    """Bulk read layer over the shared Web3 client
+
+    Requests are grouped into JSON-RPC batches of CHAIN_RPC_BATCH_SIZE and
+    contract calls additionally into Multicall3 ``aggregate3`` calls of
+    CHAIN_MULTICALL_SIZE, with at most CHAIN_READ_CONCURRENCY batches in
+    flight. Providers other than HTTP fall back to one request per call.
+    """
+
+    def __init__(self):
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def rpc_batch(self, requests):
+        """Send ``(method, params)`` pairs, returning results in order
+
+        A failed request yields an ``RPCError`` in its slot instead of
+        failing the whole batch.
+        """
+        requests = list(requests)
+        if not requests:
+            return []
+
+        w3 = get_web3()
+        session = contract_registry.get_http_session()
+        if session is None:
+            return [self._single(w3, method, params) for method, params in requests]
+
+        chunks = list(_chunks(requests, current_app.config.get('CHAIN_RPC_BATCH_SIZE', 100)))
+        endpoint = w3.provider.endpoint_uri
+        timeout = current_app.config.get('WEB3_REQUEST_TIMEOUT', 30)
+        workers = min(current_app.config.get('CHAIN_READ_CONCURRENCY', 4), len(chunks))
+        if workers <= 1:
+            results = [self._post_batch(session, endpoint, timeout, chunk) for chunk in chunks]
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(
+                    lambda chunk: self._post_batch(session, endpoint, timeout, chunk), chunks
+                ))
+        return [result for chunk_results in results for result in chunk_results]
+
+    def call_many(self, contract_key, function_name, args_list, block='latest'):
+        """Call a view function once per argument list
+
+        Returns the decoded outputs in order, with None for calls that
+        reverted (e.g. ``getRecord`` on an unknown record).
+        """
+        contract = contract_registry.get_contract(contract_key)
+        if contract is None:
+            raise RuntimeError(f'{contract_key} contract not available')
+
+        function_abi = contract.get_function_by_name(function_name).abi
+        output_types = get_abi_output_types(function_abi)
+        call_data = [contract.encodeABI(fn_name=function_name, args=list(args)) for args in args_list]
+
+        multicall_address = current_app.config.get('MULTICALL_ADDRESS')
+        if multicall_address:
+            raw = self._multicall(contract.address, call_data, multicall_address, block)
+        else:
+            raw = self.rpc_batch(
+                ('eth_call', [{'to': contract.address, 'data': data}, block]) for data in call_data
+            )
+
+        w3 = get_web3()
+        results = []
+        for data in raw:
+            if data is None or isinstance(data, Exception) or data in ('0x', b''):
+                results.append(None)
+                continue
+            decoded = w3.codec.decode(output_types, Web3.to_bytes(hexstr=data) if isinstance(data, str) else data)
+            results.append(_name_outputs(function_abi['outputs'], decoded))
+        return results
+
+    def _multicall(self, target, call_data, multicall_address, block):
+        """Pack calls into aggregate3 calls, themselves sent as one RPC batch"""
+        w3 = get_web3()
+        multicall = w3.eth.contract(address=to_checksum_address(multicall_address), abi=MULTICALL3_ABI)
+        output_types = get_abi_output_types(MULTICALL3_ABI[0])
+        chunks = list(_chunks(call_data, current_app.config.get('CHAIN_MULTICALL_SIZE', 200)))
+
+        responses = self.rpc_batch(
+            ('eth_call', [{
+                'to': multicall.address,
+                'data': multicall.encodeABI(
+                    fn_name='aggregate3',
+                    args=[[(target, True, Web3.to_bytes(hexstr=data)) for data in chunk]]
+                )
+            }, block])
+            for chunk in chunks
+        )
+
+        results = []
+        for chunk, response in zip(chunks, responses):
+            if isinstance(response, Exception):
+                results.extend([None] * len(chunk))
+                continue
+            (entries,) = w3.codec.decode(output_types, Web3.to_bytes(hexstr=response))
+            results.extend(data if success else None for success, data in entries)
+        return results
+
+    def _next_id(self):
+        with self._lock:
+            return next(self._ids)
+
+    def _post_batch(self, session, endpoint, timeout, requests):
+        payload = [
+            {'jsonrpc': '2.0', 'id': self._next_id(), 'method': method, 'params': params}
+            for method, params in requests
+        ]
+        response = session.post(
+            endpoint,
+            data=json.dumps(payload),
+            headers={'Content-Type': 'application/json'},
+            timeout=timeout
+        )
+        response.raise_for_status()
+        body = response.json()
+        if isinstance(body, dict):
+            # Some nodes answer a whole batch with a single error object
+            raise RPCError(body.get('error') or {})
+
+        by_id = {item.get('id'): item for item in body}
+        results = []
+        for request in payload:
+            item = by_id.get(request['id'], {'error': {'message': 'Missing batch response'}})
+            results.append(RPCError(item['error']) if 'error' in item else item.get('result'))
+        return results
+
+    def _single(self, w3, method, params):
+        try:
+            response = w3.provider.make_request(method, params)
+        except Exception as e:
+            return RPCError({'message': str(e)})
+        if 'error' in response:
+            return RPCError(response['error'])
+        return response.get('result')
+
+
+def _name_outputs(outputs, values):
+    """Turn decoded values into dicts keyed by ABI component names"""
+    named = []
+    for output, value in zip(outputs, values):
+        if output.get('components') and output['type'] == 'tuple':
+            value = dict(zip((c['name'] for c in output['components']), value))
+        named.append(value)
+    return named[0] if len(named) == 1 else named
+
+
+chain_reader = ChainReader()
@@ -0,0 +1,115 @@
+"""
+Receipt confirmation tracker for submitted transactions
+"""
+
+from flask import current_app
+from sqlalchemy import and_, or_
+
+from extensions import db
+from models.access_grant import AccessGrant
+from models.data_hash import DataHash
+from models.medical_record import MedicalRecord
+from models.merkle_batch import MerkleBatch
+from services.chain_cache import chain_cache
+from services.tx_pipeline import TX_FAILED, TX_MINED, TX_SENT
+from services.web3_client import get_web3
+
+
+def outstanding_tx_hashes(limit):
+    """Collect tx hashes that were sent but are not final yet"""
+    tx_hashes = []
+    queries = [
+        db.session.query(DataHash.tx_hash).filter(
+            DataHash.tx_status == TX_SENT,
+            DataHash.tx_hash.isnot(None)
+        ).distinct(),
+        db.session.query(MerkleBatch.tx_hash).filter(
+            MerkleBatch.tx_status == TX_SENT,
+            MerkleBatch.tx_hash.isnot(None)
+        ),
+        db.session.query(
+            db.func.coalesce(AccessGrant.revoke_tx_hash, AccessGrant.blockchain_tx_hash)
+        ).filter(
+            AccessGrant.tx_status == TX_SENT
+        )
+    ]
+    for query in queries:
+        for (tx_hash,) in query.limit(limit - len(tx_hashes)):
+            if tx_hash and tx_hash not in tx_hashes:
+                tx_hashes.append(tx_hash)
+        if len(tx_hashes) >= limit:
+            break
+    return tx_hashes
+
+
+def fetch_receipts(tx_hashes):
+    """Fetch receipts for ``tx_hashes``, skipping ones not yet mined"""
+    try:
+        return chain_cache.get_receipts(tx_hashes)
+    except Exception:
+        # The node is unreachable; the next run checks them again
+        return {}
+
+
+def record_receipt(tx_hash, receipt):
+    """Persist finalized receipt fields on every row that sent ``tx_hash``"""
+    tx_status = TX_MINED if receipt['status'] == 1 else TX_FAILED
+    tx_error = None if tx_status == TX_MINED else 'Transaction reverted'
+    block_number = receipt['blockNumber']
+
+    DataHash.query.filter_by(tx_hash=tx_hash).update({
+        'block_number': block_number,
+        'gas_used': receipt['gasUsed'],
+        'gas_price': receipt.get('effectiveGasPrice'),
+        'tx_status': tx_status,
+        'tx_error': tx_error
+    }, synchronize_session=False)
+
+    MerkleBatch.query.filter_by(tx_hash=tx_hash).update({
+        'block_number': block_number,
+        'tx_status': tx_status,
+        'tx_error': tx_error
+    }, synchronize_session=False)
+
+    MedicalRecord.query.filter_by(blockchain_tx_hash=tx_hash).update({
+        'block_number': block_number
+    }, synchronize_session=False)
+
+    AccessGrant.query.filter(
+        AccessGrant.tx_status == TX_SENT,
+        or_(
+            AccessGrant.revoke_tx_hash == tx_hash,
+            and_(AccessGrant.revoke_tx_hash.is_(None), AccessGrant.blockchain_tx_hash == tx_hash)
+        )
+    ).update({
+        'tx_status': tx_status,
+        'tx_error': tx_error
+    }, synchronize_session=False)
+
+
+def track_confirmations():
+    """Finalize sent transactions that reached TX_CONFIRMATIONS blocks
+
+    Returns counts of checked and finalized transactions.
+    """
+    depth = current_app.config.get('TX_CONFIRMATIONS', 3)
+    tx_hashes = outstanding_tx_hashes(current_app.config.get('TX_TRACKER_BATCH_SIZE', 200))
+    if not tx_hashes:
+        return {'checked': 0, 'finalized': 0}
+
+    w3 = get_web3()
+    latest_block = w3.eth.block_number
+    receipts = fetch_receipts(tx_hashes)
+
+    finalized = 0
+    for tx_hash, receipt in receipts.items():
+        if latest_block - receipt['blockNumber'] + 1 < depth:
+            continue
+        record_receipt(tx_hash, receipt)
+        finalized += 1
+
+    db.session.commit()
+    return {
+        'checked': len(tx_hashes),
+        'finalized': finalized
+    }
@@ -0,0 +1,304 @@
+"""
+IPFS-backed content offload with a local content-addressed disk cache
+
+Large record bodies and attachments are added to IPFS and only their CID
+is kept in Postgres. Reads go to a disk cache keyed by CID first and fetch
+from the IPFS API on a miss; the cache evicts least recently read files
+once it grows past CONTENT_CACHE_MAX_BYTES.
+
+With IPFS_MODE=local an in-process stand-in stores blocks under
+IPFS_LOCAL_DIR instead of talking to a node, for tests and offline setups.
+"""
+
+import base64
+import hashlib
+import os
+import tempfile
+import threading
+from collections import Counter
+
+import requests
+from flask import current_app
+
+# CIDv1 prefix: version 1, raw codec, sha2-256 multihash of 32 bytes
+_CID_PREFIX = bytes((0x01, 0x55, 0x12, 0x20))
+
+
+class ContentUnavailable(RuntimeError):
+    """Offloaded content could not be fetched from the cache or IPFS"""
+
+
+def raw_cid(data):
+    """CIDv1 of ``data`` as a single raw block, in base32"""
+    digest = hashlib.sha256(data).digest()
+    return 'b' + base64.b32encode(_CID_PREFIX + digest).decode('ascii').lower().rstrip('=')
+
+
+def _safe_cid(cid):
+    if not cid or not cid.isalnum():
+        raise ContentUnavailable(f'Invalid CID: {cid!r}')
+    return cid
+
+
+def _write_atomic(path, data):
+    """Write ``data`` so concurrent readers never see a partial file"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as tmp:
+            tmp.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+class IPFSHTTPClient:
+    """Minimal client of the Kubo HTTP RPC API"""
+
+    def __init__(self, url, timeout):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def add(self, data):
+        response = self.session.post(
+            f'{self.url}/api/v0/add',
+            params={'cid-version': 1, 'raw-leaves': 'true', 'pin': 'true', 'quiet': 'true'},
+            files={'file': ('content', data)},
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+        return response.json()['Hash']
+
+    def cat(self, cid):
+        response = self.session.post(
+            f'{self.url}/api/v0/cat', params={'arg': cid}, timeout=self.timeout
+        )
+        response.raise_for_status()
+        return response.content
+
+
+class LocalIPFS:
+    """Stand-in for the IPFS API storing raw blocks in a directory"""
+
+    def __init__(self, root):
+        self.root = root
+
+    def add(self, data):
+        cid = raw_cid(data)
+        path = os.path.join(self.root, cid)
+        if not os.path.exists(path):
+            _write_atomic(path, data)
+        return cid
+
+    def cat(self, cid):
+        try:
+            with open(os.path.join(self.root, _safe_cid(cid)), 'rb') as block:
+                return block.read()
+        except FileNotFoundError:
+            raise ContentUnavailable(f'{cid} not found') from None
+
+
+class DiskCache:
+    """Content-addressed file cache with least-recently-read eviction
+
+    Files are named by CID, so entries never go stale and several worker
+    processes can share one directory. Reads bump the file mtime, which
+    eviction uses as the recency order.
+    """
+
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._size = None
+
+    def _path(self, cid):
+        cid = _safe_cid(cid)
+        return os.path.join(self.root, cid[-2:], cid)
+
+    def get(self, cid):
+        path = self._path(cid)
+        try:
+            with open(path, 'rb') as cached:
+                data = cached.read()
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass  # Evicted by another process in the meantime
+        return data
+
+    def put(self, cid, data):
+        if len(data) > self.max_bytes:
+            return
+        path = self._path(cid)
+        if os.path.exists(path):
+            return
+        _write_atomic(path, data)
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan_size()
+            else:
+                self._size += len(data)
+            if self._size > self.max_bytes:
+                self._size = self._evict()
+
+    def _entries(self):
+        for shard in os.scandir(self.root) if os.path.isdir(self.root) else ():
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.is_file() and not entry.name.startswith('.tmp-'):
+                    yield entry
+
+    def _scan_size(self):
+        return sum(entry.stat().st_size for entry in self._entries())
+
+    def _evict(self):
+        """Drop the least recently read files down to 90% of the budget"""
+        entries = sorted(
+            ((entry.stat().st_mtime, entry.stat().st_size, entry.path) for entry in self._entries())
+        )
+        size = sum(entry_size for _, entry_size, _ in entries)
+        target = self.max_bytes * 0.9
+        for _, entry_size, path in entries:
+            if size <= target:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            size -= entry_size
+        return size
+
+
+class ContentStore:
+    """Process-wide access to offloaded content
+
+    Built lazily from the app config and rebuilt after a fork. Hit
+    counters are kept per process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = None
+        self._client = None
+        self._cache = None
+        self.stats = Counter()
+
+    def _ensure(self):
+        if self._pid == os.getpid() and self._client is not None:
+            return
+        with self._lock:
+            if self._pid != os.getpid() or self._client is None:
+                config = current_app.config
+                if config.get('IPFS_MODE') == 'local':
+                    self._client = LocalIPFS(config.get('IPFS_LOCAL_DIR'))
+                else:
+                    self._client = IPFSHTTPClient(config.get('IPFS_URL'), config.get('IPFS_TIMEOUT', 30))
+                self._cache = DiskCache(config.get('CONTENT_CACHE_DIR'), config.get('CONTENT_CACHE_MAX_BYTES'))
+                self.stats = Counter()
+                self._pid = os.getpid()
+
+    def put(self, data):
+        """Add ``data`` to IPFS, keeping a copy in the local cache"""
+        self._ensure()
+        cid = self._client.add(data)
+        self._cache.put(cid, data)
+        self.stats['added'] += 1
+        return cid
+
+    def get(self, cid):
+        """Get content by CID from the local cache or IPFS"""
+        self._ensure()
+        data = self._cache.get(cid)
+        if data is not None:
+            self.stats['hits'] += 1
+            return data
+        self.stats['misses'] += 1
+        try:
+            data = self._client.cat(cid)
+        except ContentUnavailable:
+            raise
+        except Exception as e:
+            raise ContentUnavailable(f'Failed to fetch {cid}: {e}') from e
+        self._cache.put(cid, data)
+        return data
+
+    def put_text(self, text):
+        return self.put(text.encode('utf-8'))
+
+    def get_text(self, cid):
+        return self.get(cid).decode('utf-8')
+
+    def get_stats(self):
+        """Get hit counters and the hit rate of this process"""
+        lookups = self.stats['hits'] + self.stats['misses']
+        return {
+            **self.stats,
+            'hit_rate': round(self.stats['hits'] / lookups, 4) if lookups else None
+        }
+
+
+content_store = ContentStore()
+
+
+def should_offload(text):
+    """Whether a record body belongs in IPFS under the configured storage mode"""
+    config = current_app.config
+    if config.get('CONTENT_STORAGE') != 'ipfs' or not text:
+        return False
+    threshold = config.get('CONTENT_OFFLOAD_THRESHOLD', 8192)
+    # Cheap lower bound before paying for the UTF-8 byte count
+    return len(text) >= threshold or len(text.encode('utf-8')) >= threshold
+
+
+def offload_record(record):
+    """Move a large inline record body to IPFS
+
+    Returns whether the body was offloaded. The row keeps an empty
+    ``content`` column and reads resolve the CID on demand.
+    """
+    if record.content_cid or not should_offload(record.content):
+        return False
+    text = record.content
+    cid = content_store.put_text(text)
+    record.set_offloaded_content(cid, text)
+    return True
+
+
+def offload_records(chunk_size=200, limit=None):
+    """Offload the large inline bodies of existing records, in id order
+
+    Commits after every chunk, so an interrupted run keeps its progress.
+    Returns the number of records offloaded.
+    """
+    from sqlalchemy import func
+
+    from extensions import db
+    from models.medical_record import MedicalRecord
+
+    if current_app.config.get('CONTENT_STORAGE') != 'ipfs':
+        return 0
+    threshold = current_app.config.get('CONTENT_OFFLOAD_THRESHOLD', 8192)
+    query = MedicalRecord.query.filter(
+        MedicalRecord.content_cid.is_(None),
+        func.octet_length(MedicalRecord.content) >= threshold
+    ).order_by(MedicalRecord.id)
+
+    offloaded = 0
+    after_id = None
+    while limit is None or offloaded < limit:
+        chunk_query = query if after_id is None else query.filter(MedicalRecord.id > after_id)
+        records = chunk_query.limit(chunk_size).all()
+        if not records:
+            break
+        for record in records:
+            offloaded += offload_record(record)
+        db.session.commit()
+        after_id = records[-1].id
+    return offloaded
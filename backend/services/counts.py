@@ -0,0 +1,236 @@
+"""
+Total counts for paginated listings
+
+An exact ``COUNT(*)`` dominates list latency on big tables, so totals come
+from the cheapest source that can answer:
+
+1. Incrementally maintained counters for common equality filters
+   (``TRACKED_FILTERS``). They are seeded with one exact count, then moved
+   by the rows each committed flush inserts, updates or deletes, and
+   reseeded when they expire after COUNT_COUNTER_TTL.
+2. Exact counts cached in Redis for COUNT_CACHE_TTL seconds, keyed by the
+   normalized SQL of the filtered query.
+3. The planner's row estimate, used as is once it exceeds
+   COUNT_ESTIMATE_THRESHOLD. Smaller results are counted exactly and
+   cached.
+
+``count_total`` returns the total with a flag telling estimates apart.
+"""
+
+import hashlib
+import json
+
+import redis
+from flask import current_app
+from sqlalchemy import event, inspect
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session, object_session
+
+import extensions
+from extensions import db
+from models.appointment import Appointment
+from models.doctor import Doctor
+from models.medical_record import MedicalRecord
+from models.patient import Patient
+
+COUNTER_KEY = 'hms:count:{table}:counter:{filters}'
+CACHE_KEY = 'hms:count:{table}:query:{digest}'
+
+# Equality filter combinations kept as live counters, per model
+TRACKED_FILTERS = {
+    Patient: (('is_active',),),
+    Doctor: (('is_active',), ('dept_id', 'is_active')),
+    MedicalRecord: (('is_active',), ('is_active', 'record_type')),
+    Appointment: ((), ('status',)),
+}
+
+# Only move counters that exist, so a missing one is seeded by an exact count
+_INCR_IF_EXISTS = """
+if redis.call('exists', KEYS[1]) == 1 then
+    return redis.call('incrby', KEYS[1], ARGV[1])
+end
+return nil
+"""
+
+
+def _normalize(filters):
+    return '&'.join(f'{name}={json.dumps(filters[name])}' for name in sorted(filters))
+
+
+def _counter_key(model, filters):
+    return COUNTER_KEY.format(table=model.__tablename__, filters=_normalize(filters))
+
+
+def _tracked(model, filters):
+    return tuple(sorted(filters)) in TRACKED_FILTERS.get(model, ())
+
+
+def _statement_sql(query):
+    """Driver-level SQL and parameters of ``query`` without its ordering"""
+    compiled = query.order_by(None).statement.compile(
+        dialect=db.engine.dialect, compile_kwargs={'render_postcompile': True}
+    )
+    return str(compiled), compiled.params
+
+
+def planner_estimate(query):
+    """Row count the planner expects ``query`` to return"""
+    sql, params = _statement_sql(query)
+    # A failed EXPLAIN only rolls back its savepoint, so the rows the
+    # caller already loaded stay loaded
+    with db.session.begin_nested():
+        plan = db.session.connection().exec_driver_sql('EXPLAIN (FORMAT JSON) ' + sql, params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def _counter_total(model, query, filters):
+    key = _counter_key(model, filters)
+    value = extensions.redis_client.get(key)
+    if value is not None:
+        return int(value)
+    total = query.order_by(None).count()
+    extensions.redis_client.set(key, total, nx=True, ex=current_app.config.get('COUNT_COUNTER_TTL', 3600))
+    return total
+
+
+def _cached_total(model, query, exact):
+    config = current_app.config
+    sql, params = _statement_sql(query)
+    digest = hashlib.sha1(json.dumps([sql, params], sort_keys=True, default=str).encode()).hexdigest()
+    key = CACHE_KEY.format(table=model.__tablename__, digest=digest)
+
+    cached = extensions.redis_client.get(key)
+    if cached is not None:
+        return int(cached), False
+
+    if not exact:
+        try:
+            estimate = planner_estimate(query)
+        except SQLAlchemyError:
+            estimate = None
+        if estimate is not None and estimate >= config.get('COUNT_ESTIMATE_THRESHOLD', 100000):
+            return estimate, True
+
+    total = query.order_by(None).count()
+    extensions.redis_client.set(key, total, ex=config.get('COUNT_CACHE_TTL', 30))
+    return total, False
+
+
+def count_total(query, model, filters=None, exact=False):
+    """Total rows of a listing query as ``(total, is_estimate)``
+
+    ``filters`` holds the equality filters of ``query`` when they are its
+    only conditions, which lets tracked combinations use live counters.
+    ``exact`` rules out planner estimates.
+    """
+    try:
+        if filters is not None and _tracked(model, filters):
+            return _counter_total(model, query, filters), False
+        return _cached_total(model, query, exact)
+    except redis.RedisError:
+        # Count exactly without the cache; no statement failed, so the
+        # transaction and the rows loaded in it stay as they are
+        return query.order_by(None).count(), False
+
+
+def _row_keys(model, values):
+    for names in TRACKED_FILTERS[model]:
+        yield _counter_key(model, {name: values[name] for name in names})
+
+
+def _record_delta(target, delta, values):
+    session = object_session(target)
+    if session is None:
+        return
+    deltas = session.info.setdefault('count_deltas', {})
+    for key in _row_keys(type(target), values):
+        deltas[key] = deltas.get(key, 0) + delta
+
+
+def _tracked_columns(model):
+    return {name for names in TRACKED_FILTERS[model] for name in names}
+
+
+def _current_values(target):
+    return {name: getattr(target, name) for name in _tracked_columns(type(target))}
+
+
+def _after_insert(mapper, connection, target):
+    _record_delta(target, 1, _current_values(target))
+
+
+def _after_delete(mapper, connection, target):
+    state = inspect(target)
+    values = {}
+    for name in _tracked_columns(type(target)):
+        history = state.attrs[name].history
+        values[name] = history.deleted[0] if history.deleted else getattr(target, name)
+    _record_delta(target, -1, values)
+
+
+def _after_update(mapper, connection, target):
+    state = inspect(target)
+    columns = _tracked_columns(type(target))
+    if not any(state.attrs[name].history.deleted for name in columns):
+        return
+    new_values = _current_values(target)
+    old_values = {}
+    for name in columns:
+        history = state.attrs[name].history
+        old_values[name] = history.deleted[0] if history.deleted else new_values[name]
+    _record_delta(target, -1, old_values)
+    _record_delta(target, 1, new_values)
+
+
+for _model in TRACKED_FILTERS:
+    event.listen(_model, 'after_insert', _after_insert)
+    event.listen(_model, 'after_update', _after_update)
+    event.listen(_model, 'after_delete', _after_delete)
+
+
+def invalidate(session, model):
+    """Drop the counters of ``model`` once ``session`` commits"""
+    if model in TRACKED_FILTERS:
+        session.info.setdefault('count_tables', set()).add(model.__tablename__)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _bulk_changed(orm_execute_state):
+    """Bulk statements bypass the row events, so drop the table's counters"""
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None:
+        invalidate(orm_execute_state.session, mapper.class_)
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_deltas(session):
+    """Move live counters by the rows of the committed transaction"""
+    deltas = session.info.pop('count_deltas', None)
+    tables = session.info.pop('count_tables', None)
+    if not deltas and not tables:
+        return
+    try:
+        client = extensions.redis_client
+        for table in tables or ():
+            keys = list(client.scan_iter(COUNTER_KEY.format(table=table, filters='*')))
+            if keys:
+                client.delete(*keys)
+        incr_if_exists = client.register_script(_INCR_IF_EXISTS)
+        pipe = client.pipeline(transaction=False)
+        for key, delta in (deltas or {}).items():
+            if delta:
+                incr_if_exists(keys=[key], args=[delta], client=pipe)
+        pipe.execute()
+    except Exception:
+        # Counters expire and reseed, so a lost update only lasts one TTL
+        pass
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_deltas(session):
+    session.info.pop('count_deltas', None)
+    session.info.pop('count_tables', None)
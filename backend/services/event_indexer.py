@@ -0,0 +1,191 @@
+"""
+Contract event indexer for Web3 HMS
+"""
+
+import json
+import uuid
+from datetime import datetime
+
+from eth_utils import event_abi_to_log_topic
+from flask import current_app
+from sqlalchemy.dialects.postgresql import insert
+from web3 import Web3
+
+from extensions import db
+from models.chain_event import ChainEvent
+from models.indexer_checkpoint import IndexerCheckpoint
+from services.chain_cache import chain_cache
+from services.web3_client import CONTRACT_NAMES, contract_registry, get_web3
+
+INDEXER_NAME = 'contracts'
+
+# Contract each history lookup key belongs to
+SUBJECT_CONTRACTS = {
+    'record_id': 'MedicalRecordHash',
+    'grant_id': 'AccessControl',
+    'item_id': 'DrugTrace'
+}
+
+
+def subject_key(value):
+    """Topic value of a string ID emitted as an indexed event argument"""
+    return Web3.keccak(text=value).hex()
+
+
+def _event_map():
+    """Map (contract address, topic0) to the contract key and event"""
+    events = {}
+    for key, contract in contract_registry.get_contracts().items():
+        for abi in contract.abi:
+            if abi.get('type') == 'event':
+                topic = Web3.to_hex(event_abi_to_log_topic(abi))
+                events[(contract.address.lower(), topic)] = (key, getattr(contract.events, abi['name']))
+    return events
+
+
+def _to_json_value(value):
+    if isinstance(value, (bytes, bytearray)):
+        return Web3.to_hex(value)
+    if isinstance(value, (list, tuple)):
+        return [_to_json_value(item) for item in value]
+    return value
+
+
+def decode_logs(logs, events, block_times):
+    """Decode raw logs into chain_events rows, skipping unknown events"""
+    rows = []
+    now = datetime.utcnow()
+    for log in logs:
+        topics = log['topics']
+        if not topics:
+            continue
+        entry = events.get((log['address'].lower(), Web3.to_hex(topics[0])))
+        if entry is None:
+            continue
+
+        key, event = entry
+        decoded = event().process_log(log)
+        rows.append({
+            'id': uuid.uuid4(),
+            'contract_name': CONTRACT_NAMES[key],
+            'contract_address': log['address'],
+            'event_name': decoded['event'],
+            'subject_key': Web3.to_hex(topics[1]) if len(topics) > 1 else None,
+            'args': json.dumps({name: _to_json_value(value) for name, value in decoded['args'].items()}),
+            'tx_hash': Web3.to_hex(log['transactionHash']),
+            'log_index': log['logIndex'],
+            'block_number': log['blockNumber'],
+            'block_hash': Web3.to_hex(log['blockHash']),
+            'block_time': block_times.get(log['blockNumber']),
+            'created_at': now
+        })
+    return rows
+
+
+def _lock_checkpoint():
+    """Get and lock the checkpoint row, or None if another run holds it"""
+    start_block = current_app.config.get('INDEXER_START_BLOCK', 0)
+    db.session.execute(
+        insert(IndexerCheckpoint).values(
+            name=INDEXER_NAME,
+            block_number=start_block - 1
+        ).on_conflict_do_nothing()
+    )
+    db.session.commit()
+    return IndexerCheckpoint.query.filter_by(name=INDEXER_NAME).with_for_update(skip_locked=True).first()
+
+
+def _rewind_on_reorg(w3, checkpoint, trace_keys):
+    """Roll indexed events back if the checkpoint block left the canonical chain
+
+    Subject keys of rolled back DrugTrace events are added to ``trace_keys``.
+    """
+    if checkpoint.block_hash is None:
+        return False
+    block = w3.eth.get_block(checkpoint.block_number)
+    if Web3.to_hex(block['hash']) == checkpoint.block_hash:
+        return False
+
+    start_block = current_app.config.get('INDEXER_START_BLOCK', 0)
+    rewind_to = max(checkpoint.block_number - current_app.config.get('INDEXER_REORG_DEPTH', 12), start_block - 1)
+    trace_keys.update(key for (key,) in db.session.query(ChainEvent.subject_key).filter(
+        ChainEvent.block_number > rewind_to,
+        ChainEvent.contract_name == CONTRACT_NAMES['drug_trace']
+    ).distinct())
+    ChainEvent.query.filter(ChainEvent.block_number > rewind_to).delete(synchronize_session=False)
+    checkpoint.block_number = rewind_to
+    checkpoint.block_hash = Web3.to_hex(w3.eth.get_block(rewind_to)['hash']) if rewind_to >= 0 else None
+    return True
+
+
+def index_events():
+    """Ingest new contract logs from the checkpoint up to the chain head
+
+    Each run reads at most INDEXER_MAX_BATCHES ranges of
+    INDEXER_BATCH_BLOCKS blocks, decodes the logs in bulk and stores them
+    together with the advanced checkpoint in one transaction. DrugTrace
+    items touched by new or rolled back events are re-folded in the same
+    transaction.
+    """
+    from services import trace_index
+
+    checkpoint = _lock_checkpoint()
+    if checkpoint is None:
+        db.session.rollback()
+        return {'skipped': True}
+
+    events = _event_map()
+    if not events:
+        db.session.rollback()
+        return {'skipped': True}
+
+    w3 = get_web3()
+    addresses = [contract.address for contract in contract_registry.get_contracts().values()]
+    batch_blocks = current_app.config.get('INDEXER_BATCH_BLOCKS', 2000)
+    trace_keys = set()
+    rewound = _rewind_on_reorg(w3, checkpoint, trace_keys)
+    latest_block = w3.eth.block_number
+
+    indexed = 0
+    for _ in range(current_app.config.get('INDEXER_MAX_BATCHES', 10)):
+        from_block = checkpoint.block_number + 1
+        if from_block > latest_block:
+            break
+        to_block = min(latest_block, from_block + batch_blocks - 1)
+
+        # Read the range end before its logs so a reorg in between is caught below
+        to_block_hash = Web3.to_hex(w3.eth.get_block(to_block)['hash'])
+        logs = w3.eth.get_logs({
+            'fromBlock': from_block,
+            'toBlock': to_block,
+            'address': addresses
+        })
+        if any(log['blockNumber'] == to_block and Web3.to_hex(log['blockHash']) != to_block_hash for log in logs):
+            break
+
+        block_times = {
+            number: datetime.utcfromtimestamp(chain_cache.get_block(number)['timestamp'])
+            for number in {log['blockNumber'] for log in logs}
+        }
+        rows = decode_logs(logs, events, block_times)
+        if rows:
+            db.session.execute(
+                insert(ChainEvent).values(rows).on_conflict_do_nothing(
+                    index_elements=['tx_hash', 'log_index']
+                )
+            )
+            trace_keys.update(
+                row['subject_key'] for row in rows if row['contract_name'] == CONTRACT_NAMES['drug_trace']
+            )
+
+        checkpoint.block_number = to_block
+        checkpoint.block_hash = to_block_hash
+        indexed += len(rows)
+
+    trace_index.refresh_items(trace_keys)
+    db.session.commit()
+    return {
+        'indexed': indexed,
+        'block_number': checkpoint.block_number,
+        'rewound': rewound
+    }
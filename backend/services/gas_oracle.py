@@ -0,0 +1,113 @@
+"""
+Cached gas price oracle for Web3 HMS
+"""
+
+import json
+import time
+from statistics import median
+
+from flask import current_app
+
+import extensions
+from services.web3_client import get_web3
+
+GAS_PRICE_KEY = 'hms:gas_fees'
+
+# Priority fee percentile sampled for each strategy
+STRATEGY_PERCENTILES = {
+    'slow': 10,
+    'standard': 50,
+    'fast': 90
+}
+
+
+class GasPriceOracle:
+    """Gas prices sampled from fee history and shared through Redis
+
+    A background task refreshes the prices every GAS_ORACLE_INTERVAL
+    seconds, so transaction builders read a cached value instead of
+    calling ``eth_gasPrice``. A short-lived per-process copy saves the
+    Redis round trip for bursts of transactions.
+
+    Prices are EIP-1559 fee fields. The fee cap leaves GAS_BASE_FEE_MULTIPLIER
+    times the next base fee, so a quote stays includable while the base fee
+    climbs during its cache lifetime; only the base fee actually charged and
+    the tip are paid. Chains without fee history get a legacy ``gasPrice``.
+    """
+
+    def __init__(self):
+        self._local = None
+        self._local_at = 0.0
+
+    def sample(self, w3):
+        """Derive the fee fields of each strategy from recent fee history"""
+        percentiles = list(STRATEGY_PERCENTILES.values())
+        try:
+            history = w3.eth.fee_history(
+                current_app.config.get('GAS_ORACLE_BLOCKS', 20), 'latest', percentiles
+            )
+            rewards = [reward for reward in history.get('reward') or [] if reward]
+            next_base_fee = history['baseFeePerGas'][-1]
+        except Exception:
+            # Nodes without eth_feeHistory (pre-London chains, old Ganache)
+            rewards, next_base_fee = [], 0
+
+        if not rewards and not next_base_fee:
+            gas_price = w3.eth.gas_price
+            return {strategy: {'gasPrice': gas_price} for strategy in STRATEGY_PERCENTILES}
+
+        base_fee_cap = int(next_base_fee * current_app.config.get('GAS_BASE_FEE_MULTIPLIER', 2))
+        prices = {}
+        for index, strategy in enumerate(STRATEGY_PERCENTILES):
+            tip = int(median(reward[index] for reward in rewards)) if rewards else 0
+            prices[strategy] = {'maxFeePerGas': base_fee_cap + tip, 'maxPriorityFeePerGas': tip}
+        return prices
+
+    def refresh(self):
+        """Sample fresh prices and publish them to Redis"""
+        prices = self.sample(get_web3())
+        try:
+            extensions.redis_client.hset(GAS_PRICE_KEY, mapping={
+                strategy: json.dumps(fees) for strategy, fees in prices.items()
+            })
+            extensions.redis_client.expire(GAS_PRICE_KEY, current_app.config.get('GAS_ORACLE_TTL', 30))
+        except Exception:
+            pass
+        self._store_local(prices)
+        return prices
+
+    def get_prices(self):
+        """Get the cached prices of every strategy"""
+        if self._local is not None and \
+                time.monotonic() - self._local_at < current_app.config.get('GAS_ORACLE_LOCAL_TTL', 2):
+            return self._local
+
+        try:
+            cached = extensions.redis_client.hgetall(GAS_PRICE_KEY)
+        except Exception:
+            cached = None
+        if cached:
+            prices = {strategy: json.loads(value) for strategy, value in cached.items()}
+            self._store_local(prices)
+            return prices
+
+        # Nothing cached yet, e.g. the refresh task is not running
+        return self.refresh()
+
+    def get_fees(self, strategy=None):
+        """Get the cached fee fields of ``strategy`` (fast, standard or slow)
+
+        Returns ``maxFeePerGas`` and ``maxPriorityFeePerGas``, or
+        ``gasPrice`` on chains without EIP-1559, ready for a transaction.
+        """
+        strategy = strategy or current_app.config.get('GAS_PRICE_STRATEGY', 'standard')
+        if strategy not in STRATEGY_PERCENTILES:
+            raise ValueError(f'Unknown gas price strategy: {strategy}')
+        return self.get_prices()[strategy]
+
+    def _store_local(self, prices):
+        self._local = prices
+        self._local_at = time.monotonic()
+
+
+gas_oracle = GasPriceOracle()
@@ -0,0 +1,119 @@
+"""
+Merkle-batched anchoring of data hashes for Web3 HMS
+"""
+
+import json
+import uuid
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from extensions import db
+from models.data_hash import DataHash
+from models.merkle_batch import MerkleBatch
+from services import merkle, tx_pipeline
+from services.web3_client import contract_registry
+
+# Placeholder owner and type used when a batch root is stored through
+# MedicalRecordHash.createRecord; the batch id is used as the record id
+BATCH_OWNER = 'MERKLE_BATCH'
+BATCH_RECORD_TYPE = 'MERKLE_ROOT'
+
+
+def is_batch_mode():
+    """Check whether record hashes are anchored in Merkle batches"""
+    return current_app.config.get('HASH_ANCHOR_MODE') == 'batch'
+
+
+def pending_hashes():
+    """Query hashes waiting for the next batch"""
+    return DataHash.query.filter(
+        DataHash.anchor_mode == 'BATCH',
+        DataHash.batch_id.is_(None)
+    )
+
+
+def enqueue_hash(record, data_type):
+    """Queue a record hash as a leaf of the next Merkle batch"""
+    hash_value = record.update_hash()
+
+    data_hash = DataHash(
+        data_type=data_type,
+        original_id=record.id,
+        hash_value=hash_value,
+        anchor_mode='BATCH'
+    )
+    db.session.add(data_hash)
+    db.session.commit()
+    return data_hash
+
+
+def flush_batch(force=False):
+    """Anchor pending hashes under a single Merkle root
+
+    The batch is only anchored once it is full or its oldest leaf has
+    waited longer than HASH_BATCH_WINDOW, unless ``force`` is set.
+    The root is submitted through the transaction pipeline. Returns the
+    new MerkleBatch, or None if nothing was anchored.
+    """
+    max_size = current_app.config.get('HASH_BATCH_SIZE', 256)
+    window = current_app.config.get('HASH_BATCH_WINDOW', 60)
+
+    # Concurrent flushes skip each other's rows instead of double anchoring
+    pending = pending_hashes().order_by(
+        DataHash.created_at, DataHash.id
+    ).with_for_update(skip_locked=True).limit(max_size).all()
+
+    is_due = pending and (
+        force or
+        len(pending) >= max_size or
+        pending[0].created_at <= datetime.utcnow() - timedelta(seconds=window)
+    )
+    if not is_due:
+        db.session.rollback()
+        return None
+
+    contract = contract_registry.get_contract('medical_record')
+    if contract is None:
+        db.session.rollback()
+        raise RuntimeError('MedicalRecord contract not available')
+
+    levels = merkle.build_tree([row.hash_value for row in pending])
+    batch = MerkleBatch(
+        id=uuid.uuid4(),
+        merkle_root=merkle.tree_root(levels),
+        leaf_count=len(pending),
+        contract_address=contract.address,
+        job_id=tx_pipeline.new_job_id()
+    )
+    db.session.add(batch)
+
+    for index, row in enumerate(pending):
+        row.batch_id = batch.id
+        row.leaf_index = index
+        row.merkle_proof = json.dumps(merkle.build_proof(levels, index))
+        row.contract_address = contract.address
+        row.job_id = batch.job_id
+
+    db.session.commit()
+
+    tx_pipeline.queue_transaction(
+        batch.job_id,
+        'medical_record',
+        'createRecord',
+        [str(batch.id), BATCH_OWNER, BATCH_OWNER, BATCH_RECORD_TYPE, batch.merkle_root],
+        200000,
+        target={'type': 'merkle_batch', 'id': str(batch.id)}
+    )
+    return batch
+
+
+def verify_inclusion(data_hash, leaf_hash):
+    """Check a leaf hash against the root its DataHash row was anchored under"""
+    if not data_hash.batch_id or not data_hash.merkle_proof:
+        return False
+    return merkle.verify_proof(
+        leaf_hash,
+        json.loads(data_hash.merkle_proof),
+        data_hash.batch.merkle_root
+    )
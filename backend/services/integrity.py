@@ -0,0 +1,223 @@
+"""
+Bulk integrity verification of medical records
+"""
+
+import json
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from flask import current_app
+
+from extensions import db
+from models.data_hash import DataHash
+from models.medical_record import MedicalRecord
+from models.merkle_batch import MerkleBatch
+from services import merkle
+from services.chain_reader import chain_reader
+from services.content_store import ContentUnavailable, content_store
+from services.record_hash import RECORD_HASH_FIELDS, hash_record_chunk
+from services.tx_pipeline import TX_MINED, TX_SENT
+
+_CONTENT_INDEX = RECORD_HASH_FIELDS.index('content')
+
+# Per-record outcomes
+STATUS_OK = 'OK'
+STATUS_MISMATCH = 'MISMATCH'
+STATUS_UNANCHORED = 'UNANCHORED'
+STATUS_UNAVAILABLE = 'UNAVAILABLE'
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_hash_pool():
+    """Get the per-process pool used for re-hashing record content"""
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            # Spawned children start clean, without the parent's connections
+            # or threads. They do re-import the parent's main module: under
+            # gunicorn or celery that is the server's entry point, but under
+            # ``python app.py`` every child builds an app of its own at start
+            _pool = ProcessPoolExecutor(
+                max_workers=current_app.config.get('INTEGRITY_WORKERS') or os.cpu_count(),
+                mp_context=multiprocessing.get_context('spawn')
+            )
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def iter_record_chunks(query, chunk_size, after_id=None):
+    """Walk ``query`` in keyset order on MedicalRecord.id
+
+    Yields lists of rows holding the id, the stored blockchain_hash, the
+    scheme it was computed with, the CID of an offloaded body and the
+    hashed fields, without loading full model objects.
+    """
+    columns = [MedicalRecord.id, MedicalRecord.blockchain_hash, MedicalRecord.hash_scheme,
+               MedicalRecord.content_cid] + \
+        [getattr(MedicalRecord, field) for field in RECORD_HASH_FIELDS]
+    while True:
+        chunk_query = query.with_entities(*columns).order_by(MedicalRecord.id)
+        if after_id is not None:
+            chunk_query = chunk_query.filter(MedicalRecord.id > after_id)
+        rows = chunk_query.limit(chunk_size).all()
+        if not rows:
+            return
+        yield rows
+        after_id = rows[-1][0]
+
+
+def load_anchors(record_ids):
+    """Get the latest DataHash of each record with its Merkle root"""
+    rows = db.session.query(
+        DataHash.original_id,
+        DataHash.hash_value,
+        DataHash.tx_status,
+        DataHash.merkle_proof,
+        DataHash.batch_id,
+        MerkleBatch.merkle_root
+    ).outerjoin(
+        MerkleBatch, MerkleBatch.id == DataHash.batch_id
+    ).filter(
+        DataHash.original_id.in_(record_ids)
+    ).order_by(
+        DataHash.original_id, DataHash.created_at.desc()
+    ).distinct(DataHash.original_id).all()
+    return {row.original_id: row for row in rows}
+
+
+def _chain_key(anchor):
+    """Record ID the anchor was stored under in MedicalRecordHash"""
+    return str(anchor.batch_id) if anchor.batch_id else str(anchor.original_id)
+
+
+def load_chain_hashes(anchors):
+    """Read the on-chain hash of every sent anchor with bulk getRecord calls"""
+    keys = sorted({_chain_key(anchor) for anchor in anchors if anchor.tx_status in (TX_SENT, TX_MINED)})
+    if not keys:
+        return {}
+    records = chain_reader.call_many('medical_record', 'getRecord', [[key] for key in keys])
+    return {key: record['hashValue'] if record else None for key, record in zip(keys, records)}
+
+
+def compare(row, current_hash, anchor, chain_hashes=None):
+    """Build the verification result of one record
+
+    When ``chain_hashes`` is given, sent anchors are also checked against
+    the hash stored on chain.
+    """
+    result = {
+        'record_id': str(row[0]),
+        'current_hash': current_hash,
+        'stored_hash': row[1],
+        'hash_scheme': row[2],
+        'hash_matches': current_hash == row[1],
+        'anchored_hash': None,
+        'anchor_matches': None,
+        'merkle_verified': None,
+        'tx_status': None
+    }
+
+    if anchor is None:
+        result['status'] = STATUS_UNANCHORED if result['hash_matches'] else STATUS_MISMATCH
+        return result
+
+    result['anchored_hash'] = anchor.hash_value
+    result['anchor_matches'] = current_hash == anchor.hash_value
+    result['tx_status'] = anchor.tx_status
+    if anchor.merkle_proof and anchor.merkle_root:
+        result['merkle_verified'] = merkle.verify_proof(
+            current_hash, json.loads(anchor.merkle_proof), anchor.merkle_root
+        )
+    if chain_hashes is not None and anchor.tx_status in (TX_SENT, TX_MINED):
+        result['chain_hash'] = chain_hashes.get(_chain_key(anchor))
+        result['chain_matches'] = result['chain_hash'] == (anchor.merkle_root if anchor.batch_id else anchor.hash_value)
+
+    is_valid = result['hash_matches'] and result['anchor_matches'] and result['merkle_verified'] is not False and \
+        result.get('chain_matches') is not False
+    result['status'] = STATUS_OK if is_valid else STATUS_MISMATCH
+    return result
+
+
+def _hashed_fields(row):
+    """Hashed field values of a chunk row, with an offloaded body fetched"""
+    fields = row[4:]
+    if row[3]:
+        fields = list(fields)
+        fields[_CONTENT_INDEX] = content_store.get_text(row[3])
+    return tuple(fields)
+
+
+def verify_chunks(chunks, on_chain=False):
+    """Re-hash record chunks in the process pool and compare them
+
+    The next chunk is read from the database while earlier ones are being
+    hashed. With ``on_chain`` each chunk's anchors are also read back from
+    the contract in one bulk call. Yields one result per record, in input
+    order; a record whose offloaded body cannot be fetched is not hashed
+    and comes out as unavailable.
+    """
+    pool = get_hash_pool()
+    max_in_flight = (current_app.config.get('INTEGRITY_WORKERS') or os.cpu_count()) * 2
+    in_flight = deque()
+
+    def drain():
+        rows, future = in_flight.popleft()
+        hashes = dict(future.result())
+        anchors = load_anchors([row[0] for row in rows])
+        chain_hashes = load_chain_hashes(anchors.values()) if on_chain else None
+        for row in rows:
+            if row[0] in hashes:
+                yield compare(row, hashes[row[0]], anchors.get(row[0]), chain_hashes)
+            else:
+                result = compare(row, None, anchors.get(row[0]), chain_hashes)
+                result['status'] = STATUS_UNAVAILABLE
+                yield result
+
+    for rows in chunks:
+        work = []
+        for row in rows:
+            try:
+                work.append((row[0], row[2], _hashed_fields(row)))
+            except ContentUnavailable:
+                continue
+        in_flight.append((rows, pool.submit(hash_record_chunk, work)))
+        if len(in_flight) >= max_in_flight:
+            yield from drain()
+
+    while in_flight:
+        yield from drain()
+
+
+class VerificationStats:
+    """Running totals and throughput of a verification run"""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.counts = {STATUS_OK: 0, STATUS_MISMATCH: 0, STATUS_UNANCHORED: 0, STATUS_UNAVAILABLE: 0}
+
+    def add(self, result):
+        self.counts[result['status']] += 1
+
+    @property
+    def total(self):
+        return sum(self.counts.values())
+
+    def to_dict(self):
+        """Convert to dictionary"""
+        elapsed = time.monotonic() - self.started
+        return {
+            'total': self.total,
+            'ok': self.counts[STATUS_OK],
+            'mismatched': self.counts[STATUS_MISMATCH],
+            'unanchored': self.counts[STATUS_UNANCHORED],
+            'unavailable': self.counts[STATUS_UNAVAILABLE],
+            'elapsed_seconds': round(elapsed, 3),
+            'records_per_second': round(self.total / elapsed, 1) if elapsed > 0 else None
+        }
@@ -0,0 +1,242 @@
+"""
+Resumable background integrity audit of medical records
+
+A pass walks every row of emr_records in keyset order, re-hashes the
+content in the integrity worker pool and compares it with the stored
+blockchain_hash and the latest DataHash anchor. Each task run scans for at
+most AUDIT_MAX_RUNTIME seconds and checkpoints its position in Redis, so the
+next scheduled run resumes where the last one stopped. Mismatches, and
+records whose offloaded body could not be fetched, are kept in a Redis list
+and the totals of the last finished pass in a report.
+"""
+
+import json
+import time
+import uuid
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import text
+
+import extensions
+from extensions import db
+from models.medical_record import MedicalRecord
+from services import integrity
+
+AUDIT_LOCK_KEY = 'hms:audit:lock'
+AUDIT_CHECKPOINT_KEY = 'hms:audit:checkpoint'
+AUDIT_MISMATCHES_KEY = 'hms:audit:mismatches'
+AUDIT_LAST_MISMATCHES_KEY = 'hms:audit:mismatches:last'
+AUDIT_REPORT_KEY = 'hms:audit:report'
+
+COUNTERS = ('total', 'ok', 'mismatched', 'unanchored', 'unavailable', 'runs')
+TIMERS = ('elapsed_seconds', 'throttled_seconds')
+
+ACTIVE_QUERIES_SQL = text(
+    "SELECT count(*) FROM pg_stat_activity "
+    "WHERE state = 'active' AND datname = current_database() AND pid <> pg_backend_pid()"
+)
+
+_STATUS_COUNTERS = {
+    integrity.STATUS_OK: 'ok',
+    integrity.STATUS_MISMATCH: 'mismatched',
+    integrity.STATUS_UNANCHORED: 'unanchored',
+    integrity.STATUS_UNAVAILABLE: 'unavailable'
+}
+
+
+class AuditPass:
+    """Progress of one audit pass, persisted in the Redis checkpoint hash"""
+
+    def __init__(self, fields=None):
+        fields = fields or {}
+        self.pass_id = fields.get('pass_id') or uuid.uuid4().hex
+        self.started_at = fields.get('started_at') or datetime.utcnow().isoformat()
+        self.after_id = fields.get('after_id') or None
+        for name in COUNTERS:
+            setattr(self, name, int(fields.get(name) or 0))
+        for name in TIMERS:
+            setattr(self, name, float(fields.get(name) or 0))
+
+    @classmethod
+    def load(cls):
+        fields = extensions.redis_client.hgetall(AUDIT_CHECKPOINT_KEY)
+        return cls(fields) if fields else None
+
+    def add(self, result):
+        counter = _STATUS_COUNTERS[result['status']]
+        setattr(self, counter, getattr(self, counter) + 1)
+        self.total += 1
+        self.after_id = result['record_id']
+
+    def save(self):
+        extensions.redis_client.hset(AUDIT_CHECKPOINT_KEY, mapping={
+            'pass_id': self.pass_id,
+            'started_at': self.started_at,
+            'after_id': self.after_id or '',
+            **{name: getattr(self, name) for name in COUNTERS},
+            **{name: round(getattr(self, name), 3) for name in TIMERS}
+        })
+
+    def to_dict(self):
+        """Convert to dictionary"""
+        scanning = self.elapsed_seconds - self.throttled_seconds
+        return {
+            'pass_id': self.pass_id,
+            'started_at': self.started_at,
+            'after_id': self.after_id,
+            **{name: getattr(self, name) for name in COUNTERS},
+            **{name: round(getattr(self, name), 3) for name in TIMERS},
+            'records_per_second': round(self.total / self.elapsed_seconds, 1) if self.elapsed_seconds > 0 else None,
+            'scan_records_per_second': round(self.total / scanning, 1) if scanning > 0 else None
+        }
+
+
+class Throttle:
+    """Pace chunk reads by a record rate cap and the database's own load"""
+
+    def __init__(self, deadline):
+        self.deadline = deadline
+        self.max_rate = current_app.config.get('AUDIT_MAX_RATE', 0)
+        self.max_active = current_app.config.get('AUDIT_MAX_ACTIVE_QUERIES', 0)
+        self.backoff = current_app.config.get('AUDIT_BACKOFF', 1)
+        self.next_read = time.monotonic()
+        self.waited = 0.0
+
+    def wait(self, rows):
+        """Sleep before the chunk read following one of ``rows`` records"""
+        started = time.monotonic()
+        if self.max_rate:
+            self.next_read = max(self.next_read, started - 1) + rows / self.max_rate
+            self._sleep_until(self.next_read)
+
+        delay = self.backoff
+        while self.max_active and time.monotonic() < self.deadline:
+            active = db.session.execute(ACTIVE_QUERIES_SQL).scalar()
+            db.session.rollback()
+            if active <= self.max_active:
+                break
+            self._sleep_until(time.monotonic() + delay)
+            delay = min(delay * 2, 30)
+        self.waited += time.monotonic() - started
+
+    def _sleep_until(self, moment):
+        remaining = min(moment, self.deadline) - time.monotonic()
+        if remaining > 0:
+            time.sleep(remaining)
+
+
+def _throttled(chunks, throttle):
+    for rows in chunks:
+        yield rows
+        if time.monotonic() >= throttle.deadline:
+            return
+        throttle.wait(len(rows))
+
+
+def run_audit(max_runtime=None, restart=False):
+    """Scan the next slice of the current audit pass
+
+    Starts a new pass once AUDIT_PASS_INTERVAL has elapsed since the last
+    one finished, or right away with ``restart``. Returns the pass progress,
+    or the reason the run was skipped: another run holds the lock, which
+    also refuses a restart, or no pass is due.
+    """
+    config = current_app.config
+    max_runtime = max_runtime or config.get('AUDIT_MAX_RUNTIME', 240)
+    token = uuid.uuid4().hex
+    if not extensions.redis_client.set(AUDIT_LOCK_KEY, token, nx=True, ex=int(max_runtime) + 60):
+        return {'skipped': 'locked', 'restart_refused': restart}
+
+    try:
+        audit = None if restart else AuditPass.load()
+        if audit is None:
+            if not restart and not _pass_due(config.get('AUDIT_PASS_INTERVAL', 86400)):
+                return {'skipped': 'not_due'}
+            extensions.redis_client.delete(AUDIT_MISMATCHES_KEY)
+            audit = AuditPass()
+        return _scan(audit, max_runtime).to_dict()
+    finally:
+        if extensions.redis_client.get(AUDIT_LOCK_KEY) == token:
+            extensions.redis_client.delete(AUDIT_LOCK_KEY)
+
+
+def _pass_due(interval):
+    report = get_report()
+    if not report or not report.get('finished_at'):
+        return True
+    finished_at = datetime.fromisoformat(report['finished_at'])
+    return (datetime.utcnow() - finished_at).total_seconds() >= interval
+
+
+def _scan(audit, max_runtime):
+    config = current_app.config
+    chunk_size = config.get('INTEGRITY_CHUNK_SIZE', 500)
+    mismatch_limit = config.get('AUDIT_MISMATCH_LIMIT', 10000)
+    throttle = Throttle(time.monotonic() + max_runtime)
+    marks = [time.monotonic(), 0.0]
+
+    def checkpoint():
+        now = time.monotonic()
+        audit.elapsed_seconds += now - marks[0]
+        audit.throttled_seconds += throttle.waited - marks[1]
+        marks[:] = [now, throttle.waited]
+        audit.save()
+
+    after_id = uuid.UUID(audit.after_id) if audit.after_id else None
+    chunks = _throttled(integrity.iter_record_chunks(MedicalRecord.query, chunk_size, after_id), throttle)
+    results = integrity.verify_chunks(chunks)
+    audit.runs += 1
+    scanned = 0
+    try:
+        for result in results:
+            audit.add(result)
+            scanned += 1
+            if result['status'] in (integrity.STATUS_MISMATCH, integrity.STATUS_UNAVAILABLE):
+                extensions.redis_client.rpush(AUDIT_MISMATCHES_KEY, json.dumps(dict(
+                    result, pass_id=audit.pass_id, detected_at=datetime.utcnow().isoformat()
+                )))
+                extensions.redis_client.ltrim(AUDIT_MISMATCHES_KEY, 0, mismatch_limit - 1)
+            if scanned % chunk_size == 0:
+                checkpoint()
+                if time.monotonic() >= throttle.deadline:
+                    break
+    finally:
+        results.close()
+
+    # Reads stop at the deadline, so only a run that beat it saw every row
+    complete = time.monotonic() < throttle.deadline
+    checkpoint()
+    if complete:
+        _finish(audit)
+    return audit
+
+
+def _finish(audit):
+    """Publish the report of a finished pass and clear its checkpoint"""
+    report = dict(audit.to_dict(), finished_at=datetime.utcnow().isoformat())
+    pipe = extensions.redis_client.pipeline()
+    pipe.set(AUDIT_REPORT_KEY, json.dumps(report))
+    pipe.delete(AUDIT_LAST_MISMATCHES_KEY)
+    if audit.mismatched or audit.unavailable:
+        pipe.rename(AUDIT_MISMATCHES_KEY, AUDIT_LAST_MISMATCHES_KEY)
+    pipe.delete(AUDIT_CHECKPOINT_KEY)
+    pipe.execute()
+
+
+def get_report():
+    """Get the totals of the last finished audit pass"""
+    report = extensions.redis_client.get(AUDIT_REPORT_KEY)
+    return json.loads(report) if report else None
+
+
+def get_progress():
+    """Get the progress of the pass in flight"""
+    audit = AuditPass.load()
+    return audit.to_dict() if audit else None
+
+
+def get_mismatches(last=False, limit=100):
+    """Get mismatches found by the pass in flight, or by the last finished one"""
+    key = AUDIT_LAST_MISMATCHES_KEY if last else AUDIT_MISMATCHES_KEY
+    return [json.loads(item) for item in extensions.redis_client.lrange(key, 0, limit - 1)]
@@ -0,0 +1,78 @@
+"""
+Merkle tree helpers for batched hash anchoring
+"""
+
+import hashlib
+
+# Domain separation between leaves and inner nodes, so an inner node can
+# never be passed off as a leaf
+LEAF_PREFIX = b'\x00'
+NODE_PREFIX = b'\x01'
+
+
+def hash_leaf(leaf_hex):
+    """Hash a hex-encoded data hash into a tree leaf"""
+    return hashlib.sha256(LEAF_PREFIX + bytes.fromhex(leaf_hex)).digest()
+
+
+def hash_node(left, right):
+    """Hash two child nodes into their parent"""
+    return hashlib.sha256(NODE_PREFIX + left + right).digest()
+
+
+def build_tree(leaves):
+    """Build all tree levels from hex-encoded leaves, leaves first
+
+    An unpaired node is promoted to the next level unchanged instead of
+    being hashed with itself.
+    """
+    if not leaves:
+        raise ValueError('Cannot build a Merkle tree without leaves')
+
+    level = [hash_leaf(leaf) for leaf in leaves]
+    levels = [level]
+    while len(level) > 1:
+        parents = [hash_node(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            parents.append(level[-1])
+        level = parents
+        levels.append(level)
+    return levels
+
+
+def tree_root(levels):
+    """Get the hex-encoded root of a built tree"""
+    return levels[-1][0].hex()
+
+
+def build_proof(levels, index):
+    """Build the inclusion proof for the leaf at ``index``
+
+    Each step is ``{'position': 'left' | 'right', 'hash': <hex>}`` naming
+    the side the sibling sits on.
+    """
+    proof = []
+    for level in levels[:-1]:
+        sibling = index ^ 1
+        if sibling < len(level):
+            proof.append({
+                'position': 'left' if sibling < index else 'right',
+                'hash': level[sibling].hex()
+            })
+        index //= 2
+    return proof
+
+
+def verify_proof(leaf_hex, proof, root_hex):
+    """Check that ``leaf_hex`` is included under ``root_hex``"""
+    try:
+        node = hash_leaf(leaf_hex)
+        for step in proof:
+            sibling = bytes.fromhex(step['hash'])
+            if step['position'] == 'left':
+                node = hash_node(sibling, node)
+            else:
+                node = hash_node(node, sibling)
+    except (KeyError, TypeError, ValueError):
+        return False
+    return node.hex() == root_hex
@@ -0,0 +1,48 @@
+"""
+Nonce manager for concurrent transaction submission
+"""
+
+import extensions
+
+NONCE_KEY = 'hms:nonce:{address}'
+
+
+class NonceManager:
+    """Hand out account nonces from a shared Redis counter
+
+    Every worker allocates nonces with an atomic INCR, so many transactions
+    from the same account can be in flight at once without asking the node
+    for ``eth_getTransactionCount`` on each send. The counter is seeded from
+    the node's pending count and re-seeded after a nonce error.
+    """
+
+    def _key(self, address):
+        return NONCE_KEY.format(address=address.lower())
+
+    def next_nonce(self, w3, address):
+        """Allocate the next nonce for ``address``"""
+        key = self._key(address)
+        if not extensions.redis_client.exists(key):
+            # Only the first worker to get here seeds the counter
+            pending = w3.eth.get_transaction_count(address, 'pending')
+            extensions.redis_client.set(key, pending - 1, nx=True)
+        return extensions.redis_client.incr(key)
+
+    def resync(self, address):
+        """Forget the local counter so it is re-seeded from the node"""
+        extensions.redis_client.delete(self._key(address))
+
+
+nonce_manager = NonceManager()
+
+
+def is_nonce_error(error):
+    """Check whether a send failed because of a stale or reused nonce"""
+    message = str(error).lower()
+    return any(text in message for text in (
+        'nonce too low',
+        'nonce too high',
+        'already known',
+        'replacement transaction underpriced',
+        'incorrect nonce'
+    ))
@@ -0,0 +1,305 @@
+"""
+Bulk patient import from CSV or NDJSON rosters
+
+Rows are read as a stream and handled in batches of IMPORT_BATCH_SIZE:
+
+1. Each row is validated against the patient columns (required fields,
+   lengths, dates). Unknown columns are ignored and listed in the report.
+2. ID card and medical card numbers are checked against earlier rows of
+   the file and against the table in one query per batch.
+3. The batch is written with one multi-row ``INSERT .. ON CONFLICT``
+   (id_card), which skips or updates existing patients, and committed.
+
+Every rejected row gets an entry in the report with its line number.
+Search vectors of inserted and updated rows are (re)built by the
+``search.reindex`` task and list counters are reseeded, as bulk inserts
+bypass the row events.
+
+Run from the command line with::
+
+    python -m services.patient_import roster.csv --on-conflict update
+"""
+
+import argparse
+import csv
+import io
+import json
+import time
+from datetime import date
+
+import orjson
+from flask import current_app
+from sqlalchemy import String, func, or_, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
+
+from extensions import celery, db
+from models.patient import Patient
+from services import counts
+
+FORMATS = ('csv', 'ndjson')
+CONFLICT_MODES = ('skip', 'update')
+
+# Columns accepted from a roster, as in PatientListResource.post
+IMPORT_FIELDS = (
+    'name', 'id_card', 'phone', 'email', 'address', 'birth_date', 'gender',
+    'emergency_contact', 'emergency_phone', 'medical_card_id', 'blockchain_addr',
+    'insurance_type', 'insurance_number', 'allergies', 'medical_history'
+)
+REQUIRED_FIELDS = ('name', 'id_card')
+
+_MAX_LENGTHS = {
+    name: Patient.__table__.c[name].type.length
+    for name in IMPORT_FIELDS
+    if isinstance(Patient.__table__.c[name].type, String) and Patient.__table__.c[name].type.length
+}
+
+
+class ImportReport:
+    """Counters and rejected rows of one import"""
+
+    def __init__(self, error_limit):
+        self.error_limit = error_limit
+        self.total = 0
+        self.inserted = 0
+        self.updated = 0
+        self.duplicates = 0
+        self.invalid = 0
+        self.errors = []
+        self.errors_truncated = False
+        self.ignored_columns = set()
+        self.started = time.monotonic()
+
+    def reject(self, line, row, message, duplicate=False):
+        if duplicate:
+            self.duplicates += 1
+        else:
+            self.invalid += 1
+        if len(self.errors) < self.error_limit:
+            self.errors.append({'line': line, 'id_card': row.get('id_card'), 'error': message})
+        else:
+            self.errors_truncated = True
+
+    def to_dict(self):
+        elapsed = time.monotonic() - self.started
+        return {
+            'total': self.total,
+            'inserted': self.inserted,
+            'updated': self.updated,
+            'duplicates': self.duplicates,
+            'invalid': self.invalid,
+            'errors': sorted(self.errors, key=lambda error: error['line']),
+            'errors_truncated': self.errors_truncated,
+            'ignored_columns': sorted(self.ignored_columns),
+            'elapsed_seconds': round(elapsed, 3),
+            'rows_per_second': round(self.total / elapsed, 1) if elapsed > 0 else None
+        }
+
+
+def read_rows(stream, import_format):
+    """``(line, row)`` pairs of a binary roster stream"""
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if import_format == 'csv':
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, row
+    elif import_format == 'ndjson':
+        for line, raw in enumerate(text, 1):
+            if not raw.strip():
+                continue
+            try:
+                row = orjson.loads(raw)
+            except orjson.JSONDecodeError as e:
+                yield line, ValueError(f'Invalid JSON: {e}')
+                continue
+            yield line, row if isinstance(row, dict) else ValueError('Row is not a JSON object')
+    else:
+        raise ValueError(f"Invalid format, expected one of: {', '.join(FORMATS)}")
+
+
+def clean_row(row, report):
+    """Validated patient values of a roster row
+
+    Raises ValueError with the first problem found.
+    """
+    if isinstance(row, ValueError):
+        raise row
+    values = {}
+    for key, value in row.items():
+        if key not in IMPORT_FIELDS:
+            if key is not None:
+                report.ignored_columns.add(key)
+            continue
+        if value is not None and not isinstance(value, str):
+            value = str(value)
+        value = value.strip() if value else None
+        values[key] = value or None
+
+    for name in REQUIRED_FIELDS:
+        if not values.get(name):
+            raise ValueError(f'{name} is required')
+    for name, length in _MAX_LENGTHS.items():
+        if values.get(name) and len(values[name]) > length:
+            raise ValueError(f'{name} is longer than {length} characters')
+    if values.get('birth_date'):
+        try:
+            values['birth_date'] = date.fromisoformat(values['birth_date'])
+        except ValueError:
+            raise ValueError('Invalid birth_date, expected YYYY-MM-DD') from None
+    return values
+
+
+def _existing(batch):
+    """Map ID card and medical card numbers of ``batch`` found in the table to the owning ID card"""
+    id_cards = [values['id_card'] for _, values in batch]
+    medical_cards = [values['medical_card_id'] for _, values in batch if values.get('medical_card_id')]
+    condition = Patient.id_card.in_(id_cards)
+    if medical_cards:
+        condition = or_(condition, Patient.medical_card_id.in_(medical_cards))
+    by_id_card, by_medical_card = set(), {}
+    for id_card, medical_card_id in db.session.execute(
+        select(Patient.id_card, Patient.medical_card_id).where(condition)
+    ):
+        by_id_card.add(id_card)
+        if medical_card_id:
+            by_medical_card[medical_card_id] = id_card
+    return by_id_card, by_medical_card
+
+
+def _write(rows, on_conflict):
+    """Insert ``rows`` in one statement, returning the ID cards written"""
+    stmt = insert(Patient)
+    if on_conflict == 'update':
+        # Empty roster columns keep the stored value
+        table = Patient.__table__
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['id_card'],
+            set_={
+                **{name: func.coalesce(stmt.excluded[name], table.c[name]) for name in IMPORT_FIELDS if name != 'id_card'},
+                'updated_at': stmt.excluded.updated_at,
+                # Left to the missing_only reindex queued after the import
+                'search_vector': None
+            }
+        )
+    else:
+        stmt = stmt.on_conflict_do_nothing(index_elements=['id_card'])
+    # Every row carries the same keys, so the insert is batched into multi-row VALUES
+    rows = [{name: row.get(name) for name in IMPORT_FIELDS} for row in rows]
+    return {id_card for id_card, in db.session.execute(stmt.returning(Patient.id_card), rows)}
+
+
+def _load_batch(batch, on_conflict, dry_run, report):
+    """Dedup and write one batch, then record its outcome in ``report``
+
+    Nothing is recorded before the batch commits, so a failed batch can be
+    retried as a whole.
+    """
+    by_id_card, by_medical_card = _existing(batch)
+    accepted, rejected = [], []
+    for line, values in batch:
+        owner = by_medical_card.get(values.get('medical_card_id'))
+        if owner is not None and owner != values['id_card']:
+            rejected.append((line, values, 'Medical card ID belongs to another patient', False))
+        elif values['id_card'] in by_id_card and on_conflict == 'skip':
+            rejected.append((line, values, 'Patient with this ID card already exists', True))
+        else:
+            accepted.append((line, values))
+
+    if dry_run:
+        written = {values['id_card'] for _, values in accepted}
+    elif accepted:
+        written = _write([values for _, values in accepted], on_conflict)
+        # Bulk inserts bypass the row events that keep list counters current
+        counts.invalidate(db.session, Patient)
+        db.session.commit()
+
+    for line, values, message, duplicate in rejected:
+        report.reject(line, values, message, duplicate)
+    for line, values in accepted:
+        if values['id_card'] not in written:
+            # Inserted by someone else since the lookup
+            report.reject(line, values, 'Patient with this ID card already exists', duplicate=True)
+        elif values['id_card'] in by_id_card:
+            report.updated += 1
+        else:
+            report.inserted += 1
+
+
+def _load_batch_retrying(batch, on_conflict, dry_run, report):
+    try:
+        _load_batch(batch, on_conflict, dry_run, report)
+    except IntegrityError:
+        # A medical card number taken concurrently; the fresh lookup reports it
+        db.session.rollback()
+        _load_batch(batch, on_conflict, dry_run, report)
+
+
+def import_patients(stream, import_format='csv', on_conflict='skip', dry_run=False, batch_size=None):
+    """Import a roster of patients from a binary stream
+
+    ``on_conflict`` decides whether patients whose ID card already exists
+    are skipped and reported, or updated with the non-empty columns of the
+    roster. ``dry_run`` validates and dedups without writing, reporting
+    what would be inserted and updated. Returns the report as a dictionary.
+    """
+    if on_conflict not in CONFLICT_MODES:
+        raise ValueError(f"Invalid on_conflict, expected one of: {', '.join(CONFLICT_MODES)}")
+    config = current_app.config
+    batch_size = batch_size or config.get('IMPORT_BATCH_SIZE', 5000)
+    report = ImportReport(config.get('IMPORT_ERROR_LIMIT', 1000))
+    seen_id_cards = {}
+    seen_medical_cards = {}
+
+    batch = []
+    for line, row in read_rows(stream, import_format):
+        report.total += 1
+        try:
+            values = clean_row(row, report)
+        except ValueError as e:
+            report.reject(line, row if isinstance(row, dict) else {}, str(e))
+            continue
+
+        first = seen_id_cards.setdefault(values['id_card'], line)
+        if first != line:
+            report.reject(line, values, f'Duplicate id_card, first seen on line {first}', duplicate=True)
+            continue
+        if values.get('medical_card_id'):
+            first = seen_medical_cards.setdefault(values['medical_card_id'], line)
+            if first != line:
+                report.reject(line, values, f'Duplicate medical_card_id, first seen on line {first}')
+                continue
+
+        batch.append((line, values))
+        if len(batch) >= batch_size:
+            _load_batch_retrying(batch, on_conflict, dry_run, report)
+            batch = []
+    if batch:
+        _load_batch_retrying(batch, on_conflict, dry_run, report)
+
+    if (report.inserted or report.updated) and not dry_run:
+        try:
+            celery.send_task('search.reindex', kwargs={'missing_only': True})
+        except Exception:
+            # Rows stay searchable by the next reindex run
+            pass
+    result = report.to_dict()
+    result['dry_run'] = dry_run
+    return result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Import a roster of patients from CSV or NDJSON')
+    parser.add_argument('path', help='Roster file')
+    parser.add_argument('--format', choices=FORMATS, help='Roster format, from the file extension by default')
+    parser.add_argument('--on-conflict', choices=CONFLICT_MODES, default='skip',
+                        help='Skip or update patients whose ID card already exists')
+    parser.add_argument('--batch-size', type=int, help='Rows validated and written per batch')
+    parser.add_argument('--dry-run', action='store_true', help='Validate and dedup without writing')
+    args = parser.parse_args()
+
+    from app import app
+
+    import_format = args.format or ('ndjson' if args.path.endswith(('.ndjson', '.jsonl')) else 'csv')
+    with app.app_context(), open(args.path, 'rb') as roster:
+        result = import_patients(roster, import_format, args.on_conflict, args.dry_run, args.batch_size)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
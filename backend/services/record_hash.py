@@ -0,0 +1,105 @@
+"""
+Medical record content hashing
+
+Kept free of Flask and database imports so hashing can run in worker
+processes.
+
+Each stored hash carries the scheme it was computed with:
+
+* ``HASH_SCHEME_LEGACY`` (1) hashes the fields joined into one string,
+  with ``None`` rendered as ``"None"``. It is ambiguous (``"ab", "c"`` and
+  ``"a", "bc"`` collide) and builds a full copy of the content.
+* ``HASH_SCHEME_CANONICAL`` (2) feeds SHA-256 a tagged, length-prefixed
+  encoding field by field::
+
+      b'HMSREC' version:u8
+      for each field: tag:u8 present:u8 [length:u64be utf8-bytes]
+
+  Long values are encoded and hashed in slices, so no joined string and no
+  full UTF-8 copy of the content is built.
+"""
+
+import hashlib
+import struct
+
+# Fields covered by a record hash, in hashing order
+RECORD_HASH_FIELDS = ('title', 'content', 'diagnosis', 'treatment', 'prescription')
+
+HASH_SCHEME_LEGACY = 1
+HASH_SCHEME_CANONICAL = 2
+HASH_SCHEMES = (HASH_SCHEME_LEGACY, HASH_SCHEME_CANONICAL)
+
+# Scheme used for newly hashed records
+CURRENT_HASH_SCHEME = HASH_SCHEME_CANONICAL
+
+CANONICAL_MAGIC = b'HMSREC'
+
+# Characters encoded per slice when streaming long non-ASCII values
+STREAM_SLICE = 64 * 1024
+
+_ABSENT = b'\x00'
+_PRESENT = b'\x01'
+_TAGS = tuple(bytes((index,)) for index in range(1, len(RECORD_HASH_FIELDS) + 1))
+_LENGTH = struct.Struct('>Q')
+
+
+def _update_text(digest, value):
+    """Feed the length prefix and UTF-8 bytes of ``value`` into ``digest``"""
+    if isinstance(value, bytes):
+        digest.update(_LENGTH.pack(len(value)))
+        digest.update(value)
+        return
+    if not isinstance(value, str):
+        value = str(value)
+
+    if len(value) <= STREAM_SLICE:
+        encoded = value.encode('utf-8')
+        digest.update(_LENGTH.pack(len(encoded)))
+        digest.update(encoded)
+        return
+
+    slices = range(0, len(value), STREAM_SLICE)
+    if value.isascii():
+        length = len(value)
+    else:
+        # The byte length has to precede the data, so long non-ASCII values
+        # are measured in one pass and hashed in a second
+        length = sum(len(value[start:start + STREAM_SLICE].encode('utf-8')) for start in slices)
+    digest.update(_LENGTH.pack(length))
+    for start in slices:
+        digest.update(value[start:start + STREAM_SLICE].encode('utf-8'))
+
+
+def _hash_canonical(fields):
+    digest = hashlib.sha256(CANONICAL_MAGIC + bytes((HASH_SCHEME_CANONICAL,)))
+    count = 0
+    for tag, value in zip(_TAGS, fields):
+        count += 1
+        digest.update(tag)
+        if value is None:
+            digest.update(_ABSENT)
+            continue
+        digest.update(_PRESENT)
+        _update_text(digest, value)
+    if count != len(RECORD_HASH_FIELDS):
+        raise ValueError(f'Expected {len(RECORD_HASH_FIELDS)} record fields, got {count}')
+    return digest.hexdigest()
+
+
+def _hash_legacy(fields):
+    content_to_hash = ''.join(f'{value}' for value in fields)
+    return hashlib.sha256(content_to_hash.encode('utf-8')).hexdigest()
+
+
+def hash_record_fields(fields, scheme=HASH_SCHEME_LEGACY):
+    """Calculate the SHA-256 hash of record field values in RECORD_HASH_FIELDS order"""
+    if scheme == HASH_SCHEME_CANONICAL:
+        return _hash_canonical(fields)
+    if scheme == HASH_SCHEME_LEGACY or scheme is None:
+        return _hash_legacy(fields)
+    raise ValueError(f'Unknown record hash scheme: {scheme}')
+
+
+def hash_record_chunk(rows):
+    """Hash ``(key, scheme, fields)`` rows, returning ``(key, hash)`` pairs"""
+    return [(key, hash_record_fields(fields, scheme)) for key, scheme, fields in rows]
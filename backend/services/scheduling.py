@@ -0,0 +1,182 @@
+"""
+Doctor schedules and appointment slot availability
+
+Doctors work from weekly templates (``DoctorSchedule``): a weekday, working
+hours and a slot length, optionally limited to a date range. Bookable slots
+are never stored; they are expanded from the templates when asked for.
+
+Booked slots live in ``appointments`` as ``[schedule_time, end_time)``
+ranges, indexed per doctor by the GiST exclusion constraint
+``excl_appointments_doctor_slot``. The constraint is what rejects a second
+booking of an overlapping range, atomically and across workers, so callers
+only translate its violation (``is_slot_conflict``) into a conflict answer.
+
+``free_slots`` expands the templates of a department or doctor over the
+requested days and drops the slots booked in that window, read through
+the same index, in a single statement.
+"""
+
+from datetime import date, datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import or_, text
+
+from extensions import db
+from models.doctor_schedule import DoctorSchedule
+
+# SQLSTATE of an exclusion constraint violation
+EXCLUSION_VIOLATION = '23P01'
+
+# Slots of every active template over [first_day, last_day], minus the ones
+# overlapping a live booking. Bookings of the window are read first through
+# the GiST index, repeating the constraint predicate so the planner can use
+# the partial index, with one row per day they touch. The expanded slots are
+# then anti-joined against them on doctor and day.
+FREE_SLOTS_SQL = """
+WITH booked AS MATERIALIZED (
+    SELECT a.doctor_id, touched.day, a.schedule_time, a.end_time
+    FROM appointments a
+    CROSS JOIN LATERAL generate_series(
+        date_trunc('day', a.schedule_time), a.end_time - interval '1 microsecond', interval '1 day'
+    ) AS touched(day)
+    WHERE a.doctor_id IN (SELECT s.doctor_id FROM doctor_schedules s WHERE {condition} AND s.is_active)
+      AND a.status <> 'CANCELLED' AND a.end_time IS NOT NULL
+      AND tsrange(a.schedule_time, a.end_time) && tsrange(CAST(:first_day AS timestamp), CAST(:window_end AS timestamp))
+)
+SELECT s.doctor_id, d.name AS doctor_name, d.title AS doctor_title,
+       slot.start_time, slot.start_time + make_interval(mins => s.slot_minutes) AS end_time
+FROM doctor_schedules s
+JOIN doctors d ON d.id = s.doctor_id AND d.is_active
+CROSS JOIN generate_series(CAST(:first_day AS timestamp), CAST(:last_day AS timestamp), interval '1 day') AS day(value)
+CROSS JOIN LATERAL generate_series(
+    day.value + s.start_time,
+    day.value + s.end_time - make_interval(mins => s.slot_minutes),
+    make_interval(mins => s.slot_minutes)
+) AS slot(start_time)
+WHERE {condition}
+  AND s.is_active
+  AND s.weekday = CAST(extract(isodow FROM day.value) AS integer) - 1
+  AND (s.valid_from IS NULL OR s.valid_from <= day.value)
+  AND (s.valid_until IS NULL OR s.valid_until >= day.value)
+  AND slot.start_time >= :not_before
+  AND NOT EXISTS (
+      SELECT 1 FROM booked b
+      WHERE b.doctor_id = s.doctor_id AND b.day = day.value
+        AND b.schedule_time < slot.start_time + make_interval(mins => s.slot_minutes)
+        AND b.end_time > slot.start_time
+  )
+ORDER BY slot.start_time, d.name, s.doctor_id
+"""
+
+_CONDITIONS = {
+    'dept_id': 's.dept_id = :dept_id',
+    'doctor_id': 's.doctor_id = :doctor_id',
+}
+_statements = {}
+
+
+def is_slot_conflict(error):
+    """Whether an IntegrityError is a rejected overlapping booking"""
+    return getattr(getattr(error, 'orig', None), 'pgcode', None) == EXCLUSION_VIOLATION
+
+
+def _covers(schedule, moment):
+    day = moment.date()
+    return (
+        schedule.is_active
+        and schedule.weekday == day.weekday()
+        and (schedule.valid_from is None or schedule.valid_from <= day)
+        and (schedule.valid_until is None or schedule.valid_until >= day)
+        and schedule.start_time <= moment.time() < schedule.end_time
+    )
+
+
+def booking_slot(doctor, schedule_time):
+    """``(start, end)`` of the slot booked by an appointment at ``schedule_time``
+
+    Doctors without a schedule keep taking any time, booked for
+    APPOINTMENT_SLOT_MINUTES. Otherwise the time must start one of the
+    slots of an active template. Raises ValueError when it does not.
+    """
+    schedules = doctor.schedules.filter_by(is_active=True).all()
+    if not schedules:
+        minutes = current_app.config.get('APPOINTMENT_SLOT_MINUTES', 15)
+        return schedule_time, schedule_time + timedelta(minutes=minutes)
+
+    for schedule in schedules:
+        if not _covers(schedule, schedule_time):
+            continue
+        day_start = datetime.combine(schedule_time.date(), schedule.start_time)
+        offset = schedule_time - day_start
+        slot = timedelta(minutes=schedule.slot_minutes)
+        end = schedule_time + slot
+        if offset % slot or end > datetime.combine(schedule_time.date(), schedule.end_time):
+            raise ValueError(f'Schedule time must start a {schedule.slot_minutes} minute slot of the doctor\'s schedule')
+        return schedule_time, end
+    raise ValueError('Schedule time is outside the doctor\'s working hours')
+
+
+def overlapping_schedule(schedule):
+    """An active template of the same doctor overlapping ``schedule``, if any"""
+    query = DoctorSchedule.query.filter(
+        DoctorSchedule.doctor_id == schedule.doctor_id,
+        DoctorSchedule.weekday == schedule.weekday,
+        DoctorSchedule.is_active.is_(True),
+        DoctorSchedule.start_time < schedule.end_time,
+        DoctorSchedule.end_time > schedule.start_time
+    )
+    # Open-ended date ranges overlap anything on their open side
+    if schedule.valid_until is not None:
+        query = query.filter(or_(DoctorSchedule.valid_from.is_(None), DoctorSchedule.valid_from <= schedule.valid_until))
+    if schedule.valid_from is not None:
+        query = query.filter(or_(DoctorSchedule.valid_until.is_(None), DoctorSchedule.valid_until >= schedule.valid_from))
+    if schedule.id is not None:
+        query = query.filter(DoctorSchedule.id != schedule.id)
+    return query.first()
+
+
+def validate_schedule(schedule):
+    """Raise ValueError when a template cannot produce consistent slots"""
+    if not 0 <= schedule.weekday <= 6:
+        raise ValueError('Weekday must be between 0 (Monday) and 6 (Sunday)')
+    if schedule.start_time >= schedule.end_time:
+        raise ValueError('Start time must be before end time')
+    length = (
+        datetime.combine(date.min, schedule.end_time) - datetime.combine(date.min, schedule.start_time)
+    )
+    if schedule.slot_minutes <= 0 or timedelta(minutes=schedule.slot_minutes) > length:
+        raise ValueError('Slot length must be positive and fit in the working hours')
+    if schedule.valid_from and schedule.valid_until and schedule.valid_from > schedule.valid_until:
+        raise ValueError('valid_from must not be after valid_until')
+    if schedule.is_active and overlapping_schedule(schedule) is not None:
+        raise ValueError('Schedule overlaps another active schedule of the doctor')
+
+
+def free_slots(dept_id=None, doctor_id=None, first_day=None, days=None, not_before=None):
+    """Free slots of a department or doctor, in start order
+
+    Covers ``days`` calendar days from ``first_day`` (today by default) and
+    skips slots starting before ``not_before`` (now by default). Every slot
+    is a dictionary with the doctor and its start and end times.
+    """
+    if (dept_id is None) == (doctor_id is None):
+        raise ValueError('Exactly one of dept_id and doctor_id is required')
+    config = current_app.config
+    days = days or config.get('SLOT_SEARCH_DAYS', 7)
+    if not 1 <= days <= config.get('SLOT_SEARCH_MAX_DAYS', 31):
+        raise ValueError(f"days must be between 1 and {config.get('SLOT_SEARCH_MAX_DAYS', 31)}")
+    first_day = first_day or date.today()
+
+    key = 'dept_id' if dept_id is not None else 'doctor_id'
+    statement = _statements.get(key)
+    if statement is None:
+        statement = _statements[key] = text(FREE_SLOTS_SQL.format(condition=_CONDITIONS[key]))
+    rows = db.session.execute(statement, {
+        key: dept_id if dept_id is not None else doctor_id,
+        'first_day': first_day,
+        'last_day': first_day + timedelta(days=days - 1),
+        'window_end': first_day + timedelta(days=days),
+        'not_before': not_before or datetime.now()
+    })
+    # Native UUIDs and datetimes, left to the response encoder
+    return [row._asdict() for row in rows]
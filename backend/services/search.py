@@ -0,0 +1,171 @@
+"""
+Indexed full-text and fuzzy search for patients, doctors and records
+
+Postgres' text parsers do not segment Chinese, so documents are tokenized
+here and stored as ``search_vector`` tsvectors built with
+``array_to_tsvector``, bypassing the parser and its locale entirely:
+
+* Runs of CJK characters are indexed as single characters plus
+  overlapping bigrams, so a query for any substring of two or more
+  characters (a name, a diagnosis term) matches through its bigrams.
+* Other runs of letters and digits are indexed whole and lowercased, and
+  the last query token matches as a prefix (``'1101':*``).
+
+Queries combine the GIN-indexed tsvector match with a pg_trgm similarity
+match on short name columns, which catches typos in Latin names and codes.
+Results are ordered by ``ts_rank_cd`` plus the trigram similarity.
+
+Vectors are kept current by mapper events, so rows written around the ORM
+(bulk imports, the seed data of scripts/init-db.sql) have none until
+``reindex(missing_only=True)`` fills them. setup.sh runs it once and the
+``search.reindex`` beat entry every SEARCH_REINDEX_INTERVAL seconds.
+"""
+
+import re
+
+from flask import current_app
+from sqlalchemy import ARRAY, Text, case, cast, event, func, literal, or_
+from sqlalchemy.dialects.postgresql import TSQUERY
+
+from models.doctor import Doctor
+from models.medical_record import MedicalRecord
+from models.patient import Patient
+from services.content_store import ContentUnavailable
+
+_CJK = '\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff'
+_TOKEN_RE = re.compile(rf'[{_CJK}]+|[^\W_{_CJK}]+')
+_CJK_RE = re.compile(rf'[{_CJK}]')
+_TEXT_ARRAY = ARRAY(Text)
+
+# Source fields of each searchable model by tsvector weight
+SEARCH_FIELDS = {
+    Patient: {'A': ('name', 'id_card', 'medical_card_id'), 'B': ('phone',)},
+    Doctor: {'A': ('name', 'license_no'), 'B': ('specialization', 'dept_name', 'title')},
+    MedicalRecord: {'A': ('title',), 'B': ('diagnosis',), 'C': ('content',)},
+}
+# Short columns also matched by trigram similarity
+FUZZY_FIELDS = {
+    Patient: ('name',),
+    Doctor: ('name',),
+    MedicalRecord: ('title',),
+}
+
+
+def tokenize(text, limit=None):
+    """Split ``text`` into index tokens, CJK runs as characters and bigrams"""
+    tokens = []
+    for run in _TOKEN_RE.findall((text or '')[:limit].lower()):
+        if _CJK_RE.match(run):
+            tokens.extend(run)
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(run)
+    return tokens
+
+
+def build_vector(target, model):
+    """SQL expression of the weighted tsvector of ``target``"""
+    limit = current_app.config.get('SEARCH_MAX_FIELD_CHARS', 20000)
+    vector = None
+    for weight, fields in SEARCH_FIELDS[model].items():
+        tokens = sorted({token for field in fields for token in tokenize(getattr(target, field), limit)})
+        if not tokens:
+            continue
+        part = func.setweight(func.array_to_tsvector(cast(tokens, _TEXT_ARRAY)), weight)
+        vector = part if vector is None else vector.op('||')(part)
+    return vector if vector is not None else func.array_to_tsvector(cast([], _TEXT_ARRAY))
+
+
+def build_query(term):
+    """tsquery text matching every token of ``term``, the last one as a prefix
+
+    Returns None if ``term`` holds no searchable characters.
+    """
+    runs = _TOKEN_RE.findall((term or '').lower())
+    if not runs:
+        return None
+    lexemes = []
+    for index, run in enumerate(runs):
+        if _CJK_RE.match(run):
+            grams = [run] if len(run) == 1 else [run[i:i + 2] for i in range(len(run) - 1)]
+            lexemes.extend(f"'{gram}'" for gram in grams)
+        else:
+            suffix = ':*' if index == len(runs) - 1 else ''
+            lexemes.append(f"'{run}'{suffix}")
+    return ' & '.join(dict.fromkeys(lexemes))
+
+
+def apply_search(query, model, term):
+    """Filter ``query`` to rows matching ``term``, best matches first"""
+    tsquery_text = build_query(term)
+    if tsquery_text is None:
+        return query.filter(literal(False))
+
+    tsquery = cast(tsquery_text, TSQUERY)
+    vector = model.search_vector
+    conditions = [vector.op('@@')(tsquery)]
+    rank = func.ts_rank_cd(vector, tsquery)
+
+    term = term.strip()
+    for field in FUZZY_FIELDS[model]:
+        column = getattr(model, field)
+        conditions.append(column.op('%')(term))
+        rank = rank + func.similarity(column, term)
+
+    # Exact identifier hits sort above everything else
+    if model is Patient:
+        rank = rank + case((or_(Patient.id_card == term, Patient.medical_card_id == term), 10), else_=0)
+    elif model is Doctor:
+        rank = rank + case((Doctor.license_no == term, 10), else_=0)
+
+    return query.filter(or_(*conditions)).order_by(rank.desc(), model.id)
+
+
+def _index(model):
+    sources = {field for fields in SEARCH_FIELDS[model].values() for field in fields}
+    # MedicalRecord.content is a hybrid over the _content column
+    columns = {'_content' if field == 'content' else field for field in sources}
+
+    def refresh_vector(mapper, connection, target):
+        state = target._sa_instance_state
+        if state.key is None or any(state.attrs[column].history.has_changes() for column in columns):
+            target.search_vector = build_vector(target, model)
+
+    event.listen(model, 'before_insert', refresh_vector)
+    event.listen(model, 'before_update', refresh_vector)
+
+
+def reindex(model, chunk_size=500, missing_only=False):
+    """Rebuild ``search_vector`` of every row of ``model``, in id order
+
+    ``missing_only`` limits the run to rows without a vector, such as rows
+    loaded by bulk inserts, which bypass the update listeners. Records
+    whose offloaded body cannot be fetched are skipped. Returns the number
+    of rows indexed.
+    """
+    from extensions import db
+
+    count = 0
+    after_id = None
+    while True:
+        query = model.query.order_by(model.id)
+        if missing_only:
+            query = query.filter(model.search_vector.is_(None))
+        if after_id is not None:
+            query = query.filter(model.id > after_id)
+        rows = query.limit(chunk_size).all()
+        if not rows:
+            return count
+        for row in rows:
+            try:
+                row.search_vector = build_vector(row, model)
+            except ContentUnavailable:
+                # Left for a later run once the offloaded body is reachable
+                continue
+            count += 1
+        after_id = rows[-1].id
+        db.session.commit()
+
+
+for _model in SEARCH_FIELDS:
+    _index(_model)
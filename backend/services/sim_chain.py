@@ -0,0 +1,949 @@
+"""
+Simulated in-process chain for Web3 HMS load testing
+
+The three HMS contracts are mirrored in Python on top of a minimal
+automining chain that speaks the JSON-RPC subset the backend uses, so the
+write and verify paths can be benchmarked without Ganache. Latency and
+failures can be injected at the transport to shape the run.
+
+Run standalone to share one simulated chain between the API, the Celery
+worker and beat:
+
+    python -m services.sim_chain --port 8545
+"""
+
+import argparse
+import copy
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import rlp
+from eth_abi import decode, encode
+from eth_account import Account
+from eth_utils import event_abi_to_log_topic, function_abi_to_4byte_selector, keccak, to_checksum_address
+from web3._utils.abi import get_abi_input_types, get_abi_output_types
+from web3.providers.base import BaseProvider
+
+# Canonical Multicall3 address, so MULTICALL_ADDRESS works unchanged
+MULTICALL3_ADDRESS = '0xcA11bde05977b3631167028862bE2a173976CA11'
+
+BASE_FEE = 10 ** 9
+MAX_QUEUED_NONCES = 64
+ZERO_ADDRESS = '0x' + '00' * 20
+EMPTY_BLOOM = '0x' + '00' * 256
+
+
+class Revert(Exception):
+    """Contract call reverted with a reason string"""
+
+
+class RPCFailure(Exception):
+    """JSON-RPC level error returned to the caller"""
+
+    def __init__(self, message, code=-32000, data=None):
+        super().__init__(message)
+        self.code = code
+        self.data = data
+
+
+def _hex(value):
+    return hex(value) if isinstance(value, int) else '0x' + bytes(value).hex()
+
+
+def _to_int(value):
+    return int(value, 16) if isinstance(value, str) else int(value)
+
+
+def _to_bytes(value):
+    return bytes.fromhex(value[2:] if value.startswith('0x') else value) if isinstance(value, str) else bytes(value)
+
+
+# ABI declarations -----------------------------------------------------------
+
+def _params(text, structs=None, indexed_ok=False):
+    """Parse 'string recordId, address indexed grantee' into ABI params"""
+    params = []
+    for part in filter(None, (item.strip() for item in text.split(','))):
+        words = part.split()
+        type_name, name = words[0], words[-1]
+        param = {'name': name}
+        base = type_name.rstrip('[]')
+        if structs and base in structs:
+            param['type'] = 'tuple' + type_name[len(base):]
+            param['components'] = structs[base]
+        else:
+            param['type'] = type_name
+        if indexed_ok:
+            param['indexed'] = 'indexed' in words[1:-1]
+        params.append(param)
+    return params
+
+
+def function(signature, returns='', view=False):
+    """Declare a contract function from a Solidity-like signature"""
+    def decorator(handler):
+        name, _, rest = signature.partition('(')
+        handler.abi_spec = (name, rest.rstrip(')'), returns, view)
+        return handler
+    return decorator
+
+
+class SimContract:
+    """Python mirror of a deployed contract
+
+    Subclasses declare ``STRUCTS`` and ``EVENTS`` and decorate handlers
+    with ``@function``; handlers get a call context and the decoded
+    arguments and raise ``Revert`` like a Solidity ``require``.
+    """
+
+    NAME = None
+    STRUCTS = {}
+    EVENTS = ()
+
+    def __init__(self, address):
+        self.address = address
+        structs = {name: _params(fields) for name, fields in self.STRUCTS.items()}
+        self.abi = []
+        self._functions = {}
+        self._events = {}
+
+        for attr in dir(type(self)):
+            handler = getattr(self, attr)
+            spec = getattr(handler, 'abi_spec', None)
+            if spec is None:
+                continue
+            name, inputs, returns, view = spec
+            entry = {
+                'type': 'function',
+                'name': name,
+                'inputs': _params(inputs, structs),
+                'outputs': _params(returns, structs),
+                'stateMutability': 'view' if view else 'nonpayable'
+            }
+            self.abi.append(entry)
+            self._functions[function_abi_to_4byte_selector(entry)] = (entry, handler)
+
+        for signature in self.EVENTS:
+            name, _, rest = signature.partition('(')
+            entry = {
+                'type': 'event',
+                'name': name,
+                'inputs': _params(rest.rstrip(')'), structs, indexed_ok=True),
+                'anonymous': False
+            }
+            self.abi.append(entry)
+            self._events[name] = entry
+
+    def execute(self, ctx, data):
+        """Run ``data`` as a call, returning ABI-encoded output"""
+        entry, handler = self._functions.get(bytes(data[:4]), (None, None))
+        if entry is None:
+            raise Revert('Function not found')
+        if ctx.static and entry['stateMutability'] != 'view':
+            # eth_call of a state-changing function must leave no trace
+            handler = getattr(copy.deepcopy(self), handler.__name__)
+        args = decode(get_abi_input_types(entry), bytes(data[4:])) if entry['inputs'] else ()
+        result = handler(ctx, *args)
+        output_types = get_abi_output_types(entry)
+        if not output_types:
+            return b''
+        return encode(output_types, [result] if len(output_types) == 1 else list(result))
+
+    def emit(self, ctx, name, *values):
+        """Append an event log to the running transaction"""
+        entry = self._events[name]
+        topics = [event_abi_to_log_topic(entry)]
+        data_types, data_values = [], []
+        for param, value in zip(entry['inputs'], values):
+            if not param['indexed']:
+                data_types.append(param['type'])
+                data_values.append(value)
+            elif param['type'] == 'string':
+                topics.append(keccak(text=value))
+            else:
+                topics.append(encode([param['type']], [value]))
+        ctx.logs.append({'address': self.address, 'topics': topics, 'data': encode(data_types, data_values)})
+
+
+class MedicalRecordHashSim(SimContract):
+    """Mirror of MedicalRecordHash.sol"""
+
+    NAME = 'MedicalRecordHash'
+    STRUCTS = {
+        'MedicalRecord': 'string patientId, string doctorId, string recordType, string hashValue, '
+                         'uint256 timestamp, address creator, bool isActive',
+        'ModificationHistory': 'string newHash, uint256 timestamp, address modifierAddress, string reason'
+    }
+    EVENTS = (
+        'RecordCreated(string indexed recordId, string patientId, string doctorId, string recordType, string hashValue)',
+        'RecordModified(string indexed recordId, string newHash, address modifierAddress, string reason)',
+        'RecordDeactivated(string indexed recordId, address deactivator)'
+    )
+
+    def __init__(self, address):
+        super().__init__(address)
+        self.records = {}
+        self.history = {}
+        self.record_ids = []
+
+    def _valid(self, record_id, active=False):
+        record = self.records.get(record_id)
+        if record is None:
+            raise Revert('Record does not exist')
+        if active and not record[6]:
+            raise Revert('Record is not active')
+        return record
+
+    @function('createRecord(string recordId, string patientId, string doctorId, string recordType, string hashValue)')
+    def create_record(self, ctx, record_id, patient_id, doctor_id, record_type, hash_value):
+        for value, message in ((record_id, 'Record ID cannot be empty'), (patient_id, 'Patient ID cannot be empty'),
+                               (doctor_id, 'Doctor ID cannot be empty'), (hash_value, 'Hash value cannot be empty')):
+            if not value:
+                raise Revert(message)
+        if record_id in self.records:
+            raise Revert('Record already exists')
+        self.records[record_id] = (patient_id, doctor_id, record_type, hash_value, ctx.timestamp, ctx.sender, True)
+        self.record_ids.append(record_id)
+        self.emit(ctx, 'RecordCreated', record_id, patient_id, doctor_id, record_type, hash_value)
+
+    @function('modifyRecord(string recordId, string newHash, string reason)')
+    def modify_record(self, ctx, record_id, new_hash, reason):
+        record = self._valid(record_id, active=True)
+        if not new_hash:
+            raise Revert('New hash value cannot be empty')
+        if not reason:
+            raise Revert('Reason cannot be empty')
+        self.history.setdefault(record_id, []).append((new_hash, ctx.timestamp, ctx.sender, reason))
+        self.records[record_id] = record[:3] + (new_hash, ctx.timestamp) + record[5:]
+        self.emit(ctx, 'RecordModified', record_id, new_hash, ctx.sender, reason)
+
+    @function('deactivateRecord(string recordId)')
+    def deactivate_record(self, ctx, record_id):
+        record = self._valid(record_id, active=True)
+        self.records[record_id] = record[:6] + (False,)
+        self.emit(ctx, 'RecordDeactivated', record_id, ctx.sender)
+
+    @function('getRecord(string recordId)', returns='MedicalRecord record', view=True)
+    def get_record(self, ctx, record_id):
+        return self._valid(record_id)
+
+    @function('getModificationHistory(string recordId)', returns='ModificationHistory[] history', view=True)
+    def get_modification_history(self, ctx, record_id):
+        self._valid(record_id)
+        return self.history.get(record_id, [])
+
+    @function('getTotalRecords()', returns='uint256 total', view=True)
+    def get_total_records(self, ctx):
+        return len(self.record_ids)
+
+    @function('verifyHash(string recordId, string hashToVerify)', returns='bool valid', view=True)
+    def verify_hash(self, ctx, record_id, hash_to_verify):
+        return self._valid(record_id, active=True)[3] == hash_to_verify
+
+
+class AccessControlSim(SimContract):
+    """Mirror of AccessControl.sol"""
+
+    NAME = 'AccessControl'
+    STRUCTS = {
+        'AccessGrant': 'string dataId, address grantor, address grantee, uint256 grantTime, '
+                       'uint256 expireTime, bool isActive, string dataType'
+    }
+    EVENTS = (
+        'AccessGranted(string indexed grantId, address indexed grantor, address indexed grantee, '
+        'string dataId, uint256 expireTime)',
+        'AccessRevoked(string indexed grantId, address indexed revoker)',
+        'AccessUsed(string indexed grantId, address indexed accessor, string action)',
+        'AccessExpired(string indexed grantId)'
+    )
+
+    def __init__(self, address):
+        super().__init__(address)
+        self.grants = {}
+        self.patient_grants = {}
+        self.provider_accesses = {}
+        self.grant_ids = []
+
+    def _valid(self, grant_id):
+        grant = self.grants.get(grant_id)
+        if grant is None:
+            raise Revert('Grant does not exist')
+        return grant
+
+    @function('grantAccess(string grantId, address grantee, string dataId, string dataType, uint256 duration)')
+    def grant_access(self, ctx, grant_id, grantee, data_id, data_type, duration):
+        if not grant_id:
+            raise Revert('Grant ID cannot be empty')
+        if grantee == ZERO_ADDRESS:
+            raise Revert('Grantee address cannot be zero')
+        if not data_id:
+            raise Revert('Data ID cannot be empty')
+        if duration <= 0:
+            raise Revert('Duration must be greater than 0')
+        if grant_id in self.grants:
+            raise Revert('Grant already exists')
+        expire_time = ctx.timestamp + duration
+        self.grants[grant_id] = (data_id, ctx.sender, grantee, ctx.timestamp, expire_time, True, data_type)
+        self.patient_grants.setdefault(ctx.sender, []).append(grant_id)
+        self.provider_accesses.setdefault(grantee.lower(), []).append(grant_id)
+        self.grant_ids.append(grant_id)
+        self.emit(ctx, 'AccessGranted', grant_id, ctx.sender, grantee, data_id, expire_time)
+
+    @function('revokeAccess(string grantId)')
+    def revoke_access(self, ctx, grant_id):
+        grant = self._valid(grant_id)
+        if ctx.sender not in (grant[1].lower(), grant[2].lower()):
+            raise Revert('Only grantor or grantee can perform this action')
+        self.grants[grant_id] = grant[:5] + (False,) + grant[6:]
+        self.emit(ctx, 'AccessRevoked', grant_id, ctx.sender)
+
+    @function('logAccess(string grantId, string action)')
+    def log_access(self, ctx, grant_id, action):
+        grant = self._valid(grant_id)
+        if not grant[5]:
+            raise Revert('Grant is not active')
+        if grant[4] <= ctx.timestamp:
+            raise Revert('Grant has expired')
+        if grant[2].lower() != ctx.sender:
+            raise Revert('Only grantee can log access')
+        if not action:
+            raise Revert('Action cannot be empty')
+        self.emit(ctx, 'AccessUsed', grant_id, ctx.sender, action)
+
+    @function('hasAccess(string grantId, address accessor)', returns='bool allowed', view=True)
+    def has_access(self, ctx, grant_id, accessor):
+        grant = self._valid(grant_id)
+        return grant[5] and grant[4] > ctx.timestamp and grant[2].lower() == accessor.lower()
+
+    @function('getAccessGrant(string grantId)', returns='AccessGrant grant', view=True)
+    def get_access_grant(self, ctx, grant_id):
+        return self._valid(grant_id)
+
+    @function('getPatientGrants(address patient)', returns='string[] grantIds', view=True)
+    def get_patient_grants(self, ctx, patient):
+        return self.patient_grants.get(patient.lower(), [])
+
+    @function('getProviderAccesses(address provider)', returns='string[] grantIds', view=True)
+    def get_provider_accesses(self, ctx, provider):
+        return self.provider_accesses.get(provider.lower(), [])
+
+    @function('getTotalGrants()', returns='uint256 total', view=True)
+    def get_total_grants(self, ctx):
+        return len(self.grant_ids)
+
+    @function('isGrantExpired(string grantId)', returns='bool expired', view=True)
+    def is_grant_expired(self, ctx, grant_id):
+        return self._valid(grant_id)[4] <= ctx.timestamp
+
+
+class DrugTraceSim(SimContract):
+    """Mirror of DrugTrace.sol"""
+
+    NAME = 'DrugTrace'
+    STRUCTS = {
+        'SupplyItem': 'string itemId, string name, string specification, string manufacturer, string batchNumber, '
+                      'uint256 productionDate, uint256 expiryDate, string currentLocation, address currentOwner, '
+                      'bool isActive, string category',
+        'TraceRecord': 'string itemId, address from, address to, string location, uint256 timestamp, '
+                       'string action, string notes, string transactionHash'
+    }
+    EVENTS = (
+        'ItemCreated(string indexed itemId, string name, string manufacturer, string batchNumber)',
+        'ItemTransferred(string indexed itemId, address indexed from, address indexed to, string location)',
+        'ItemUsed(string indexed itemId, address indexed user, string patientId, string notes)',
+        'ItemDisposed(string indexed itemId, address indexed disposer, string reason)'
+    )
+
+    def __init__(self, address):
+        super().__init__(address)
+        self.items = {}
+        self.traces = {}
+        self.item_ids = []
+
+    def _owned(self, ctx, item_id):
+        item = self.items.get(item_id)
+        if item is None:
+            raise Revert('Item does not exist')
+        if not item['isActive']:
+            raise Revert('Item is not active')
+        if item['currentOwner'].lower() != ctx.sender:
+            raise Revert('Only current owner can perform this action')
+        return item
+
+    def _trace(self, ctx, item_id, sender, to, location, action, notes):
+        self.traces.setdefault(item_id, []).append((item_id, sender, to, location, ctx.timestamp, action, notes, ''))
+
+    @function('createItem(string itemId, string name, string specification, string manufacturer, '
+              'string batchNumber, uint256 productionDate, uint256 expiryDate, string category)')
+    def create_item(self, ctx, item_id, name, specification, manufacturer, batch_number,
+                    production_date, expiry_date, category):
+        for value, message in ((item_id, 'Item ID cannot be empty'), (name, 'Name cannot be empty'),
+                               (manufacturer, 'Manufacturer cannot be empty'),
+                               (batch_number, 'Batch number cannot be empty')):
+            if not value:
+                raise Revert(message)
+        if production_date <= 0:
+            raise Revert('Production date must be valid')
+        if expiry_date <= production_date:
+            raise Revert('Expiry date must be after production date')
+        if item_id in self.items:
+            raise Revert('Item already exists')
+        self.items[item_id] = {
+            'itemId': item_id, 'name': name, 'specification': specification, 'manufacturer': manufacturer,
+            'batchNumber': batch_number, 'productionDate': production_date, 'expiryDate': expiry_date,
+            'currentLocation': '', 'currentOwner': ctx.sender, 'isActive': True, 'category': category
+        }
+        self.item_ids.append(item_id)
+        self._trace(ctx, item_id, ZERO_ADDRESS, ctx.sender, '', 'PRODUCTION', 'Item created by manufacturer')
+        self.emit(ctx, 'ItemCreated', item_id, name, manufacturer, batch_number)
+
+    @function('transferItem(string itemId, address to, string location, string notes)')
+    def transfer_item(self, ctx, item_id, to, location, notes):
+        item = self._owned(ctx, item_id)
+        if to == ZERO_ADDRESS:
+            raise Revert('Cannot transfer to zero address')
+        if to.lower() == ctx.sender:
+            raise Revert('Cannot transfer to self')
+        previous_owner = item['currentOwner']
+        item.update(currentOwner=to, currentLocation=location)
+        self._trace(ctx, item_id, previous_owner, to, location, 'TRANSFER', notes)
+        self.emit(ctx, 'ItemTransferred', item_id, previous_owner, to, location)
+
+    @function('useItem(string itemId, string patientId, string notes)')
+    def use_item(self, ctx, item_id, patient_id, notes):
+        item = self._owned(ctx, item_id)
+        if not patient_id:
+            raise Revert('Patient ID cannot be empty')
+        if ctx.timestamp > item['expiryDate']:
+            raise Revert('Item has expired')
+        self._trace(ctx, item_id, ctx.sender, ZERO_ADDRESS, item['currentLocation'], 'USE',
+                    f'Used for patient: {patient_id}. {notes}')
+        self.emit(ctx, 'ItemUsed', item_id, ctx.sender, patient_id, notes)
+
+    @function('disposeItem(string itemId, string reason)')
+    def dispose_item(self, ctx, item_id, reason):
+        item = self._owned(ctx, item_id)
+        if not reason:
+            raise Revert('Disposal reason cannot be empty')
+        item['isActive'] = False
+        self._trace(ctx, item_id, ctx.sender, ZERO_ADDRESS, item['currentLocation'], 'DISPOSAL', reason)
+        self.emit(ctx, 'ItemDisposed', item_id, ctx.sender, reason)
+
+    @function('getItem(string itemId)', returns='SupplyItem item', view=True)
+    def get_item(self, ctx, item_id):
+        item = self.items.get(item_id)
+        if item is None:
+            raise Revert('Item does not exist')
+        return tuple(item.values())
+
+    @function('getTraceRecords(string itemId)', returns='TraceRecord[] records', view=True)
+    def get_trace_records(self, ctx, item_id):
+        if item_id not in self.items:
+            raise Revert('Item does not exist')
+        return self.traces.get(item_id, [])
+
+    @function('getItemsByManufacturer(string manufacturer)', returns='string[] itemIds', view=True)
+    def get_items_by_manufacturer(self, ctx, manufacturer):
+        return [item_id for item_id in self.item_ids if self.items[item_id]['manufacturer'] == manufacturer]
+
+    @function('getItemsByBatch(string batchNumber)', returns='string[] itemIds', view=True)
+    def get_items_by_batch(self, ctx, batch_number):
+        return [item_id for item_id in self.item_ids if self.items[item_id]['batchNumber'] == batch_number]
+
+    @function('isItemExpired(string itemId)', returns='bool expired', view=True)
+    def is_item_expired(self, ctx, item_id):
+        if item_id not in self.items:
+            raise Revert('Item does not exist')
+        return ctx.timestamp > self.items[item_id]['expiryDate']
+
+    @function('getTotalItems()', returns='uint256 total', view=True)
+    def get_total_items(self, ctx):
+        return len(self.item_ids)
+
+
+class Multicall3Sim(SimContract):
+    """The aggregate3 entry point of Multicall3"""
+
+    NAME = 'Multicall3'
+    STRUCTS = {
+        'Call3': 'address target, bool allowFailure, bytes callData',
+        'Result': 'bool success, bytes returnData'
+    }
+
+    def __init__(self, address, chain):
+        super().__init__(address)
+        self.chain = chain
+
+    @function('aggregate3(Call3[] calls)', returns='Result[] returnData', view=True)
+    def aggregate3(self, ctx, calls):
+        results = []
+        for target, allow_failure, call_data in calls:
+            contract = self.chain.contracts.get(target.lower())
+            try:
+                if contract is None:
+                    raise Revert('Call to non-contract')
+                results.append((True, contract.execute(ctx, call_data)))
+            except Revert:
+                if not allow_failure:
+                    raise Revert('Multicall3: call failed')
+                results.append((False, b''))
+        return results
+
+
+# Chain ----------------------------------------------------------------------
+
+class CallContext:
+    """Sender, block time and emitted logs of one call"""
+
+    def __init__(self, sender, timestamp, static=False):
+        self.sender = sender.lower()
+        self.timestamp = timestamp
+        self.static = static
+        self.logs = []
+
+
+class SimulatedChain:
+    """Automining chain holding the simulated contracts
+
+    Every transaction is mined into its own block on arrival, like
+    Ganache's default mode. Transactions with a future nonce wait until
+    the gap is filled. With ``revert_rate`` a share of otherwise valid
+    transactions is mined as reverted.
+    """
+
+    def __init__(self, chain_id=1337, revert_rate=0.0, seed=None):
+        self.chain_id = chain_id
+        self.revert_rate = revert_rate
+        self._random = random.Random(seed)
+        self._lock = threading.RLock()
+        self.blocks = []
+        self.transactions = {}
+        self.receipts = {}
+        self.nonces = {}
+        self.queued = {}
+        self.contracts = {}
+
+        self._mine([])
+        for contract_class in (MedicalRecordHashSim, AccessControlSim, DrugTraceSim):
+            address = to_checksum_address(keccak(text=f'hms-sim:{contract_class.NAME}')[-20:])
+            self.contracts[address.lower()] = contract_class(address)
+        self.contracts[MULTICALL3_ADDRESS.lower()] = Multicall3Sim(MULTICALL3_ADDRESS, self)
+
+    def deployments(self):
+        """Get ``{contract name: (address, abi)}`` of the HMS contracts"""
+        return {
+            contract.NAME: (contract.address, contract.abi)
+            for contract in self.contracts.values() if not isinstance(contract, Multicall3Sim)
+        }
+
+    # JSON-RPC --------------------------------------------------------------
+
+    def request(self, method, params):
+        """Dispatch one JSON-RPC call, returning its result"""
+        handler = getattr(self, 'rpc_' + method, None)
+        if handler is None:
+            raise RPCFailure(f'Method {method} not supported', code=-32601)
+        with self._lock:
+            return handler(*(params or []))
+
+    def rpc_web3_clientVersion(self):
+        return 'HMSSimulatedChain/v1'
+
+    def rpc_net_version(self):
+        return str(self.chain_id)
+
+    def rpc_eth_chainId(self):
+        return hex(self.chain_id)
+
+    def rpc_eth_blockNumber(self):
+        return hex(len(self.blocks) - 1)
+
+    def rpc_eth_gasPrice(self):
+        return hex(2 * BASE_FEE)
+
+    def rpc_eth_maxPriorityFeePerGas(self):
+        return hex(BASE_FEE)
+
+    def rpc_eth_feeHistory(self, block_count, newest_block, percentiles=None):
+        newest = self._block_number(newest_block)
+        count = min(_to_int(block_count), newest + 1)
+        return {
+            'oldestBlock': hex(newest - count + 1),
+            'baseFeePerGas': [hex(BASE_FEE)] * (count + 1),
+            'gasUsedRatio': [0.5] * count,
+            'reward': [[hex(BASE_FEE // 100 * int(p)) for p in percentiles or []] for _ in range(count)]
+        }
+
+    def rpc_eth_getTransactionCount(self, address, block='latest'):
+        return hex(self.nonces.get(address.lower(), 0))
+
+    def rpc_eth_getCode(self, address, block='latest'):
+        return '0x60806040' if address.lower() in self.contracts else '0x'
+
+    def rpc_eth_getBalance(self, address, block='latest'):
+        return hex(10 ** 20)
+
+    def rpc_eth_getBlockByNumber(self, block, full=False):
+        number = self._block_number(block)
+        return self._format_block(self.blocks[number]) if number < len(self.blocks) else None
+
+    def rpc_eth_getBlockByHash(self, block_hash, full=False):
+        for block in reversed(self.blocks):
+            if block['hash'] == block_hash:
+                return self._format_block(block)
+        return None
+
+    def rpc_eth_getTransactionByHash(self, tx_hash):
+        return self.transactions.get(tx_hash.lower())
+
+    def rpc_eth_getTransactionReceipt(self, tx_hash):
+        return self.receipts.get(tx_hash.lower())
+
+    def rpc_eth_call(self, tx, block='latest'):
+        contract = self.contracts.get((tx.get('to') or '').lower())
+        if contract is None:
+            return '0x'
+        ctx = CallContext(tx.get('from') or ZERO_ADDRESS, self.blocks[-1]['timestamp'], static=True)
+        try:
+            return _hex(contract.execute(ctx, _to_bytes(tx.get('data') or tx.get('input') or '0x')))
+        except Revert as e:
+            reason = '0x08c379a0' + encode(['string'], [str(e)]).hex()
+            raise RPCFailure(f'execution reverted: {e}', code=3, data=reason)
+
+    def rpc_eth_estimateGas(self, tx, block='latest'):
+        self.rpc_eth_call(tx, block)
+        return hex(self._gas_used(_to_bytes(tx.get('data') or '0x'), 1))
+
+    def rpc_eth_sendRawTransaction(self, raw):
+        raw = _to_bytes(raw)
+        tx = self._decode_transaction(raw)
+        tx_hash = _hex(keccak(raw))
+        if tx_hash in self.transactions or any(tx_hash == queued['hash'] for queued in self.queued.values()):
+            raise RPCFailure('already known')
+
+        expected = self.nonces.get(tx['from'], 0)
+        if tx['nonce'] < expected:
+            raise RPCFailure('nonce too low')
+        if tx['nonce'] > expected + MAX_QUEUED_NONCES:
+            raise RPCFailure('nonce too high')
+
+        tx['hash'] = tx_hash
+        self.queued[(tx['from'], tx['nonce'])] = tx
+        while (tx['from'], self.nonces.get(tx['from'], 0)) in self.queued:
+            self._execute(self.queued.pop((tx['from'], self.nonces.get(tx['from'], 0))))
+        return tx_hash
+
+    def rpc_eth_getLogs(self, criteria):
+        from_block = self._block_number(criteria.get('fromBlock', 'latest'))
+        to_block = min(self._block_number(criteria.get('toBlock', 'latest')), len(self.blocks) - 1)
+        addresses = criteria.get('address')
+        if isinstance(addresses, str):
+            addresses = [addresses]
+        addresses = {address.lower() for address in addresses} if addresses else None
+        topic_filters = criteria.get('topics') or []
+
+        logs = []
+        for block in self.blocks[from_block:to_block + 1]:
+            for tx_hash in block['transactions']:
+                for log in self.receipts[tx_hash]['logs']:
+                    if addresses and log['address'].lower() not in addresses:
+                        continue
+                    if self._topics_match(log['topics'], topic_filters):
+                        logs.append(log)
+        return logs
+
+    # Mining ----------------------------------------------------------------
+
+    def _execute(self, tx):
+        number = len(self.blocks)
+        timestamp = max(int(time.time()), self.blocks[-1]['timestamp'] + 1)
+        ctx = CallContext(tx['from'], timestamp)
+        contract = self.contracts.get((tx['to'] or '').lower())
+        gas_used = self._gas_used(tx['data'], 1 if contract else 0)
+
+        status = 1
+        if gas_used > tx['gas']:
+            status, gas_used = 0, tx['gas']
+        elif contract is not None:
+            try:
+                # Handlers mutate state, so reverts are decided before running
+                if self.revert_rate and self._random.random() < self.revert_rate:
+                    raise Revert('Simulated revert')
+                contract.execute(ctx, tx['data'])
+            except Revert:
+                status = 0
+        self.nonces[tx['from']] = tx['nonce'] + 1
+
+        block = self._mine([tx['hash']], timestamp)
+        logs = [
+            {
+                'address': log['address'],
+                'topics': [_hex(topic) for topic in log['topics']],
+                'data': _hex(log['data']),
+                'blockNumber': hex(number),
+                'blockHash': block['hash'],
+                'transactionHash': tx['hash'],
+                'transactionIndex': '0x0',
+                'logIndex': hex(index),
+                'removed': False
+            }
+            for index, log in enumerate(ctx.logs if status else [])
+        ]
+        self.transactions[tx['hash']] = {
+            'hash': tx['hash'],
+            'nonce': hex(tx['nonce']),
+            'blockHash': block['hash'],
+            'blockNumber': hex(number),
+            'transactionIndex': '0x0',
+            'from': to_checksum_address(tx['from']),
+            'to': tx['to'],
+            'value': hex(tx['value']),
+            'gas': hex(tx['gas']),
+            'gasPrice': hex(tx['gas_price']),
+            'input': _hex(tx['data']),
+            'type': '0x0',
+            'chainId': hex(self.chain_id)
+        }
+        self.receipts[tx['hash']] = {
+            'transactionHash': tx['hash'],
+            'transactionIndex': '0x0',
+            'blockHash': block['hash'],
+            'blockNumber': hex(number),
+            'from': to_checksum_address(tx['from']),
+            'to': tx['to'],
+            'cumulativeGasUsed': hex(gas_used),
+            'gasUsed': hex(gas_used),
+            'effectiveGasPrice': hex(tx['gas_price']),
+            'contractAddress': None,
+            'logs': logs,
+            'logsBloom': EMPTY_BLOOM,
+            'status': hex(status),
+            'type': '0x0'
+        }
+
+    def _mine(self, tx_hashes, timestamp=None):
+        number = len(self.blocks)
+        parent_hash = self.blocks[-1]['hash'] if self.blocks else '0x' + '00' * 32
+        block = {
+            'number': number,
+            'hash': _hex(keccak(text=f'{parent_hash}:{number}:{",".join(tx_hashes)}')),
+            'parentHash': parent_hash,
+            'timestamp': timestamp or int(time.time()),
+            'transactions': tx_hashes
+        }
+        self.blocks.append(block)
+        return block
+
+    def _format_block(self, block):
+        return {
+            'number': hex(block['number']),
+            'hash': block['hash'],
+            'parentHash': block['parentHash'],
+            'timestamp': hex(block['timestamp']),
+            'transactions': list(block['transactions']),
+            'nonce': '0x0000000000000000',
+            'sha3Uncles': '0x' + '00' * 32,
+            'logsBloom': EMPTY_BLOOM,
+            'transactionsRoot': '0x' + '00' * 32,
+            'stateRoot': '0x' + '00' * 32,
+            'receiptsRoot': '0x' + '00' * 32,
+            'miner': ZERO_ADDRESS,
+            'difficulty': '0x0',
+            'totalDifficulty': '0x0',
+            'extraData': '0x',
+            'size': '0x200',
+            'gasLimit': hex(30_000_000),
+            'gasUsed': '0x0',
+            'baseFeePerGas': hex(BASE_FEE),
+            'uncles': []
+        }
+
+    def _block_number(self, block):
+        if block in ('latest', 'pending', 'safe', 'finalized', None):
+            return len(self.blocks) - 1
+        if block == 'earliest':
+            return 0
+        return _to_int(block)
+
+    def _decode_transaction(self, raw):
+        sender = Account.recover_transaction(raw).lower()
+        if raw[0] == 2:
+            chain_id, nonce, max_priority_fee, max_fee, gas, to, value, data = rlp.decode(raw[1:])[:8]
+            # Effective price: the base fee plus the tip, capped by the fee cap
+            priority_fee = int.from_bytes(max_priority_fee, 'big')
+            gas_price = min(int.from_bytes(max_fee, 'big'), BASE_FEE + priority_fee).to_bytes(32, 'big')
+        else:
+            nonce, gas_price, gas, to, value, data = rlp.decode(raw)[:6]
+        return {
+            'from': sender,
+            'nonce': int.from_bytes(nonce, 'big'),
+            'gas_price': int.from_bytes(gas_price, 'big'),
+            'gas': int.from_bytes(gas, 'big'),
+            'to': to_checksum_address(to) if to else None,
+            'value': int.from_bytes(value, 'big'),
+            'data': bytes(data)
+        }
+
+    @staticmethod
+    def _gas_used(data, storage_writes):
+        return 21000 + sum(4 if byte == 0 else 16 for byte in data) + 45000 * storage_writes
+
+    @staticmethod
+    def _topics_match(topics, filters):
+        for index, expected in enumerate(filters):
+            if expected is None:
+                continue
+            if index >= len(topics):
+                return False
+            options = expected if isinstance(expected, list) else [expected]
+            if topics[index].lower() not in {option.lower() for option in options}:
+                return False
+        return True
+
+
+# Transport ------------------------------------------------------------------
+
+class FaultInjector:
+    """Injected per-request latency and transport failures"""
+
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, failure_rate=0.0, seed=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def apply(self):
+        """Sleep for the injected latency, then maybe fail the request"""
+        with self._lock:
+            delay = max(0.0, self._random.gauss(self.latency_ms, self.jitter_ms)) if self.jitter_ms \
+                else self.latency_ms
+            fail = self.failure_rate and self._random.random() < self.failure_rate
+        if delay:
+            time.sleep(delay / 1000)
+        if fail:
+            raise ConnectionError('Simulated provider failure')
+
+
+def handle_rpc(chain, request):
+    """Answer one JSON-RPC request object"""
+    response = {'jsonrpc': '2.0', 'id': request.get('id')}
+    try:
+        response['result'] = chain.request(request['method'], request.get('params'))
+    except RPCFailure as e:
+        response['error'] = {'code': e.code, 'message': str(e)}
+        if e.data:
+            response['error']['data'] = e.data
+    except Exception as e:
+        response['error'] = {'code': -32603, 'message': str(e)}
+    return response
+
+
+class SimulatedProvider(BaseProvider):
+    """Web3 provider answering from an in-process ``SimulatedChain``"""
+
+    def __init__(self, chain, faults=None):
+        super().__init__()
+        self.chain = chain
+        self.faults = faults or FaultInjector()
+        self._ids = 0
+
+    def make_request(self, method, params):
+        self.faults.apply()
+        self._ids += 1
+        return handle_rpc(self.chain, {'id': self._ids, 'method': method, 'params': params})
+
+    def is_connected(self, show_traceback=False):
+        return True
+
+
+_chain = None
+_chain_pid = None
+_chain_lock = threading.Lock()
+
+
+def get_chain(config):
+    """Get this process's simulated chain, created from app config"""
+    global _chain, _chain_pid
+    with _chain_lock:
+        if _chain is None or _chain_pid != os.getpid():
+            _chain = SimulatedChain(
+                chain_id=config.get('SIM_CHAIN_ID', 1337),
+                revert_rate=config.get('SIM_CHAIN_REVERT_RATE', 0.0),
+                seed=config.get('SIM_CHAIN_SEED')
+            )
+            _chain_pid = os.getpid()
+        return _chain
+
+
+def build_provider(config):
+    """Create a provider on this process's simulated chain"""
+    return SimulatedProvider(get_chain(config), FaultInjector(
+        latency_ms=config.get('SIM_CHAIN_LATENCY_MS', 0.0),
+        jitter_ms=config.get('SIM_CHAIN_JITTER_MS', 0.0),
+        failure_rate=config.get('SIM_CHAIN_FAILURE_RATE', 0.0),
+        seed=config.get('SIM_CHAIN_SEED')
+    ))
+
+
+def serve(host='127.0.0.1', port=8545, config=None):
+    """Serve a simulated chain over HTTP JSON-RPC, including batches"""
+    config = config or {}
+    chain = get_chain(config)
+    faults = FaultInjector(
+        latency_ms=config.get('SIM_CHAIN_LATENCY_MS', 0.0),
+        jitter_ms=config.get('SIM_CHAIN_JITTER_MS', 0.0),
+        failure_rate=config.get('SIM_CHAIN_FAILURE_RATE', 0.0),
+        seed=config.get('SIM_CHAIN_SEED')
+    )
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_POST(self):
+            try:
+                faults.apply()
+            except ConnectionError:
+                self.send_error(503, 'Simulated provider failure')
+                return
+            payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            if isinstance(payload, list):
+                body = [handle_rpc(chain, request) for request in payload]
+            else:
+                body = handle_rpc(chain, payload)
+            data = json.dumps(body).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    for name, (address, _) in chain.deployments().items():
+        print(f'{name}: {address}')
+    print(f'Simulated chain {chain.chain_id} listening on http://{host}:{port}')
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve the simulated HMS chain over JSON-RPC')
+    parser.add_argument('--host', default=os.environ.get('SIM_CHAIN_HOST', '127.0.0.1'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('SIM_CHAIN_PORT') or 8545))
+    parser.add_argument('--abi-dir', help='Write each contract address and ABI as JSON into this directory')
+    args = parser.parse_args()
+
+    from config import Config
+    sim_config = {key: getattr(Config, key) for key in dir(Config) if key.startswith('SIM_CHAIN_')}
+    if args.abi_dir:
+        os.makedirs(args.abi_dir, exist_ok=True)
+        for name, (address, abi) in get_chain(sim_config).deployments().items():
+            with open(os.path.join(args.abi_dir, f'{name}.json'), 'w') as f:
+                json.dump({'address': address, 'abi': abi}, f, indent=2)
+    serve(args.host, args.port, sim_config)
@@ -0,0 +1,265 @@
+"""
+Short-lived appointment slot holds in Redis
+
+When registration opens, many patients race for the same slots. Rather
+than letting every request reach the database and fail on the exclusion
+constraint, booking goes through two steps:
+
+1. ``place_hold`` claims the slot in Redis with one script: the slot key is
+   set only if no hold or booking owns it, and a patient holds at most one
+   slot at a time. Holds expire after SLOT_HOLD_TTL seconds, so abandoned
+   ones free their slot without any cleanup job.
+2. ``confirm_hold`` checks the hold is still owned, turns it into an
+   ``Appointment`` row and leaves a booked marker on the slot until it
+   ends, so later claims are refused without a database round trip.
+
+The database constraint stays the authority: markers lost with Redis, or
+a hold expiring mid-confirmation, surface as a conflict from the insert.
+
+Keys::
+
+    hms:slot:{doctor_id}:{start}   hold ID while held, booked:{appointment ID} once booked
+    hms:slot:hold:{hold_id}        hash of the held slot and patient
+    hms:slot:patient:{patient_id}  hold ID of the patient's current hold
+"""
+
+import uuid
+from datetime import datetime
+
+import redis
+from flask import current_app
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+
+import extensions
+from extensions import db
+from models.appointment import Appointment
+from services import scheduling
+
+SLOT_KEY = 'hms:slot:{doctor_id}:{start}'
+HOLD_KEY = 'hms:slot:hold:{hold_id}'
+PATIENT_KEY = 'hms:slot:patient:{patient_id}'
+BOOKED_PREFIX = 'booked:'
+
+# Time a hold being confirmed is kept for, however little of its TTL is left
+CONFIRM_GRACE_MS = 30000
+
+# KEYS: slot, hold, patient. ARGV: hold ID, TTL in ms, hold hash fields
+_CLAIM = """
+if redis.call('exists', KEYS[1]) == 1 then
+    return 0
+end
+if redis.call('exists', KEYS[3]) == 1 then
+    return -1
+end
+redis.call('set', KEYS[1], ARGV[1], 'PX', ARGV[2])
+redis.call('set', KEYS[3], ARGV[1], 'PX', ARGV[2])
+redis.call('hset', KEYS[2], unpack(ARGV, 3))
+redis.call('pexpire', KEYS[2], ARGV[2])
+return 1
+"""
+
+# KEYS: slot, hold, patient. ARGV: hold ID, grace in ms
+_CONFIRM = """
+if redis.call('get', KEYS[1]) ~= ARGV[1] or redis.call('hget', KEYS[2], 'state') ~= 'held' then
+    return 0
+end
+redis.call('hset', KEYS[2], 'state', 'confirming')
+for _, key in ipairs(KEYS) do
+    if redis.call('pttl', key) < tonumber(ARGV[2]) then
+        redis.call('pexpire', key, ARGV[2])
+    end
+end
+return 1
+"""
+
+# KEYS: slot, hold, patient. ARGV: hold ID, booked marker, marker expiry in ms since the epoch
+_BOOKED = """
+redis.call('set', KEYS[1], ARGV[2])
+redis.call('pexpireat', KEYS[1], ARGV[3])
+redis.call('del', KEYS[2])
+if redis.call('get', KEYS[3]) == ARGV[1] then
+    redis.call('del', KEYS[3])
+end
+return 1
+"""
+
+# KEYS: keys to delete. ARGV: value each of them must still hold
+_DELETE_IF_EQUALS = """
+local deleted = 0
+for _, key in ipairs(KEYS) do
+    if redis.call('get', key) == ARGV[1] then
+        deleted = deleted + redis.call('del', key)
+    end
+end
+return deleted
+"""
+
+
+class SlotUnavailable(Exception):
+    """The slot is held or booked by someone else, or the hold is gone"""
+
+
+def _slot_key(doctor_id, start):
+    return SLOT_KEY.format(doctor_id=doctor_id, start=start.isoformat())
+
+
+def _keys(hold_id, hold):
+    return [
+        _slot_key(hold['doctor_id'], datetime.fromisoformat(hold['schedule_time'])),
+        HOLD_KEY.format(hold_id=hold_id),
+        PATIENT_KEY.format(patient_id=hold['patient_id'])
+    ]
+
+
+def _script(source):
+    return extensions.redis_client.register_script(source)
+
+
+def _booked_appointment(doctor_id, start, end):
+    """ID of a live appointment of the doctor overlapping ``[start, end)``, if any"""
+    return db.session.query(Appointment.id).filter(
+        Appointment.doctor_id == doctor_id,
+        Appointment.status != 'CANCELLED',
+        Appointment.end_time.isnot(None),
+        func.tsrange(Appointment.schedule_time, Appointment.end_time).op('&&')(func.tsrange(start, end))
+    ).limit(1).scalar()
+
+
+def _mark_booked(keys, hold_id, appointment_id, end):
+    """Replace the hold with the booked marker, kept until the slot ends"""
+    _script(_BOOKED)(keys=keys, args=[hold_id, BOOKED_PREFIX + str(appointment_id), int(end.timestamp() * 1000)])
+
+
+def place_hold(patient, doctor, schedule_time):
+    """Hold the slot of ``doctor`` starting at ``schedule_time`` for ``patient``
+
+    Returns the hold as a dictionary with its ID and expiry. Raises
+    ValueError when the time does not start a bookable slot and
+    SlotUnavailable when the slot is taken or the patient already holds
+    another one.
+    """
+    start, end = scheduling.booking_slot(doctor, schedule_time)
+    if start < datetime.now():
+        raise ValueError('Schedule time is in the past')
+
+    ttl = current_app.config.get('SLOT_HOLD_TTL', 120)
+    hold_id = uuid.uuid4().hex
+    hold = {
+        'patient_id': str(patient.id),
+        'doctor_id': str(doctor.id),
+        'dept_id': doctor.dept_id,
+        'dept_name': doctor.dept_name,
+        'schedule_time': start.isoformat(),
+        'end_time': end.isoformat(),
+        'state': 'held'
+    }
+    keys = _keys(hold_id, hold)
+    fields = [item for pair in hold.items() for item in pair]
+    claimed = _script(_CLAIM)(keys=keys, args=[hold_id, ttl * 1000, *fields])
+    if claimed == 0:
+        raise SlotUnavailable('The slot is already held or booked')
+    if claimed == -1:
+        raise SlotUnavailable('The patient already holds another slot')
+
+    # Bookings made without a hold, or whose marker was lost with Redis
+    appointment_id = _booked_appointment(doctor.id, start, end)
+    if appointment_id is not None:
+        _mark_booked(keys, hold_id, appointment_id, end)
+        raise SlotUnavailable('The doctor is already booked at this time')
+
+    return dict(hold, hold_id=hold_id, expires_in=ttl)
+
+
+def get_hold(hold_id):
+    """The hold as a dictionary, None once it expired or was confirmed"""
+    hold = extensions.redis_client.hgetall(HOLD_KEY.format(hold_id=hold_id))
+    if not hold:
+        return None
+    ttl = extensions.redis_client.pttl(HOLD_KEY.format(hold_id=hold_id))
+    return dict(hold, hold_id=hold_id, expires_in=round(max(ttl, 0) / 1000, 1))
+
+
+def confirm_hold(hold_id, **details):
+    """Book the held slot, returning the new ``Appointment``
+
+    ``details`` are extra appointment columns such as the reason or fee.
+    Raises SlotUnavailable when the hold expired, is being confirmed by
+    another request or lost the slot to a concurrent booking.
+    """
+    hold = extensions.redis_client.hgetall(HOLD_KEY.format(hold_id=hold_id))
+    if not hold:
+        raise SlotUnavailable('The hold expired or was already confirmed')
+    keys = _keys(hold_id, hold)
+    if not _script(_CONFIRM)(keys=keys, args=[hold_id, CONFIRM_GRACE_MS]):
+        raise SlotUnavailable('The hold expired or is already being confirmed')
+
+    appointment = Appointment(
+        patient_id=uuid.UUID(hold['patient_id']),
+        doctor_id=uuid.UUID(hold['doctor_id']),
+        dept_id=hold['dept_id'],
+        dept_name=hold['dept_name'],
+        schedule_time=datetime.fromisoformat(hold['schedule_time']),
+        end_time=datetime.fromisoformat(hold['end_time']),
+        **details
+    )
+    db.session.add(appointment)
+    try:
+        db.session.commit()
+    except IntegrityError as e:
+        db.session.rollback()
+        release_hold(hold_id, hold)
+        if scheduling.is_slot_conflict(e):
+            raise SlotUnavailable('The doctor is already booked at this time') from None
+        raise
+
+    _mark_booked(keys, hold_id, appointment.id, appointment.end_time)
+    return appointment
+
+
+def release_hold(hold_id, hold=None):
+    """Give up a hold, freeing its slot. Returns whether it still existed"""
+    hold = hold or extensions.redis_client.hgetall(HOLD_KEY.format(hold_id=hold_id))
+    if not hold:
+        return False
+    slot_key, hold_key, patient_key = _keys(hold_id, hold)
+    _script(_DELETE_IF_EQUALS)(keys=[slot_key, patient_key], args=[hold_id])
+    extensions.redis_client.delete(hold_key)
+    return True
+
+
+def is_held(doctor_id, start):
+    """Whether a hold or booking marker owns the slot
+
+    Used by bookings made without a hold; a Redis outage lets them through
+    to the database constraint.
+    """
+    try:
+        return extensions.redis_client.exists(_slot_key(doctor_id, start)) == 1
+    except redis.RedisError:
+        return False
+
+
+def booked(appointment):
+    """Leave the booked marker of an appointment made without a hold"""
+    try:
+        slot_key = _slot_key(appointment.doctor_id, appointment.schedule_time)
+        extensions.redis_client.set(
+            slot_key, BOOKED_PREFIX + str(appointment.id),
+            pxat=int(appointment.end_time.timestamp() * 1000)
+        )
+    except redis.RedisError:
+        pass
+
+
+def forget(appointment, schedule_time=None):
+    """Drop the booked marker of a cancelled or moved appointment
+
+    ``schedule_time`` is the start the marker was left for, when the
+    appointment has moved since.
+    """
+    try:
+        slot_key = _slot_key(appointment.doctor_id, schedule_time or appointment.schedule_time)
+        _script(_DELETE_IF_EQUALS)(keys=[slot_key], args=[BOOKED_PREFIX + str(appointment.id)])
+    except redis.RedisError:
+        pass
@@ -0,0 +1,509 @@
+"""
+Incrementally maintained dashboard and statistics aggregates
+
+Dashboard and statistics pages read precomputed aggregates rather than
+grouping appointments, records and inpatients on every request:
+
+* ``daily_stats`` (``DailyStat``) holds the rows and amounts of each dataset
+  per day, department, doctor and category (status, record type or gender).
+* ``stat_totals`` (``StatTotal``) holds their all-time sums per category, so
+  counters read a handful of rows however long the history is.
+
+``refresh`` keeps both current from a periodic task. It works on whole
+days: the rollup rows of a day are replaced by a GROUP BY over the source
+rows of that day, and the totals moved by the difference, in one
+transaction, so refreshing a day twice is harmless. Days to refresh are:
+
+1. Days of the rows changed since the last run, found through their
+   ``updated_at`` with STATS_REFRESH_OVERLAP seconds of overlap for
+   transactions still open at the time. Bulk updates, inserts and soft
+   deletes are caught this way too.
+2. Days that rows left, when they were deleted or their day column
+   changed. Row events record them and push them to Redis on commit.
+
+Bulk deletes bypass the row events, so they schedule a rebuild of the
+dataset instead, as does a missing watermark on the first run or after
+Redis lost it.
+
+Keys::
+
+    hms:stats:watermark:{dataset}      time the last refresh of the dataset started
+    hms:stats:dirty:{dataset}          days rows left, waiting for the next refresh
+    hms:stats:dirty:{dataset}:pending  days taken by a refresh that has not finished
+    hms:stats:rebuild                  datasets to rebuild from scratch
+"""
+
+import argparse
+import json
+import uuid
+from datetime import date, datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import event, func, inspect, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session, object_session
+
+import extensions
+from extensions import db
+from models.access_grant import AccessGrant
+from models.appointment import Appointment
+from models.daily_stat import DailyStat
+from models.data_hash import DataHash
+from models.doctor import Doctor
+from models.inpatient import Inpatient
+from models.medical_record import MedicalRecord
+from models.merkle_batch import MerkleBatch
+from models.patient import Patient
+from models.stat_total import StatTotal
+
+WATERMARK_KEY = 'hms:stats:watermark:{dataset}'
+DIRTY_KEY = 'hms:stats:dirty:{dataset}'
+PENDING_KEY = 'hms:stats:dirty:{dataset}:pending'
+REBUILD_KEY = 'hms:stats:rebuild'
+REFRESHED_KEY = 'hms:stats:refreshed_at'
+LOCK_KEY = 'hms:stats:lock'
+
+# Source rows of each dataset: the time deciding their day, then their
+# department, doctor, category and amount, when they last changed and
+# whether they count. Soft-deleted rows stay in so their change is seen.
+SOURCES = {
+    'appointments': """
+        SELECT a.schedule_time AS at, a.dept_id, a.doctor_id, coalesce(a.status, 'SCHEDULED') AS category,
+               coalesce(a.fee, 0) AS amount, a.updated_at, TRUE AS active
+        FROM appointments a
+    """,
+    'medical_records': """
+        SELECT r.created_at AS at, d.dept_id, r.doctor_id, r.record_type AS category,
+               0 AS amount, r.updated_at, coalesce(r.is_active, FALSE) AS active
+        FROM emr_records r JOIN doctors d ON d.id = r.doctor_id
+    """,
+    'inpatients': """
+        SELECT i.admit_time AS at, d.dept_id, i.doctor_id, coalesce(i.status, 'ADMITTED') AS category,
+               coalesce(i.total_fee, 0) AS amount, i.updated_at, TRUE AS active
+        FROM inpatients i JOIN doctors d ON d.id = i.doctor_id
+    """,
+    'patients': """
+        SELECT p.created_at AS at, NULL AS dept_id, CAST(NULL AS uuid) AS doctor_id,
+               coalesce(nullif(p.gender, ''), 'UNKNOWN') AS category, 0 AS amount, p.updated_at,
+               coalesce(p.is_active, FALSE) AS active
+        FROM patients p
+    """,
+    # Transactions sent for single anchors, Merkle batches and access grants
+    'chain_tx': """
+        SELECT h.created_at AS at, NULL AS dept_id, CAST(NULL AS uuid) AS doctor_id,
+               coalesce(h.tx_status, 'PENDING') AS category, 0 AS amount, h.updated_at, TRUE AS active
+        FROM data_hashes h
+        WHERE h.anchor_mode = 'SINGLE'
+        UNION ALL
+        SELECT b.created_at, NULL, NULL, coalesce(b.tx_status, 'PENDING'), 0, b.updated_at, TRUE
+        FROM merkle_batches b
+        UNION ALL
+        SELECT g.created_at, NULL, NULL, coalesce(g.tx_status, 'PENDING'), 0, g.updated_at, TRUE
+        FROM access_grants g
+    """,
+}
+
+# Models feeding each dataset, with the column deciding the day of a row
+DAY_COLUMNS = {
+    'appointments': {Appointment: 'schedule_time'},
+    'medical_records': {MedicalRecord: 'created_at'},
+    'inpatients': {Inpatient: 'admit_time'},
+    'patients': {Patient: 'created_at'},
+    'chain_tx': {DataHash: 'created_at', MerkleBatch: 'created_at', AccessGrant: 'created_at'},
+}
+
+_DATASET_OF = {model: dataset for dataset, models in DAY_COLUMNS.items() for model in models}
+_DAY_COLUMN = {model: column for models in DAY_COLUMNS.values() for model, column in models.items()}
+
+CHANGED_DAYS_SQL = """
+SELECT DISTINCT CAST(src.at AS date)
+FROM ({source}) src
+WHERE src.updated_at > :since AND src.at IS NOT NULL
+"""
+
+ROLLUP_SQL = """
+INSERT INTO daily_stats (dataset, day, dept_id, doctor_id, category, count, amount)
+SELECT :dataset, CAST(src.at AS date), src.dept_id, src.doctor_id, src.category, count(*), sum(src.amount)
+FROM ({source}) src
+WHERE src.active AND ({condition})
+GROUP BY 2, 3, 4, 5
+{returning}
+"""
+
+# Serializes refreshes of a dataset across workers until the transaction ends
+LOCK_SQL = text("SELECT pg_advisory_xact_lock(hashtext(:key))")
+
+# Ranges of consecutive days refreshed per statement
+MAX_RANGES = 50
+
+# Statuses that do not count as visits or revenue
+CANCELLED = 'CANCELLED'
+
+
+def _lock(dataset):
+    db.session.execute(LOCK_SQL, {'key': f'hms:stats:{dataset}'})
+
+
+def _day_ranges(days):
+    """Consecutive runs of ``days`` as ``[start, end)`` datetimes"""
+    ranges = []
+    for day in sorted(days):
+        start = datetime.combine(day, datetime.min.time())
+        if ranges and ranges[-1][1] == start:
+            ranges[-1][1] = start + timedelta(days=1)
+        else:
+            ranges.append([start, start + timedelta(days=1)])
+    return ranges
+
+
+def _move_totals(dataset, removed, added):
+    """Add the rollup rows ``added`` to the totals and take ``removed`` off"""
+    deltas = {}
+    for rows, sign in ((removed, -1), (added, 1)):
+        for category, count, amount in rows:
+            delta = deltas.setdefault(category, [0, 0])
+            delta[0] += sign * count
+            delta[1] += sign * amount
+    values = [
+        {'dataset': dataset, 'category': category, 'count': count, 'amount': amount, 'updated_at': datetime.utcnow()}
+        for category, (count, amount) in deltas.items() if count or amount
+    ]
+    if not values:
+        return
+    stmt = insert(StatTotal).values(values)
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=['dataset', 'category'],
+        set_={
+            'count': StatTotal.count + stmt.excluded.count,
+            'amount': StatTotal.amount + stmt.excluded.amount,
+            'updated_at': stmt.excluded.updated_at
+        }
+    ))
+
+
+def _refresh_days(dataset, days):
+    """Recompute the rollups of ``days`` and move the totals, in one transaction"""
+    ranges = _day_ranges(days)
+    condition = ' OR '.join(f'(src.at >= :start_{i} AND src.at < :end_{i})' for i in range(len(ranges)))
+    params = {'dataset': dataset}
+    for i, (start, end) in enumerate(ranges):
+        params[f'start_{i}'] = start
+        params[f'end_{i}'] = end
+
+    _lock(dataset)
+    removed = db.session.execute(
+        text("DELETE FROM daily_stats WHERE dataset = :dataset AND day = ANY(:days) RETURNING category, count, amount"),
+        {'dataset': dataset, 'days': sorted(days)}
+    ).all()
+    added = db.session.execute(
+        text(ROLLUP_SQL.format(source=SOURCES[dataset], condition=condition,
+                               returning='RETURNING category, count, amount')),
+        params
+    ).all()
+    _move_totals(dataset, removed, added)
+    db.session.commit()
+
+
+def _chunks(days):
+    """``days`` in order, split so every chunk spans at most MAX_RANGES ranges"""
+    chunk = []
+    for day in sorted(days):
+        chunk.append(day)
+        if len(_day_ranges(chunk)) > MAX_RANGES:
+            yield chunk[:-1]
+            chunk = [day]
+    if chunk:
+        yield chunk
+
+
+def rebuild(dataset):
+    """Recompute every rollup and total of ``dataset`` from its source rows"""
+    _lock(dataset)
+    db.session.execute(DailyStat.__table__.delete().where(DailyStat.dataset == dataset))
+    db.session.execute(
+        text(ROLLUP_SQL.format(source=SOURCES[dataset], condition='src.at IS NOT NULL', returning='')),
+        {'dataset': dataset}
+    )
+    db.session.execute(StatTotal.__table__.delete().where(StatTotal.dataset == dataset))
+    db.session.execute(text(
+        "INSERT INTO stat_totals (dataset, category, count, amount, updated_at) "
+        "SELECT dataset, category, sum(count), sum(amount), :now FROM daily_stats "
+        "WHERE dataset = :dataset GROUP BY dataset, category"
+    ), {'dataset': dataset, 'now': datetime.utcnow()})
+    db.session.commit()
+
+
+def _take_pending(dataset):
+    """Move the dirty days of ``dataset`` to its pending set and return them
+
+    Days stay pending until a refresh covering them commits, so a failed
+    run leaves them to the next one.
+    """
+    pending_key = PENDING_KEY.format(dataset=dataset)
+    dirty_key = DIRTY_KEY.format(dataset=dataset)
+    pipe = extensions.redis_client.pipeline()
+    pipe.sunionstore(pending_key, [pending_key, dirty_key])
+    pipe.delete(dirty_key)
+    pipe.smembers(pending_key)
+    return {date.fromisoformat(day) for day in pipe.execute()[-1]}
+
+
+def _refresh_dataset(dataset, full=False):
+    client = extensions.redis_client
+    watermark_key = WATERMARK_KEY.format(dataset=dataset)
+    started = datetime.utcnow()
+    pending = _take_pending(dataset)
+
+    watermark = client.get(watermark_key)
+    requested = client.srem(REBUILD_KEY, dataset) > 0
+    full = full or requested or watermark is None
+    if full:
+        try:
+            rebuild(dataset)
+        except Exception:
+            db.session.rollback()
+            client.sadd(REBUILD_KEY, dataset)
+            raise
+        days = None
+    else:
+        overlap = current_app.config.get('STATS_REFRESH_OVERLAP', 300)
+        since = datetime.fromisoformat(watermark) - timedelta(seconds=overlap)
+        changed = db.session.execute(text(CHANGED_DAYS_SQL.format(source=SOURCES[dataset])), {'since': since})
+        days = pending | {day for day, in changed}
+        # Only the chunks before a failure are committed; the rest is
+        # picked up again from the pending set and the old watermark
+        for chunk in _chunks(days):
+            _refresh_days(dataset, chunk)
+
+    client.set(watermark_key, started.isoformat())
+    client.delete(PENDING_KEY.format(dataset=dataset))
+    return {'rebuilt': full, 'days': None if full else len(days)}
+
+
+def refresh(datasets=None, full=False):
+    """Bring the rollups and totals up to date with their source rows
+
+    Refreshes ``datasets`` (all by default), rebuilding them from scratch
+    with ``full``. Returns what was done per dataset, or None if another
+    refresh is running.
+    """
+    token = uuid.uuid4().hex
+    timeout = current_app.config.get('STATS_LOCK_TIMEOUT', 600)
+    if not extensions.redis_client.set(LOCK_KEY, token, nx=True, ex=timeout):
+        return None
+
+    try:
+        result = {}
+        for dataset in datasets or SOURCES:
+            if dataset not in SOURCES:
+                raise ValueError(f'Unknown dataset {dataset}')
+            result[dataset] = _refresh_dataset(dataset, full)
+        extensions.redis_client.set(REFRESHED_KEY, datetime.utcnow().isoformat())
+        return result
+    finally:
+        if extensions.redis_client.get(LOCK_KEY) == token:
+            extensions.redis_client.delete(LOCK_KEY)
+
+
+def refreshed_at():
+    """When the last refresh finished, as an ISO string, or None"""
+    try:
+        return extensions.redis_client.get(REFRESHED_KEY)
+    except Exception:
+        return None
+
+
+def _totals():
+    totals = {}
+    for row in StatTotal.query.all():
+        totals.setdefault(row.dataset, {})[row.category] = row
+    return totals
+
+
+def dashboard():
+    """Headline counters of the dashboard
+
+    Today's live appointments, patients currently admitted, active medical
+    records and mined blockchain transactions.
+    """
+    today_appointments = db.session.query(func.coalesce(func.sum(DailyStat.count), 0)).filter(
+        DailyStat.dataset == 'appointments',
+        DailyStat.day == date.today(),
+        DailyStat.category != CANCELLED
+    ).scalar()
+    totals = _totals()
+
+    def total(dataset, category=None):
+        rows = totals.get(dataset, {})
+        if category is not None:
+            return rows[category].count if category in rows else 0
+        return sum(row.count for row in rows.values())
+
+    return {
+        'today_appointments': int(today_appointments),
+        'inpatients': total('inpatients', 'ADMITTED'),
+        'medical_records': total('medical_records'),
+        'blockchain_tx': total('chain_tx', 'MINED'),
+        'refreshed_at': refreshed_at()
+    }
+
+
+def summary(first_day, last_day, top_doctors=10):
+    """Statistics of the days ``first_day`` to ``last_day`` inclusive
+
+    Daily visits, appointments per status, activity and revenue per
+    department, the busiest doctors, records per type, admissions, new
+    patients and blockchain transactions, plus the gender distribution of
+    all active patients. Cancelled appointments count in the status
+    breakdown only.
+    """
+    in_range = (DailyStat.day >= first_day, DailyStat.day <= last_day)
+    live = DailyStat.category != CANCELLED
+
+    by_category = {}
+    rows = db.session.query(
+        DailyStat.dataset, DailyStat.category, func.sum(DailyStat.count), func.sum(DailyStat.amount)
+    ).filter(DailyStat.dataset.in_(SOURCES), *in_range).group_by(DailyStat.dataset, DailyStat.category)
+    for dataset, category, count, amount in rows:
+        by_category.setdefault(dataset, {})[category] = (int(count), amount)
+
+    visits = dict(db.session.query(DailyStat.day, func.sum(DailyStat.count)).filter(
+        DailyStat.dataset == 'appointments', live, *in_range
+    ).group_by(DailyStat.day))
+
+    departments = {}
+    rows = db.session.query(
+        DailyStat.dataset, DailyStat.dept_id, func.sum(DailyStat.count), func.sum(DailyStat.amount)
+    ).filter(
+        DailyStat.dataset.in_(('appointments', 'inpatients')), live, *in_range
+    ).group_by(DailyStat.dataset, DailyStat.dept_id)
+    for dataset, dept_id, count, amount in rows:
+        department = departments.setdefault(dept_id, {
+            'dept_id': dept_id, 'dept_name': None, 'appointments': 0, 'admissions': 0, 'revenue': 0
+        })
+        department['appointments' if dataset == 'appointments' else 'admissions'] += int(count)
+        department['revenue'] += amount
+    names = db.session.query(Doctor.dept_id, func.min(Doctor.dept_name)).filter(
+        Doctor.dept_id.in_([dept_id for dept_id in departments if dept_id is not None])
+    ).group_by(Doctor.dept_id)
+    for dept_id, dept_name in names:
+        departments[dept_id]['dept_name'] = dept_name
+
+    doctors = [
+        {'doctor_id': doctor_id, 'doctor_name': None, 'appointments': int(count), 'revenue': amount}
+        for doctor_id, count, amount in db.session.query(
+            DailyStat.doctor_id, func.sum(DailyStat.count), func.sum(DailyStat.amount)
+        ).filter(
+            DailyStat.dataset == 'appointments', live, *in_range
+        ).group_by(DailyStat.doctor_id).order_by(func.sum(DailyStat.count).desc(), DailyStat.doctor_id).limit(top_doctors)
+    ]
+    names = dict(db.session.query(Doctor.id, Doctor.name).filter(Doctor.id.in_([row['doctor_id'] for row in doctors])))
+    for row in doctors:
+        row['doctor_name'] = names.get(row['doctor_id'])
+
+    def counts(dataset):
+        return {category: count for category, (count, _) in by_category.get(dataset, {}).items()}
+
+    def revenue(dataset):
+        return sum((amount for category, (_, amount) in by_category.get(dataset, {}).items() if category != CANCELLED), 0)
+
+    appointments = counts('appointments')
+    days = (last_day - first_day).days + 1
+    return {
+        'start_date': first_day,
+        'end_date': last_day,
+        'visits': [
+            {'date': day, 'count': int(visits.get(day, 0))}
+            for day in (first_day + timedelta(days=offset) for offset in range(days))
+        ],
+        'appointments': {
+            'total': sum(count for status, count in appointments.items() if status != CANCELLED),
+            'by_status': appointments,
+            'revenue': revenue('appointments')
+        },
+        'departments': sorted(departments.values(), key=lambda row: (-row['revenue'], -row['appointments'])),
+        'doctors': doctors,
+        'medical_records': {'total': sum(counts('medical_records').values()), 'by_type': counts('medical_records')},
+        'inpatients': {
+            'admissions': sum(counts('inpatients').values()),
+            'by_status': counts('inpatients'),
+            'revenue': revenue('inpatients')
+        },
+        'new_patients': sum(counts('patients').values()),
+        'gender': {category: row.count for category, row in _totals().get('patients', {}).items() if row.count},
+        'blockchain_tx': {'total': sum(counts('chain_tx').values()), 'by_status': counts('chain_tx')},
+        'refreshed_at': refreshed_at()
+    }
+
+
+def _record_day(target, value):
+    session = object_session(target)
+    if session is None or value is None:
+        return
+    days = session.info.setdefault('stats_days', {})
+    days.setdefault(_DATASET_OF[type(target)], set()).add(value.date())
+
+
+def _after_update(mapper, connection, target):
+    """A row moved to another day leaves its old day behind"""
+    history = inspect(target).attrs[_DAY_COLUMN[type(target)]].history
+    if history.deleted:
+        _record_day(target, history.deleted[0])
+
+
+def _after_delete(mapper, connection, target):
+    column = _DAY_COLUMN[type(target)]
+    history = inspect(target).attrs[column].history
+    _record_day(target, history.deleted[0] if history.deleted else getattr(target, column))
+
+
+for _model in _DATASET_OF:
+    event.listen(_model, 'after_update', _after_update)
+    event.listen(_model, 'after_delete', _after_delete)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _bulk_deleted(orm_execute_state):
+    """Bulk deletes bypass the row events, so rebuild the dataset instead"""
+    if not orm_execute_state.is_delete:
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.class_ in _DATASET_OF:
+        orm_execute_state.session.info.setdefault('stats_rebuild', set()).add(_DATASET_OF[mapper.class_])
+
+
+@event.listens_for(Session, 'after_commit')
+def _push_days(session):
+    """Hand the days rows left in the committed transaction to the next refresh"""
+    days = session.info.pop('stats_days', None)
+    datasets = session.info.pop('stats_rebuild', None)
+    if not days and not datasets:
+        return
+    try:
+        pipe = extensions.redis_client.pipeline(transaction=False)
+        for dataset, values in (days or {}).items():
+            pipe.sadd(DIRTY_KEY.format(dataset=dataset), *(day.isoformat() for day in values))
+        if datasets:
+            pipe.sadd(REBUILD_KEY, *datasets)
+        pipe.execute()
+    except Exception:
+        # Lost days keep their old rollups until the dataset is rebuilt
+        pass
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_days(session):
+    session.info.pop('stats_days', None)
+    session.info.pop('stats_rebuild', None)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Refresh the dashboard and statistics aggregates')
+    parser.add_argument('datasets', nargs='*', choices=list(SOURCES), help='Datasets to refresh, all by default')
+    parser.add_argument('--rebuild', action='store_true', help='Recompute the datasets from scratch')
+    args = parser.parse_args()
+
+    from app import app
+
+    with app.app_context():
+        print(json.dumps(refresh(args.datasets or None, full=args.rebuild), indent=2))
@@ -0,0 +1,175 @@
+"""
+Off-chain DrugTrace item index for Web3 HMS
+"""
+
+import json
+from datetime import datetime
+
+from sqlalchemy import or_, select
+from sqlalchemy.dialects.postgresql import insert
+
+from extensions import db
+from models.chain_event import ChainEvent
+from models.drug import Drug
+from models.trace_item import TraceItem
+from services.event_indexer import subject_key
+from services.web3_client import CONTRACT_NAMES
+
+TRACE_CONTRACT = CONTRACT_NAMES['drug_trace']
+
+# Columns derived from events; item_id is only ever set by register_item
+CHAIN_FIELDS = (
+    'name', 'manufacturer', 'batch_number', 'current_owner', 'current_location',
+    'status', 'use_count', 'created_block', 'last_block', 'last_event_at'
+)
+
+
+def _empty_item(key):
+    return {
+        'item_key': key,
+        'name': None,
+        'manufacturer': None,
+        'batch_number': None,
+        'current_owner': None,
+        'current_location': None,
+        'status': 'PENDING',
+        'use_count': 0,
+        'created_block': None,
+        'last_block': None,
+        'last_event_at': None,
+        'updated_at': datetime.utcnow()
+    }
+
+
+def fold_events(key, events):
+    """Fold an item's events, in chain order, into its current state"""
+    item = _empty_item(key)
+    for event in events:
+        args = json.loads(event.args) if event.args else {}
+        if event.event_name == 'ItemCreated':
+            item.update(
+                name=args.get('name'),
+                manufacturer=args.get('manufacturer'),
+                batch_number=args.get('batchNumber'),
+                status='ACTIVE',
+                created_block=event.block_number
+            )
+        elif event.event_name == 'ItemTransferred':
+            item.update(current_owner=args.get('to'), current_location=args.get('location'))
+        elif event.event_name == 'ItemUsed':
+            item['use_count'] += 1
+        elif event.event_name == 'ItemDisposed':
+            item['status'] = 'DISPOSED'
+        item['last_block'] = event.block_number
+        item['last_event_at'] = event.block_time
+    return item
+
+
+def register_item(item_id, name, manufacturer, batch_number):
+    """Record the plain ID of an item queued for creation
+
+    Event topics only carry keccak(itemId), so the plain ID is stored
+    up front and the indexer fills in the rest once the event lands.
+    """
+    db.session.execute(
+        insert(TraceItem).values(
+            item_key=subject_key(item_id),
+            item_id=item_id,
+            name=name,
+            manufacturer=manufacturer,
+            batch_number=batch_number,
+            status='PENDING',
+            use_count=0
+        ).on_conflict_do_update(
+            index_elements=['item_key'],
+            set_={'item_id': item_id}
+        )
+    )
+
+
+def refresh_items(item_keys):
+    """Rebuild the index rows of ``item_keys`` from the stored events
+
+    Called by the event indexer in its own transaction after new events
+    are stored or rolled back on a reorg.
+    """
+    item_keys = {key for key in item_keys if key}
+    if not item_keys:
+        return 0
+
+    events = ChainEvent.query.filter(
+        ChainEvent.contract_name == TRACE_CONTRACT,
+        ChainEvent.subject_key.in_(item_keys)
+    ).order_by(
+        ChainEvent.subject_key,
+        ChainEvent.block_number,
+        ChainEvent.log_index
+    ).all()
+
+    by_key = {}
+    for event in events:
+        by_key.setdefault(event.subject_key, []).append(event)
+
+    rows = [fold_events(key, by_key.get(key, [])) for key in item_keys]
+    statement = insert(TraceItem).values(rows)
+    db.session.execute(
+        statement.on_conflict_do_update(
+            index_elements=['item_key'],
+            set_={field: statement.excluded[field] for field in CHAIN_FIELDS + ('updated_at',)}
+        )
+    )
+
+    # Items whose only events were rolled back and that no API call registered
+    TraceItem.query.filter(
+        TraceItem.item_key.in_(item_keys - set(by_key)),
+        TraceItem.item_id.is_(None)
+    ).delete(synchronize_session=False)
+    return len(rows)
+
+
+def rebuild_items(chunk_size=1000):
+    """Re-fold every indexed DrugTrace item, e.g. after deploying the index"""
+    keys = [key for (key,) in db.session.query(ChainEvent.subject_key).filter(
+        ChainEvent.contract_name == TRACE_CONTRACT,
+        ChainEvent.subject_key.isnot(None)
+    ).distinct()]
+    for start in range(0, len(keys), chunk_size):
+        refresh_items(keys[start:start + chunk_size])
+        db.session.commit()
+    return len(keys)
+
+
+def find_items(manufacturer=None, batch_number=None, status=None, limit=500):
+    """Find indexed items by manufacturer or batch number
+
+    Items match on their own event data or on the ``Drug`` row whose
+    ``blockchain_trace_id`` is the item ID.
+    """
+    query = db.session.query(TraceItem, Drug).outerjoin(
+        Drug, Drug.blockchain_trace_id == TraceItem.item_id
+    )
+    if manufacturer:
+        query = query.filter(or_(
+            TraceItem.manufacturer == manufacturer,
+            TraceItem.item_id.in_(select(Drug.blockchain_trace_id).where(Drug.manufacturer == manufacturer))
+        ))
+    if batch_number:
+        query = query.filter(or_(
+            TraceItem.batch_number == batch_number,
+            TraceItem.item_id.in_(select(Drug.blockchain_trace_id).where(Drug.batch_number == batch_number))
+        ))
+    if status:
+        query = query.filter(TraceItem.status == status)
+
+    items = []
+    for item, drug in query.order_by(TraceItem.created_block, TraceItem.item_key).limit(limit):
+        result = item.to_dict()
+        result['drug'] = {
+            'id': str(drug.id),
+            'name': drug.name,
+            'manufacturer': drug.manufacturer,
+            'batch_number': drug.batch_number,
+            'stock': drug.stock
+        } if drug else None
+        items.append(result)
+    return items
@@ -0,0 +1,142 @@
+"""
+Queued blockchain transaction submission for Web3 HMS
+"""
+
+import uuid
+from functools import lru_cache
+
+from eth_account import Account
+from flask import current_app
+from web3 import Web3
+
+from extensions import db
+from models.access_grant import AccessGrant
+from models.data_hash import DataHash
+from models.medical_record import MedicalRecord
+from models.merkle_batch import MerkleBatch
+from services.gas_oracle import gas_oracle
+from services.nonce_manager import nonce_manager
+from services.web3_client import contract_registry, get_web3
+
+# Transaction states persisted on DataHash, MerkleBatch and AccessGrant
+TX_PENDING = 'PENDING'
+TX_SENT = 'SENT'
+TX_MINED = 'MINED'
+TX_FAILED = 'FAILED'
+
+_chain_id = None
+
+
+def new_job_id():
+    """Create a submission job ID, also used as the Celery task ID"""
+    return str(uuid.uuid4())
+
+
+@lru_cache(maxsize=4)
+def _load_signer(private_key):
+    return Account.from_key(private_key)
+
+
+def get_signer():
+    """Get the account that signs backend transactions"""
+    private_key = current_app.config.get('BLOCKCHAIN_PRIVATE_KEY')
+    if not private_key:
+        raise RuntimeError('BLOCKCHAIN_PRIVATE_KEY is not configured')
+    return _load_signer(private_key)
+
+
+def get_chain_id(w3):
+    """Get the chain ID once per process"""
+    global _chain_id
+    if _chain_id is None:
+        _chain_id = w3.eth.chain_id
+    return _chain_id
+
+
+def queue_transaction(job_id, contract_key, function_name, args, gas, target=None):
+    """Hand a contract call to the submission worker
+
+    Rows referenced by ``target`` must be committed before queueing so the
+    worker never sees them half written.
+    """
+    from tasks.blockchain import submit_transaction
+
+    submit_transaction.apply_async(
+        args=[contract_key, function_name, args, gas, target],
+        task_id=job_id
+    )
+    return job_id
+
+
+def send_transaction(contract_key, function_name, args, gas):
+    """Sign and broadcast a contract call, returning the tx hash and nonce"""
+    contract = contract_registry.get_contract(contract_key)
+    if contract is None:
+        raise RuntimeError(f'{contract_key} contract not available')
+
+    w3 = get_web3()
+    signer = get_signer()
+    nonce = nonce_manager.next_nonce(w3, signer.address)
+    try:
+        tx = getattr(contract.functions, function_name)(*args).build_transaction({
+            'from': signer.address,
+            'nonce': nonce,
+            'gas': gas,
+            **gas_oracle.get_fees(),
+            'chainId': get_chain_id(w3)
+        })
+        signed = signer.sign_transaction(tx)
+        tx_hash = w3.eth.send_raw_transaction(signed.rawTransaction)
+    except Exception:
+        # The allocated nonce was never used; re-seed so it is not left as a gap
+        nonce_manager.resync(signer.address)
+        raise
+    return Web3.to_hex(tx_hash), nonce
+
+
+def update_target(target, tx_status, tx_hash=None, tx_error=None):
+    """Persist a submission outcome on the rows a job was queued for"""
+    if not target:
+        return
+
+    target_id = uuid.UUID(target['id'])
+    fields = {'tx_status': tx_status, 'tx_error': tx_error}
+
+    if target['type'] == 'data_hash':
+        data_hash = DataHash.query.get(target_id)
+        if data_hash:
+            _apply(data_hash, fields, tx_hash=tx_hash)
+            if tx_hash:
+                MedicalRecord.query.filter_by(id=data_hash.original_id).update(
+                    {'blockchain_tx_hash': tx_hash}, synchronize_session=False
+                )
+
+    elif target['type'] == 'merkle_batch':
+        batch = MerkleBatch.query.get(target_id)
+        if batch:
+            _apply(batch, fields, tx_hash=tx_hash)
+            leaf_fields = dict(fields, tx_hash=tx_hash) if tx_hash else fields
+            DataHash.query.filter_by(batch_id=target_id).update(leaf_fields, synchronize_session=False)
+            if tx_hash:
+                record_ids = db.session.query(DataHash.original_id).filter_by(batch_id=target_id)
+                MedicalRecord.query.filter(MedicalRecord.id.in_(record_ids)).update(
+                    {'blockchain_tx_hash': tx_hash}, synchronize_session=False
+                )
+
+    elif target['type'] in ('access_grant', 'access_revoke'):
+        grant = AccessGrant.query.get(target_id)
+        if grant:
+            _apply(grant, fields)
+            if tx_hash and target['type'] == 'access_grant':
+                grant.blockchain_tx_hash = tx_hash
+            elif tx_hash:
+                grant.revoke_tx_hash = tx_hash
+
+    db.session.commit()
+
+
+def _apply(row, fields, tx_hash=None):
+    for key, value in fields.items():
+        setattr(row, key, value)
+    if tx_hash:
+        row.tx_hash = tx_hash
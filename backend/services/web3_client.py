@@ -0,0 +1,193 @@
+"""
+Shared Web3 client and contract registry for Web3 HMS
+"""
+
+import json
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from web3 import Web3
+
+import extensions
+from models.contract import Contract
+
+# Registry key -> contract name in the contracts table
+CONTRACT_NAMES = {
+    'medical_record': 'MedicalRecordHash',
+    'access_control': 'AccessControl',
+    'drug_trace': 'DrugTrace'
+}
+
+# Bumped whenever a worker writes to the contracts table
+CONTRACTS_VERSION_KEY = 'hms:contracts:version'
+
+
+class ContractRegistry:
+    """Per-worker Web3 client and contract cache
+
+    The Web3 client keeps a pooled keep-alive HTTP session, and contract
+    objects are built once from the parsed ABIs in the contracts table.
+    The cache is dropped when the contracts table changes, either locally
+    (mapper events) or in another worker (version key in Redis).
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._pid = None
+        self._w3 = None
+        self._session = None
+        self._contracts = None
+        self._abis = {}
+        self._version = None
+        self._loaded_at = 0.0
+        self._checked_at = 0.0
+
+    def _reset_if_forked(self):
+        """Drop state inherited from a parent process"""
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._w3 = None
+            self._session = None
+            self._contracts = None
+            self._abis = {}
+            self._version = None
+
+    def _build_session(self):
+        """Create a keep-alive HTTP session for the provider"""
+        pool_size = current_app.config.get('WEB3_POOL_SIZE', 10)
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def get_web3(self):
+        """Get the process-wide Web3 client"""
+        with self._lock:
+            self._reset_if_forked()
+            if self._w3 is None:
+                if current_app.config.get('WEB3_PROVIDER_MODE') == 'sim':
+                    from services import sim_chain
+                    provider = sim_chain.build_provider(current_app.config)
+                else:
+                    self._session = self._build_session()
+                    provider = Web3.HTTPProvider(
+                        current_app.config.get('WEB3_PROVIDER_URL', 'http://localhost:8545'),
+                        request_kwargs={'timeout': current_app.config.get('WEB3_REQUEST_TIMEOUT', 30)},
+                        session=self._session
+                    )
+                self._w3 = Web3(provider)
+            return self._w3
+
+    def get_http_session(self):
+        """Get the pooled HTTP session of the provider, or None for other providers"""
+        w3 = self.get_web3()
+        return self._session if isinstance(w3.provider, Web3.HTTPProvider) else None
+
+    def get_contracts(self):
+        """Get contract objects keyed by registry name"""
+        with self._lock:
+            self._reset_if_forked()
+            if self._contracts is None or self._is_stale():
+                self._load_contracts()
+            return self._contracts
+
+    def get_contract(self, key):
+        """Get a single contract object, or None if it is not deployed"""
+        return self.get_contracts().get(key)
+
+    def get_abi(self, key):
+        """Get the parsed ABI of a registered contract"""
+        self.get_contracts()
+        return self._abis.get(key)
+
+    def invalidate(self, publish=True):
+        """Drop cached contracts, optionally telling the other workers"""
+        with self._lock:
+            self._contracts = None
+            self._abis = {}
+        if publish and extensions.redis_client is not None:
+            try:
+                extensions.redis_client.incr(CONTRACTS_VERSION_KEY)
+            except Exception:
+                # Other workers still pick the change up via CONTRACT_REGISTRY_MAX_AGE
+                pass
+
+    def _remote_version(self):
+        """Read the shared contracts version, or None when Redis is unavailable"""
+        if extensions.redis_client is None:
+            return None
+        try:
+            return extensions.redis_client.get(CONTRACTS_VERSION_KEY)
+        except Exception:
+            return None
+
+    def _is_stale(self):
+        """Check whether the cached contracts must be reloaded"""
+        now = time.monotonic()
+        if now - self._loaded_at > current_app.config.get('CONTRACT_REGISTRY_MAX_AGE', 300):
+            return True
+        if now - self._checked_at < current_app.config.get('CONTRACT_REGISTRY_CHECK_INTERVAL', 5):
+            return False
+        self._checked_at = now
+        return self._remote_version() != self._version
+
+    def _load_contracts(self):
+        """Load contract ABIs and addresses from the database"""
+        w3 = self.get_web3()
+        version = self._remote_version()
+        if current_app.config.get('WEB3_PROVIDER_MODE') == 'sim':
+            # The simulated chain deploys its own contracts at fixed addresses
+            deployed = w3.provider.chain.deployments()
+        else:
+            rows = Contract.query.filter(
+                Contract.name.in_(CONTRACT_NAMES.values()),
+                Contract.is_active.is_(True)
+            ).all()
+            deployed = {row.name: (row.address, json.loads(row.abi)) for row in rows if row.abi}
+
+        contracts = {}
+        abis = {}
+        for key, name in CONTRACT_NAMES.items():
+            if name in deployed:
+                address, abis[key] = deployed[name]
+                contracts[key] = w3.eth.contract(
+                    address=Web3.to_checksum_address(address),
+                    abi=abis[key]
+                )
+
+        self._contracts = contracts
+        self._abis = abis
+        self._version = version
+        self._loaded_at = self._checked_at = time.monotonic()
+
+
+contract_registry = ContractRegistry()
+
+
+def get_web3():
+    """Get the process-wide Web3 client"""
+    return contract_registry.get_web3()
+
+
+@event.listens_for(Contract, 'after_insert')
+@event.listens_for(Contract, 'after_update')
+@event.listens_for(Contract, 'after_delete')
+def _contracts_changed(mapper, connection, target):
+    """Flag the session so the registry is invalidated once it commits"""
+    session = object_session(target)
+    if session is not None:
+        session.info['contracts_changed'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _publish_contracts_change(session):
+    """Invalidate the registry after contract changes are committed"""
+    if session.info.pop('contracts_changed', False):
+        contract_registry.invalidate()
@@ -0,0 +1,29 @@
+"""
+Background tasks for Web3 HMS
+"""
+
+from .blockchain import (
+    submit_transaction,
+    track_confirmations,
+    flush_hash_batch,
+    index_events,
+    rebuild_trace_index,
+    refresh_gas_price,
+    audit_records
+)
+from .storage import offload_records
+from .search import reindex
+from .stats import refresh_stats
+
+__all__ = [
+    'submit_transaction',
+    'track_confirmations',
+    'flush_hash_batch',
+    'index_events',
+    'rebuild_trace_index',
+    'refresh_gas_price',
+    'audit_records',
+    'offload_records',
+    'reindex',
+    'refresh_stats'
+]
@@ -0,0 +1,61 @@
+"""
+Blockchain background tasks for Web3 HMS
+"""
+
+from flask import current_app
+from extensions import celery, db
+from services import confirmation_tracker, event_indexer, hash_anchor, integrity_audit, trace_index, tx_pipeline
+from services.gas_oracle import gas_oracle
+from services.nonce_manager import is_nonce_error
+
+@celery.task(bind=True, name='blockchain.submit_transaction')
+def submit_transaction(self, contract_key, function_name, args, gas, target=None):
+    """Sign and send a queued contract transaction"""
+    try:
+        tx_hash, nonce = tx_pipeline.send_transaction(contract_key, function_name, args, gas)
+    except Exception as e:
+        db.session.rollback()
+        # Another worker took the nonce first; retry with a re-seeded counter
+        if is_nonce_error(e) and self.request.retries < current_app.config.get('TX_MAX_RETRIES', 3):
+            raise self.retry(exc=e, countdown=1)
+        tx_pipeline.update_target(target, tx_pipeline.TX_FAILED, tx_error=str(e))
+        raise
+    
+    tx_pipeline.update_target(target, tx_pipeline.TX_SENT, tx_hash=tx_hash)
+    return {
+        'tx_hash': tx_hash,
+        'nonce': nonce
+    }
+
+@celery.task(name='blockchain.track_confirmations')
+def track_confirmations():
+    """Record receipts of sent transactions once they are final"""
+    return confirmation_tracker.track_confirmations()
+
+@celery.task(name='blockchain.flush_hash_batch')
+def flush_hash_batch():
+    """Anchor a partial Merkle batch whose window has closed"""
+    if not hash_anchor.is_batch_mode():
+        return None
+    batch = hash_anchor.flush_batch()
+    return str(batch.id) if batch else None
+
+@celery.task(name='blockchain.index_events')
+def index_events():
+    """Ingest new contract events into the local index"""
+    return event_indexer.index_events()
+
+@celery.task(name='blockchain.rebuild_trace_index')
+def rebuild_trace_index():
+    """Rebuild the DrugTrace item index from stored events"""
+    return trace_index.rebuild_items()
+
+@celery.task(name='blockchain.refresh_gas_price')
+def refresh_gas_price():
+    """Sample fee history into the shared gas price cache"""
+    return gas_oracle.refresh()
+
+@celery.task(name='blockchain.audit_records')
+def audit_records(restart=False):
+    """Scan the next slice of the record integrity audit"""
+    return integrity_audit.run_audit(restart=restart)
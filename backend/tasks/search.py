@@ -0,0 +1,14 @@
+"""
+Search index background tasks for Web3 HMS
+"""
+
+from extensions import celery
+from services import search
+
+@celery.task(name='search.reindex')
+def reindex(missing_only=False):
+    """Rebuild the search vectors of patients, doctors and records
+
+    ``missing_only`` only fills rows that have no vector yet.
+    """
+    return {model.__tablename__: search.reindex(model, missing_only=missing_only) for model in search.SEARCH_FIELDS}
@@ -0,0 +1,14 @@
+"""
+Statistics background tasks for Web3 HMS
+"""
+
+from extensions import celery
+from services import stats
+
+@celery.task(name='stats.refresh')
+def refresh_stats(datasets=None, full=False):
+    """Bring the dashboard and statistics aggregates up to date
+
+    ``full`` rebuilds ``datasets`` (all by default) from scratch.
+    """
+    return stats.refresh(datasets, full=full)
@@ -0,0 +1,11 @@
+"""
+Content storage background tasks for Web3 HMS
+"""
+
+from extensions import celery
+from services import content_store
+
+@celery.task(name='storage.offload_records')
+def offload_records(limit=None):
+    """Move large inline record bodies of existing records to IPFS"""
+    return content_store.offload_records(limit=limit)
@@ -7,6 +7,8 @@
 -- Create extensions
 CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
 CREATE EXTENSION IF NOT EXISTS "pgcrypto";
+CREATE EXTENSION IF NOT EXISTS "pg_trgm";
+CREATE EXTENSION IF NOT EXISTS "btree_gist";
 
 -- Create departments table
 CREATE TABLE IF NOT EXISTS departments (
@@ -53,8 +55,17 @@ CREATE INDEX IF NOT EXISTS idx_emr_records_doctor_id ON emr_records(doctor_id);
 CREATE INDEX IF NOT EXISTS idx_emr_records_blockchain_tx_hash ON emr_records(blockchain_tx_hash);
 CREATE INDEX IF NOT EXISTS idx_data_hashes_original_id ON data_hashes(original_id);
 CREATE INDEX IF NOT EXISTS idx_data_hashes_tx_hash ON data_hashes(tx_hash);
+CREATE INDEX IF NOT EXISTS idx_data_hashes_batch_id ON data_hashes(batch_id);
+CREATE INDEX IF NOT EXISTS idx_data_hashes_tx_sent ON data_hashes(tx_hash) WHERE tx_status = 'SENT';
+CREATE INDEX IF NOT EXISTS idx_merkle_batches_tx_hash ON merkle_batches(tx_hash);
+CREATE INDEX IF NOT EXISTS idx_data_hashes_pending_batch ON data_hashes(created_at) WHERE anchor_mode = 'BATCH' AND batch_id IS NULL;
 CREATE INDEX IF NOT EXISTS idx_access_grants_grantor_addr ON access_grants(grantor_addr);
 CREATE INDEX IF NOT EXISTS idx_access_grants_grantee_addr ON access_grants(grantee_addr);
+CREATE INDEX IF NOT EXISTS idx_access_grants_tx_sent ON access_grants(blockchain_tx_hash, revoke_tx_hash) WHERE tx_status = 'SENT';
+CREATE INDEX IF NOT EXISTS idx_access_grants_updated_at ON access_grants(updated_at);
+CREATE INDEX IF NOT EXISTS idx_drugs_manufacturer ON drugs(manufacturer);
+CREATE INDEX IF NOT EXISTS idx_drugs_batch_number ON drugs(batch_number);
+CREATE INDEX IF NOT EXISTS idx_drugs_blockchain_trace_id ON drugs(blockchain_trace_id);
 
 -- Insert sample users
 INSERT INTO users (email, password_hash, name, role, blockchain_addr) VALUES
@@ -94,6 +105,7 @@ CREATE TRIGGER update_inpatients_updated_at BEFORE UPDATE ON inpatients FOR EACH
 CREATE TRIGGER update_drugs_updated_at BEFORE UPDATE ON drugs FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 CREATE TRIGGER update_contracts_updated_at BEFORE UPDATE ON contracts FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 CREATE TRIGGER update_data_hashes_updated_at BEFORE UPDATE ON data_hashes FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+CREATE TRIGGER update_merkle_batches_updated_at BEFORE UPDATE ON merkle_batches FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 CREATE TRIGGER update_access_grants_updated_at BEFORE UPDATE ON access_grants FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 CREATE TRIGGER update_users_updated_at BEFORE UPDATE ON users FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 
@@ -83,6 +83,16 @@ with app.app_context():
     db.create_all()
     print('✅ 数据库表创建成功')
 "
+# Seed rows inserted by init-db.sql have no search vectors yet
+python -c "
+from app import create_app
+from services import search
+app = create_app()
+with app.app_context():
+    for model in search.SEARCH_FIELDS:
+        search.reindex(model, missing_only=True)
+    print('✅ 搜索索引创建成功')
+"
 cd ..
 
 # Deploy smart contracts
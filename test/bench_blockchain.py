@@ -0,0 +1,168 @@
+"""
+Throughput and tail latency of the blockchain write/verify path
+
+Drives store_hash, grant_access and verify through the Flask app against
+the simulated in-process chain (WEB3_PROVIDER_MODE=sim) with Celery tasks
+run eagerly, so a run needs PostgreSQL and Redis but no Ganache.
+
+    python test/bench_blockchain.py --records 200 --concurrency 8 --latency-ms 5 --failure-rate 0.01
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--records', type=int, default=100, help='Medical records to anchor and verify')
+    parser.add_argument('--concurrency', type=int, default=4, help='Concurrent client threads')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='Injected mean latency per chain request')
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help='Standard deviation of the injected latency')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='Share of chain requests that fail')
+    parser.add_argument('--revert-rate', type=float, default=0.0, help='Share of transactions mined as reverted')
+    parser.add_argument('--seed', type=int, default=1, help='Seed for reproducible fault injection')
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+    return parser.parse_args()
+
+
+def configure_environment(args):
+    """Point the app at the simulated chain before it is imported"""
+    from eth_account import Account
+
+    os.environ['WEB3_PROVIDER_MODE'] = 'sim'
+    os.environ['CELERY_TASK_ALWAYS_EAGER'] = 'true'
+    os.environ['SIM_CHAIN_LATENCY_MS'] = str(args.latency_ms)
+    os.environ['SIM_CHAIN_JITTER_MS'] = str(args.jitter_ms)
+    os.environ['SIM_CHAIN_FAILURE_RATE'] = str(args.failure_rate)
+    os.environ['SIM_CHAIN_REVERT_RATE'] = str(args.revert_rate)
+    os.environ['SIM_CHAIN_SEED'] = str(args.seed)
+    os.environ.setdefault('BLOCKCHAIN_PRIVATE_KEY', Account.create().key.hex())
+
+
+def summarize(name, latencies, errors, elapsed):
+    ordered = sorted(latencies)
+
+    def percentile(p):
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * p))] * 1000, 2) if ordered else None
+
+    return {
+        'phase': name,
+        'requests': len(latencies),
+        'errors': errors,
+        'elapsed_seconds': round(elapsed, 3),
+        'requests_per_second': round(len(latencies) / elapsed, 1) if elapsed > 0 else None,
+        'mean_ms': round(statistics.mean(ordered) * 1000, 2) if ordered else None,
+        'p50_ms': percentile(0.50),
+        'p95_ms': percentile(0.95),
+        'p99_ms': percentile(0.99),
+        'max_ms': round(ordered[-1] * 1000, 2) if ordered else None
+    }
+
+
+def run_phase(app, name, requests, concurrency):
+    """Send ``(method, url, payload)`` requests from a pool of clients"""
+    local = threading.local()
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+
+    def send(request):
+        if not hasattr(local, 'client'):
+            local.client = app.test_client()
+        method, url, payload, headers = request
+        started = time.perf_counter()
+        if method == 'GET':
+            # reqparse also reads the JSON body, which Werkzeug refuses
+            # to parse without a JSON content type
+            response = local.client.get(url, query_string=payload, json={}, headers=headers)
+        else:
+            response = local.client.post(url, json=payload, headers=headers)
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            if response.status_code >= 400:
+                errors[0] += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(send, requests))
+    return summarize(name, latencies, errors[0], time.perf_counter() - started)
+
+
+def main():
+    args = parse_args()
+    configure_environment(args)
+
+    from flask_jwt_extended import create_access_token
+    from app import app
+    from models.medical_record import MedicalRecord
+    from services import confirmation_tracker
+
+    for limiter in app.extensions.get('limiter', ()):
+        limiter.enabled = False
+
+    with app.app_context():
+        records = MedicalRecord.query.filter_by(is_active=True).limit(args.records).all()
+        if not records:
+            sys.exit('No medical records to benchmark with')
+        headers = {'Authorization': f'Bearer {create_access_token(identity=str(uuid.uuid4()))}'}
+        grantee = '0x' + '42' * 20
+
+        store = [
+            ('POST', '/api/blockchain/store_hash', {
+                'record_id': str(record.id),
+                'record_type': record.record_type or 'EMR',
+                'patient_id': str(record.patient_id),
+                'doctor_id': str(record.doctor_id)
+            }, headers)
+            for record in records
+        ]
+        grant = [
+            ('POST', '/api/blockchain/grant_access', {
+                'grant_id': str(uuid.uuid4()),
+                'grantee_address': grantee,
+                'data_id': str(record.id),
+                'data_type': record.record_type or 'EMR',
+                'duration': 3600
+            }, headers)
+            for record in records
+        ]
+        record_ids = [record.id for record in records]
+
+    report = [
+        run_phase(app, 'store_hash', store, args.concurrency),
+        run_phase(app, 'grant_access', grant, args.concurrency)
+    ]
+    with app.app_context():
+        confirmation_tracker.track_confirmations()
+        # store_hash re-hashes records under the current scheme, so the
+        # expected hashes are only known once it has run
+        verify = [
+            ('GET', '/api/blockchain/verify', {
+                'record_id': str(record.id),
+                'hash_value': record.calculate_hash()
+            }, headers)
+            for record in MedicalRecord.query.filter(MedicalRecord.id.in_(record_ids))
+        ]
+    report.append(run_phase(app, 'verify', verify, args.concurrency))
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    columns = ('phase', 'requests', 'errors', 'requests_per_second', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms')
+    print('  '.join(f'{column:>19}' for column in columns))
+    for row in report:
+        print('  '.join(f'{str(row[column]):>19}' for column in columns))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""
+Per-row cost of serializing list responses
+
+Compares ``to_dict`` plus the stdlib JSON encoder with the schema-driven
+orjson serializer (``api.serializer``), for full rows and for the summary
+view. Rows are built in memory with realistic values, so a run needs
+neither PostgreSQL nor Redis.
+
+    python test/bench_serialization.py --rows 5000 --repeat 5
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=2000, help='Rows per encoded batch')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per case, the fastest is reported')
+    parser.add_argument('--seed', type=int, default=1, help='Seed for reproducible row values')
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+    return parser.parse_args()
+
+
+def build_rows(model, count, rng):
+    """Transient ``model`` instances with a value in every column"""
+    from sqlalchemy import Boolean, Date, DateTime, Integer, Numeric, Text
+    from sqlalchemy.dialects.postgresql import UUID, TSVECTOR
+
+    started = datetime(2024, 1, 1)
+    rows = []
+    for _ in range(count):
+        row = model()
+        for prop in model.__mapper__.column_attrs:
+            column = prop.columns[0]
+            if isinstance(column.type, TSVECTOR):
+                continue
+            if column.key in ('content_cid', 'content_size'):
+                value = None  # Inline bodies
+            elif isinstance(column.type, UUID):
+                value = uuid.UUID(int=rng.getrandbits(128))
+            elif isinstance(column.type, DateTime):
+                value = started + timedelta(seconds=rng.randrange(10 ** 8), microseconds=rng.randrange(10 ** 6))
+            elif isinstance(column.type, Date):
+                value = date(1950, 1, 1) + timedelta(days=rng.randrange(25000))
+            elif isinstance(column.type, Numeric):
+                value = Decimal(rng.randrange(100000)) / 100
+            elif isinstance(column.type, Boolean):
+                value = rng.random() < 0.9
+            elif isinstance(column.type, Integer):
+                value = rng.randrange(10 ** 6)
+            elif isinstance(column.type, Text):
+                value = '门诊记录 patient history ' * rng.randrange(1, 8)
+            else:
+                value = '测试' + uuid.UUID(int=rng.getrandbits(128)).hex[:rng.randrange(4, 16)]
+            setattr(row, prop.key, value)
+        rows.append(row)
+    return rows
+
+
+def measure(function, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, len(body)
+
+
+def main():
+    args = parse_args()
+
+    from app import app
+    from api.serializer import schema_for
+    from models import Appointment, Doctor, Drug, Inpatient, MedicalRecord, Patient
+
+    rng = random.Random(args.seed)
+    report = []
+    with app.app_context():
+        for model in (Patient, Doctor, MedicalRecord, Appointment, Inpatient, Drug):
+            rows = build_rows(model, args.rows, rng)
+            cases = [
+                ('to_dict + json', lambda: json.dumps([row.to_dict() for row in rows]).encode('utf-8')),
+                ('schema + orjson', lambda: schema_for(model).dumps(rows)),
+            ]
+            if hasattr(model, 'SUMMARY_FIELDS'):
+                cases.append(('summary + orjson', lambda: schema_for(model, model.SUMMARY_FIELDS).dumps(rows)))
+
+            baseline = None
+            for name, function in cases:
+                elapsed, size = measure(function, args.repeat)
+                baseline = baseline or elapsed
+                report.append({
+                    'model': model.__name__,
+                    'case': name,
+                    'rows': len(rows),
+                    'us_per_row': round(elapsed / len(rows) * 1e6, 2),
+                    'rows_per_second': round(len(rows) / elapsed),
+                    'bytes_per_row': round(size / len(rows)),
+                    'speedup': round(baseline / elapsed, 2)
+                })
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    columns = ('model', 'case', 'us_per_row', 'rows_per_second', 'bytes_per_row', 'speedup')
+    print('  '.join(f'{column:>17}' for column in columns))
+    for row in report:
+        print('  '.join(f'{str(row[column]):>17}' for column in columns))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,251 @@
+"""
+Booking throughput and double-booking check under slot contention
+
+Creates doctors with one morning of short slots and many more patients
+than slots, then lets every patient race for the earliest slots at once.
+After a conflict a patient looks up the free slots and tries a random one,
+until they booked one, no slot is left or they ran out of attempts.
+Bookings go through slot holds (hold, then confirm) or straight to
+POST /api/appointments, to compare both paths.
+
+Afterwards the appointments are checked for overlapping live bookings of
+a doctor and patients booked twice; any is reported and fails the run.
+Needs PostgreSQL, with the schema and btree_gist in place, and Redis.
+Created rows and Redis keys are removed at the end unless --keep is given.
+
+    python test/load_booking.py --patients 500 --doctors 2 --concurrency 32 --mode holds
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, time as clock, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+DEPT_ID = 'LOADTEST'
+
+OVERLAPS_SQL = """
+SELECT count(*) FROM appointments a
+JOIN appointments b ON b.doctor_id = a.doctor_id AND b.id > a.id
+WHERE a.doctor_id = ANY(:doctors)
+  AND a.status <> 'CANCELLED' AND b.status <> 'CANCELLED'
+  AND tsrange(a.schedule_time, a.end_time) && tsrange(b.schedule_time, b.end_time)
+"""
+
+REPEATED_PATIENTS_SQL = """
+SELECT count(*) FROM (
+    SELECT patient_id FROM appointments
+    WHERE doctor_id = ANY(:doctors) AND status <> 'CANCELLED'
+    GROUP BY patient_id HAVING count(*) > 1
+) repeated
+"""
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--patients', type=int, default=300, help='Patients racing for slots')
+    parser.add_argument('--doctors', type=int, default=2, help='Doctors whose slots are contended')
+    parser.add_argument('--slot-minutes', type=int, default=5, help='Slot length of the test schedule')
+    parser.add_argument('--hours', type=int, default=4, help='Working hours of the test morning')
+    parser.add_argument('--hot', type=int, default=5, help='Earliest slots every patient starts from')
+    parser.add_argument('--attempts', type=int, default=20, help='Slots a patient tries before giving up')
+    parser.add_argument('--concurrency', type=int, default=32, help='Concurrent client threads')
+    parser.add_argument('--mode', choices=('holds', 'direct'), default='holds', help='Booking path under test')
+    parser.add_argument('--seed', type=int, default=1, help='Seed for reproducible slot choices')
+    parser.add_argument('--keep', action='store_true', help='Keep the created rows and Redis keys')
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+    return parser.parse_args()
+
+
+def create_fixtures(args, run_id):
+    """Doctors with a one-morning schedule and the racing patients"""
+    from extensions import db
+    from models import Doctor, DoctorSchedule, Patient
+
+    day = date.today() + timedelta(days=1)
+    doctors = []
+    for index in range(args.doctors):
+        doctor = Doctor(
+            name=f'压测医生{index}', title='主治医师', dept_id=DEPT_ID, dept_name='压测科室',
+            license_no=f'LOAD-{run_id}-{index}'
+        )
+        db.session.add(doctor)
+        db.session.flush()
+        db.session.add(DoctorSchedule(
+            doctor_id=doctor.id, dept_id=DEPT_ID, weekday=day.weekday(),
+            start_time=clock(8), end_time=clock(8 + args.hours), slot_minutes=args.slot_minutes,
+            valid_from=day, valid_until=day
+        ))
+        doctors.append(doctor)
+    patients = [
+        Patient(name=f'压测患者{index}', id_card=f'LOAD{run_id}{index:06d}')
+        for index in range(args.patients)
+    ]
+    db.session.add_all(patients)
+    db.session.commit()
+
+    slot = timedelta(minutes=args.slot_minutes)
+    starts = []
+    start = datetime.combine(day, clock(8))
+    while start + slot <= datetime.combine(day, clock(8 + args.hours)):
+        starts.append(start)
+        start += slot
+    return [doctor.id for doctor in doctors], [patient.id for patient in patients], starts
+
+
+def remove_fixtures(doctor_ids, patient_ids):
+    import extensions
+    from extensions import db
+    from models import Appointment, Doctor, DoctorSchedule, Patient
+
+    Appointment.query.filter(Appointment.doctor_id.in_(doctor_ids)).delete(synchronize_session=False)
+    DoctorSchedule.query.filter(DoctorSchedule.doctor_id.in_(doctor_ids)).delete(synchronize_session=False)
+    Doctor.query.filter(Doctor.id.in_(doctor_ids)).delete(synchronize_session=False)
+    Patient.query.filter(Patient.id.in_(patient_ids)).delete(synchronize_session=False)
+    db.session.commit()
+    for doctor_id in doctor_ids:
+        keys = list(extensions.redis_client.scan_iter(f'hms:slot:{doctor_id}:*'))
+        if keys:
+            extensions.redis_client.delete(*keys)
+
+
+def race(app, args, doctor_ids, patient_ids, starts, headers):
+    """Let every patient book one slot, returning per-request timings and outcomes"""
+    rng = random.Random(args.seed)
+    plans = [
+        (patient_id, doctor_ids[rng.randrange(len(doctor_ids))], starts[rng.randrange(min(args.hot, len(starts)))],
+         random.Random(rng.random()))
+        for patient_id in patient_ids
+    ]
+    slots_query = {'dept_id': DEPT_ID, 'date_from': starts[0].date().isoformat(), 'days': 1}
+    local = threading.local()
+    lock = threading.Lock()
+    stats = {'booked': 0, 'gave_up': 0, 'conflicts': 0, 'errors': 0, 'latencies': [], 'last_booked': None}
+
+    def send(method, url, payload=None, query=None):
+        started = time.perf_counter()
+        response = getattr(local.client, method)(url, json=payload or {}, query_string=query, headers=headers)
+        elapsed = time.perf_counter() - started
+        with lock:
+            stats['latencies'].append(elapsed)
+            if response.status_code == 409:
+                stats['conflicts'] += 1
+            elif response.status_code >= 400:
+                stats['errors'] += 1
+        return response
+
+    def attempt(patient_id, doctor_id, start):
+        payload = {'patient_id': str(patient_id), 'doctor_id': str(doctor_id), 'schedule_time': start.isoformat()}
+        if args.mode == 'holds':
+            response = send('post', '/api/appointments/holds', payload)
+            if response.status_code != 201:
+                return False
+            response = send('post', f"/api/appointments/holds/{response.get_json()['hold_id']}", {'reason': 'load test'})
+        else:
+            payload.update(dept_id=DEPT_ID, dept_name='压测科室', reason='load test')
+            response = send('post', '/api/appointments', payload)
+        return response.status_code == 201
+
+    def book(plan):
+        if not hasattr(local, 'client'):
+            local.client = app.test_client()
+        patient_id, doctor_id, start, choices = plan
+        for _ in range(args.attempts):
+            if attempt(patient_id, doctor_id, start):
+                with lock:
+                    stats['booked'] += 1
+                    stats['last_booked'] = time.perf_counter()
+                return
+            free = send('get', '/api/appointments/slots', query=slots_query).get_json()['slots']
+            if not free:
+                break
+            slot = choices.choice(free)
+            doctor_id, start = slot['doctor_id'], datetime.fromisoformat(slot['start_time'])
+        with lock:
+            stats['gave_up'] += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        list(executor.map(book, plans))
+    stats['elapsed'] = time.perf_counter() - started
+    stats['booking_window'] = (stats['last_booked'] or started) - started
+    return stats
+
+
+def summarize(args, stats, slots, overlaps, repeated):
+    ordered = sorted(stats['latencies'])
+
+    def percentile(p):
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * p))] * 1000, 2) if ordered else None
+
+    elapsed = stats['elapsed']
+    window = stats['booking_window']
+    return {
+        'mode': args.mode,
+        'patients': args.patients,
+        'slots': slots,
+        'booked': stats['booked'],
+        'gave_up': stats['gave_up'],
+        'requests': len(ordered),
+        'conflicts': stats['conflicts'],
+        'errors': stats['errors'],
+        'elapsed_seconds': round(elapsed, 3),
+        'booking_window_seconds': round(window, 3),
+        'bookings_per_second': round(stats['booked'] / window, 1) if window > 0 else None,
+        'requests_per_second': round(len(ordered) / elapsed, 1) if elapsed > 0 else None,
+        'mean_ms': round(statistics.mean(ordered) * 1000, 2) if ordered else None,
+        'p50_ms': percentile(0.50),
+        'p95_ms': percentile(0.95),
+        'p99_ms': percentile(0.99),
+        'double_bookings': overlaps,
+        'patients_booked_twice': repeated
+    }
+
+
+def main():
+    args = parse_args()
+
+    from flask_jwt_extended import create_access_token
+    from app import app
+    from extensions import db
+
+    for limiter in app.extensions.get('limiter', ()):
+        limiter.enabled = False
+
+    run_id = uuid.uuid4().hex[:8]
+    with app.app_context():
+        doctor_ids, patient_ids, starts = create_fixtures(args, run_id)
+        headers = {'Authorization': f'Bearer {create_access_token(identity=str(uuid.uuid4()))}'}
+
+    try:
+        stats = race(app, args, doctor_ids, patient_ids, starts, headers)
+        with app.app_context():
+            params = {'doctors': doctor_ids}
+            overlaps = db.session.execute(db.text(OVERLAPS_SQL), params).scalar()
+            repeated = db.session.execute(db.text(REPEATED_PATIENTS_SQL), params).scalar()
+    finally:
+        if not args.keep:
+            with app.app_context():
+                remove_fixtures(doctor_ids, patient_ids)
+
+    report = summarize(args, stats, len(starts) * len(doctor_ids), overlaps, repeated)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        width = max(len(name) for name in report)
+        for name, value in report.items():
+            print(f'{name:<{width}}  {value}')
+    if overlaps or repeated:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()